@@ -0,0 +1,128 @@
+"""
+Admission control for write endpoints.
+
+SQLite has a single writer, so a burst of submits/profile updates only turns
+into a queue of threads waiting on the file lock. This gate sits in front of
+the writer endpoints:
+
+  * a token bucket per caller (bearer token, or client IP) -> 429 when empty
+  * a global limit on concurrent writers with a short, bounded wait queue
+  * callers that cannot start within the latency budget get 503
+
+Both rejections carry Retry-After. Waiting happens on the event loop (the
+dependency is async), so queued writers never occupy threadpool workers that
+read endpoints need.
+
+Tunable through env vars: WRITE_CONCURRENCY, WRITE_QUEUE_MAX,
+WRITE_LATENCY_BUDGET_MS, USER_WRITE_RATE (tokens/s), USER_WRITE_BURST.
+"""
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict
+
+from fastapi import HTTPException, Request
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, burst):
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+
+class AdmissionController:
+    def __init__(self, concurrency=4, queue_max=32, latency_budget=2.0, rate=2.0, burst=10, max_buckets=100_000):
+        self.concurrency = concurrency
+        self.queue_max = queue_max
+        self.latency_budget = latency_budget
+        self.rate = rate
+        self.burst = burst
+        self.max_buckets = max_buckets
+        self._buckets = OrderedDict()
+        self._semaphore = None
+        self.in_flight = 0
+        self.queued = 0
+        self.counters = {"admitted": 0, "rate_limited": 0, "queue_full": 0, "timed_out": 0}
+
+    def _take_token(self, key):
+        """Returns 0 when a token was taken, otherwise seconds until one is available."""
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.burst)
+            if len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+        bucket.updated = now
+        if bucket.tokens >= 1:
+            bucket.tokens -= 1
+            return 0
+        return (1 - bucket.tokens) / self.rate
+
+    def _reject(self, status_code, counter, retry_after, detail):
+        self.counters[counter] += 1
+        raise HTTPException(
+            status_code=status_code,
+            detail=detail,
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+    async def acquire(self, key):
+        wait = self._take_token(key)
+        if wait:
+            self._reject(429, "rate_limited", wait, "Too many requests, slow down")
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        if self._semaphore.locked() and self.queued >= self.queue_max:
+            self._reject(503, "queue_full", self.latency_budget, "Server busy, try again shortly")
+
+        self.queued += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.latency_budget)
+        except asyncio.TimeoutError:
+            self._reject(503, "timed_out", self.latency_budget, "Server busy, try again shortly")
+        finally:
+            self.queued -= 1
+        self.in_flight += 1
+        self.counters["admitted"] += 1
+
+    def release(self):
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    def snapshot(self):
+        return {
+            **self.counters,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "tracked_callers": len(self._buckets),
+            "concurrency": self.concurrency,
+            "queue_max": self.queue_max,
+            "latency_budget_ms": int(self.latency_budget * 1000),
+        }
+
+
+writer_gate = AdmissionController(
+    concurrency=int(os.environ.get("WRITE_CONCURRENCY", 4)),
+    queue_max=int(os.environ.get("WRITE_QUEUE_MAX", 32)),
+    latency_budget=int(os.environ.get("WRITE_LATENCY_BUDGET_MS", 2000)) / 1000,
+    rate=float(os.environ.get("USER_WRITE_RATE", 2)),
+    burst=int(os.environ.get("USER_WRITE_BURST", 10)),
+)
+
+
+async def admit_writer(request: Request):
+    """FastAPI dependency for writer endpoints."""
+    auth = request.headers.get("authorization")
+    key = auth or (request.client.host if request.client else "anonymous")
+    await writer_gate.acquire(key)
+    try:
+        yield
+    finally:
+        writer_gate.release()
@@ -0,0 +1,213 @@
+"""
+Hot/cold tiering of inactive learners.
+
+Users whose last activity (user_stats.last_activity_date, or sign-up date if
+they never had any) is older than ARCHIVE_AFTER_DAYS have their
+user_mission_progress and vocabulary_items rows moved into user_archives: one
+zlib-compressed JSON blob per user, no secondary indexes. The hot tables and
+their indexes then only hold learners who are actually around. users,
+user_stats and certificates stay hot, so login and leaderboards still see
+everyone; admin exports read the archived rows from the blob (see export.py).
+
+The first authenticated request of an archived user (login, or a stored token
+hitting any endpoint) restores the rows inside that request's write
+transaction. Restored rows get new ids; a "reset" tombstone makes delta sync
+send the client a full copy instead of a diff (see sync.py).
+
+Each batch is one BEGIN IMMEDIATE transaction that re-checks inactivity, so a
+learner logging in while the job runs is never archived mid-session.
+
+Usage:
+    python archive.py                            # archive users idle ARCHIVE_AFTER_DAYS
+    python archive.py --days 90 --vacuum --report  # ... and measure sizes/latency before and after
+"""
+import json
+import os
+import statistics
+import time
+import zlib
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import select
+
+import models
+import sync
+
+ARCHIVE_AFTER_DAYS = int(os.environ.get("ARCHIVE_AFTER_DAYS", 180))
+BATCH_SIZE = 500
+
+# Tables moved to the archive; ids and change_seq are reassigned on restore
+TABLES = {
+    "progress": models.UserMissionProgress.__table__,
+    "vocabulary": models.VocabularyItem.__table__,
+}
+_SKIP = {"id", "change_seq"}
+
+_CANDIDATES = """
+    SELECT u.id FROM users u LEFT JOIN user_stats s ON s.user_id = u.id
+    WHERE u.archived_at IS NULL
+      AND (s.last_activity_date < ? OR (s.last_activity_date IS NULL AND u.created_at < ?))
+      AND (EXISTS (SELECT 1 FROM user_mission_progress p WHERE p.user_id = u.id)
+           OR EXISTS (SELECT 1 FROM vocabulary_items v WHERE v.user_id = u.id))
+    LIMIT ?
+"""
+
+
+def _columns(table):
+    return [c.name for c in table.columns if c.name not in _SKIP]
+
+
+def _pack(conn, user_ids):
+    """user_id -> (row count, compressed payload) for a batch of users."""
+    marks = ",".join("?" * len(user_ids))
+    packed = {user_id: {} for user_id in user_ids}
+    for kind, table in TABLES.items():
+        columns = _columns(table)
+        for user_id in user_ids:
+            packed[user_id][kind] = {"columns": columns, "rows": []}
+        rows = conn.exec_driver_sql(
+            f"SELECT user_id, {', '.join(columns)} FROM {table.name} WHERE user_id IN ({marks})", tuple(user_ids)
+        )
+        for row in rows:
+            packed[row[0]][kind]["rows"].append(list(row[1:]))
+    return {
+        user_id: (sum(len(p["rows"]) for p in data.values()),
+                  zlib.compress(json.dumps(data, separators=(",", ":"), default=str).encode("utf-8"), 6))
+        for user_id, data in packed.items()
+    }
+
+
+def archive_inactive(engine, days=ARCHIVE_AFTER_DAYS, batch=BATCH_SIZE):
+    """Move inactive users' rows to user_archives; returns (users, rows) archived."""
+    cutoff = (date.today() - timedelta(days=days)).isoformat()
+    users = rows = 0
+    while True:
+        with engine.begin() as conn:
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+            user_ids = [r[0] for r in conn.exec_driver_sql(_CANDIDATES, (cutoff, cutoff, batch))]
+            if not user_ids:
+                break
+            packed = _pack(conn, user_ids)
+            now = str(datetime.utcnow())
+            marks = ",".join("?" * len(user_ids))
+            cursor = conn.connection.cursor()
+            cursor.executemany(
+                "INSERT OR REPLACE INTO user_archives (user_id, archived_at, row_count, payload) VALUES (?, ?, ?, ?)",
+                [(user_id, now, count, payload) for user_id, (count, payload) in packed.items()],
+            )
+            for table in TABLES.values():
+                cursor.execute(f"DELETE FROM {table.name} WHERE user_id IN ({marks})", user_ids)
+            # Their clients get a full sync on return, so per-row tombstones are dead weight
+            cursor.execute(f"DELETE FROM sync_tombstones WHERE user_id IN ({marks}) AND kind IN ('progress', 'vocabulary')",
+                           user_ids)
+            cursor.execute(f"UPDATE users SET archived_at = ? WHERE id IN ({marks})", [now, *user_ids])
+            cursor.close()
+            users += len(user_ids)
+            rows += sum(count for count, _ in packed.values())
+        print(f"Archived {users} users ({rows} rows)...")
+    return users, rows
+
+
+def restore(db, user):
+    """Bring an archived user's rows back into the hot tables (caller commits)."""
+    payload = db.execute(
+        select(models.UserArchive.payload).where(models.UserArchive.user_id == user.id)
+    ).scalar()
+    if payload is not None:
+        data = json.loads(zlib.decompress(payload))
+        cursor = db.connection().connection.cursor()
+        for kind, table in TABLES.items():
+            part = data.get(kind)
+            if not part or not part["rows"]:
+                continue
+            current = set(_columns(table))
+            keep = [i for i, name in enumerate(part["columns"]) if name in current] # schema may have moved on
+            names = [part["columns"][i] for i in keep]
+            cursor.executemany(
+                f"INSERT OR IGNORE INTO {table.name} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})",
+                [[row[i] for i in keep] for row in part["rows"]],
+            )
+        cursor.execute("DELETE FROM user_archives WHERE user_id = ?", (user.id,))
+        sync.mark_reset(cursor, user.id)
+        cursor.close()
+    user.archived_at = None
+    print(f"Restored archived user {user.id}")
+
+
+# --- MEASUREMENT ---
+
+_HOT_TABLES = ("user_mission_progress", "vocabulary_items", "user_archives")
+
+
+def sizes(engine):
+    """Pages used by the hot tables and each of their indexes (dbstat), in KiB."""
+    with engine.connect() as conn:
+        names = set(conn.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE tbl_name IN (%s)" % ",".join("?" * len(_HOT_TABLES)), _HOT_TABLES
+        ).scalars())
+        out = {}
+        for name, kib in conn.exec_driver_sql("SELECT name, sum(pgsize) / 1024 FROM dbstat GROUP BY name"):
+            if name in names:
+                out[name] = kib
+    return out
+
+
+def hot_latency(engine, samples=200):
+    """Median/p95 ms of the per-user queries active learners hit, plus one full-table due scan."""
+    cutoff = (date.today() - timedelta(days=30)).isoformat()
+    with engine.connect() as conn:
+        user_ids = [r[0] for r in conn.exec_driver_sql(
+            "SELECT user_id FROM user_stats WHERE last_activity_date >= ? ORDER BY random() LIMIT ?", (cutoff, samples))]
+        queries = {
+            "progress of a user": ("SELECT * FROM user_mission_progress WHERE user_id = ?", user_ids),
+            "vocabulary of a user": ("SELECT * FROM vocabulary_items WHERE user_id = ?", user_ids),
+            "due reviews (scan)": ("SELECT count(*) FROM vocabulary_items WHERE next_review <= ?",
+                                   [time.time() * 1000] * 5),
+        }
+        report = {}
+        for label, (sql, params) in queries.items():
+            timings = []
+            for p in params:
+                started = time.perf_counter()
+                conn.exec_driver_sql(sql, (p,)).fetchall()
+                timings.append((time.perf_counter() - started) * 1000)
+            if timings:
+                timings.sort()
+                report[label] = (statistics.median(timings), timings[min(len(timings) - 1, int(len(timings) * 0.95))])
+    return report
+
+
+def print_report(engine, title):
+    print(f"--- {title} ---")
+    try:
+        for name, kib in sorted(sizes(engine).items()):
+            print(f"  {name:45s} {kib:>10,} KiB")
+    except Exception as e: # dbstat is a compile-time option of SQLite
+        print(f"  sizes unavailable: {e}")
+    for label, (median, p95) in hot_latency(engine).items():
+        print(f"  {label:45s} median {median:.3f} ms, p95 {p95:.3f} ms")
+
+
+if __name__ == "__main__":
+    import argparse
+    from database import create_all, user_engines
+
+    parser = argparse.ArgumentParser(description="Archive inactive learners")
+    parser.add_argument("--days", type=int, default=ARCHIVE_AFTER_DAYS, help="archive users inactive this long")
+    parser.add_argument("--batch", type=int, default=BATCH_SIZE)
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM afterwards so the freed pages leave the file")
+    parser.add_argument("--report", action="store_true", help="print index sizes and hot-query latency before and after")
+    args = parser.parse_args()
+
+    create_all()
+    for bind in user_engines:
+        name = os.path.basename(bind.url.database)
+        if args.report:
+            print_report(bind, f"{name}: before")
+        users, rows = archive_inactive(bind, args.days, args.batch)
+        print(f"{name}: archived {users} users, {rows} rows")
+        if args.vacuum:
+            with bind.connect() as conn:
+                conn.exec_driver_sql("VACUUM")
+        if args.report:
+            print_report(bind, f"{name}: after")
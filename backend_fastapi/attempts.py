@@ -0,0 +1,186 @@
+"""
+Append-only mission attempt log with batched writes.
+
+submit_mission records every attempt here instead of writing a row per request.
+A background thread flushes the buffer every FLUSH_INTERVAL seconds, or sooner
+once FLUSH_SIZE attempts are waiting. Each flush is one transaction that appends
+to mission_attempts and folds the same attempts into user_daily_activity (an
+upsert per user and day) and the per-mission rollups in mission_stats.py, so
+activity charts and difficulty reports never scan raw attempts.
+
+Durability: the buffer is flushed on app shutdown and at interpreter exit. A
+hard crash can lose at most the last FLUSH_INTERVAL seconds of history; rewards
+and progress are committed by submit_mission itself and are not affected.
+"""
+import atexit
+import hashlib
+import json
+import os
+import threading
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import select
+
+from database import engine
+import models
+import mission_stats
+
+FLUSH_SIZE = int(os.environ.get("ATTEMPT_FLUSH_SIZE", 200))
+FLUSH_INTERVAL = float(os.environ.get("ATTEMPT_FLUSH_INTERVAL", 1.0))
+MAX_DURATION_FACTOR = 3 # longest attempt we count, in multiples of the mission's expected length
+
+_INSERT_ATTEMPTS = (
+    "INSERT INTO mission_attempts (user_id, mission_id, score, duration_sec, answers_digest, created_at) "
+    "VALUES (?, ?, ?, ?, ?, ?)"
+)
+_UPSERT_ACTIVITY = (
+    "INSERT INTO user_daily_activity (user_id, day, attempts, seconds, passed) VALUES (?, ?, ?, ?, ?) "
+    "ON CONFLICT(user_id, day) DO UPDATE SET attempts = attempts + excluded.attempts, "
+    "seconds = seconds + excluded.seconds, passed = passed + excluded.passed"
+)
+
+
+def answers_digest(answers):
+    if answers is None:
+        return None
+    canonical = json.dumps(answers, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def clamp_duration(duration_sec, duration_min):
+    """Client-reported seconds, kept within 0..MAX_DURATION_FACTOR x the mission's expected length.
+
+    A missing or zero value counts as the expected length; a tab left open (or
+    a forged value) must not inflate the activity minutes.
+    """
+    expected = max(duration_min or 0, 1) * 60
+    if not duration_sec:
+        return expected
+    return max(0, min(int(duration_sec), expected * MAX_DURATION_FACTOR))
+
+
+class AttemptLog:
+    def __init__(self, bind, flush_size=FLUSH_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.bind = bind
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._pending = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._stopping = False
+
+    def start(self):
+        if self._thread is None:
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="attempt-log", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopping:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Attempt log flush failed, will retry: {e}")
+
+    def stop(self):
+        """Stop the flusher and write whatever is still buffered."""
+        self._stopping = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.flush()
+
+    def record(self, user_id, mission_id, score, duration_sec, answers=None, passed=False, completed=False):
+        """`completed` marks the learner's first completion of the mission."""
+        row = (user_id, mission_id, float(score), int(duration_sec or 0), answers_digest(answers),
+               datetime.utcnow(), bool(passed), bool(completed))
+        with self._lock:
+            self._pending.append(row)
+            backlog = len(self._pending)
+        if backlog >= self.flush_size:
+            if self._thread is None:
+                self.flush()
+            else:
+                self._wake.set()
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+            rollup = defaultdict(lambda: [0, 0, 0])
+            for user_id, _, _, seconds, _, created_at, passed, _ in batch:
+                bucket = rollup[(user_id, created_at.date().isoformat())]
+                bucket[0] += 1
+                bucket[1] += seconds
+                bucket[2] += int(passed)
+            try:
+                with self.bind.begin() as conn:
+                    cursor = conn.connection.cursor()
+                    cursor.executemany(_INSERT_ATTEMPTS, [
+                        (u, m, s, d, digest, str(created)) for u, m, s, d, digest, created, _, _ in batch
+                    ])
+                    cursor.executemany(_UPSERT_ACTIVITY, [(u, day, *totals) for (u, day), totals in rollup.items()])
+                    mission_stats.apply(cursor, [(m, s, p, c) for _, m, s, _, _, _, p, c in batch])
+                    cursor.close()
+            except Exception:
+                with self._lock:
+                    self._pending[:0] = batch
+                raise
+            return len(batch)
+
+    def pending_for(self, user_id):
+        with self._lock:
+            return [row for row in self._pending if row[0] == user_id]
+
+
+log = AttemptLog(engine)
+atexit.register(log.stop)
+
+
+# --- ACTIVITY QUERIES ---
+
+def daily_activity(db, user_id, days=30):
+    """[{date, attempts, minutes, passed}] for the last `days` days, oldest first, gaps filled."""
+    today = datetime.utcnow().date() # attempts are bucketed by UTC day
+    start = today - timedelta(days=days - 1)
+    A = models.UserDailyActivity
+    totals = {
+        day: [attempts, seconds, passed]
+        for day, attempts, seconds, passed in db.execute(
+            select(A.day, A.attempts, A.seconds, A.passed).where(A.user_id == user_id, A.day >= start)
+        )
+    }
+    # Attempts still in the write buffer, so a chart refreshed right after a submit is current
+    for _, _, _, seconds, _, created_at, passed, _ in log.pending_for(user_id):
+        bucket = totals.setdefault(created_at.date(), [0, 0, 0])
+        bucket[0] += 1
+        bucket[1] += seconds
+        bucket[2] += int(passed)
+
+    series = []
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        attempts, seconds, passed = totals.get(day, (0, 0, 0))
+        series.append({"date": day.isoformat(), "attempts": attempts, "minutes": round(seconds / 60, 1), "passed": passed})
+    return series
+
+
+def heatmap(db, user_id, weeks=26):
+    """Attempts per day as `weeks` columns of 7 rows (Monday first), ending this week."""
+    today = datetime.utcnow().date() # attempts are bucketed by UTC day
+    days = weeks * 7 - (6 - today.weekday())
+    series = daily_activity(db, user_id, days)
+    grid = [[0] * weeks for _ in range(7)]
+    first = today - timedelta(days=days - 1) # always a Monday
+    for entry in series:
+        offset = (date.fromisoformat(entry["date"]) - first).days
+        grid[offset % 7][offset // 7] = entry["attempts"]
+    return {"start": first.isoformat(), "weeks": weeks, "grid": grid}
@@ -0,0 +1,73 @@
+"""
+Per-key request coalescing.
+
+While one request for a key (e.g. a user's profile update) is being written,
+the requests that arrive for the same key are collected into a single follow-up
+batch. When the first request finishes, the batch is merged into one request
+and written once, and every caller in the batch gets the same result (or the
+same exception). A lone request runs immediately with no added latency, so
+coalescing only applies under bursts such as several tabs syncing at once.
+"""
+import threading
+
+
+class _Batch:
+    __slots__ = ("items", "done", "result", "error")
+
+    def __init__(self):
+        self.items = []
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class Coalescer:
+    def __init__(self, merge):
+        self.merge = merge # list of items -> one item
+        self._lock = threading.Lock()
+        self._keys = {} # key -> [running batch, next batch or None]
+        self.stats = {"requests": 0, "writes": 0}
+
+    def submit(self, key, item, execute):
+        """execute(merged_item) runs once per batch; its return value goes to every caller."""
+        with self._lock:
+            self.stats["requests"] += 1
+            state = self._keys.get(key)
+            wait_for = None
+            if state is None:
+                batch = _Batch()
+                state = self._keys[key] = [batch, None]
+                leader = True
+            elif state[1] is None:
+                batch = state[1] = _Batch()
+                wait_for = state[0]
+                leader = True
+            else:
+                batch = state[1]
+                leader = False
+            batch.items.append(item)
+
+        if not leader:
+            batch.done.wait()
+            if batch.error is not None:
+                raise batch.error
+            return batch.result
+
+        if wait_for is not None:
+            wait_for.done.wait()
+            with self._lock:
+                state[0], state[1] = batch, None # stop accepting; later arrivals form the next batch
+        try:
+            with self._lock:
+                items = list(batch.items)
+                self.stats["writes"] += 1
+            batch.result = execute(items[0] if len(items) == 1 else self.merge(items))
+            return batch.result
+        except BaseException as e:
+            batch.error = e
+            raise
+        finally:
+            with self._lock:
+                if state[1] is None:
+                    self._keys.pop(key, None)
+            batch.done.set()
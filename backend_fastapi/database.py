@@ -1,5 +1,7 @@
 import os
-from sqlalchemy import create_engine
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
@@ -7,6 +9,25 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_PATH = os.path.join(BASE_DIR, "sql_app.db")
 SQLALCHEMY_DATABASE_URL = f"sqlite:///{DB_PATH}"
 
+# Optional single-writer mode (see write_queue.py): WAL journal, one dedicated
+# write connection fed by a queue, and a read-only pool for read endpoints.
+SINGLE_WRITER = os.environ.get("SQLITE_SINGLE_WRITER") == "1"
+
+# Optional hash sharding (SQLITE_SHARDS=N > 1): the user-scoped tables live in N
+# files picked by user id, so writes for different users take different SQLite
+# locks. Catalog and everything else stay in sql_app.db, which each shard
+# connection ATTACHes: unqualified names resolve to the shard first, then to the
+# shared file, so joins against missions keep working unchanged. The shard count
+# is fixed once users exist (ids are not rebalanced).
+SHARDS = int(os.environ.get("SQLITE_SHARDS", "1"))
+SHARD_TABLES = {
+    "users", "user_stats", "user_mission_progress", "vocabulary_items", "certificates",
+    "user_archives", "sync_sequence", "sync_tombstones", # archive and sync triggers stay with the rows
+    "user_inventory",
+}
+if SHARDS > 1 and SINGLE_WRITER:
+    raise RuntimeError("SQLITE_SHARDS and SQLITE_SINGLE_WRITER are alternatives, set only one")
+
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
 )
@@ -14,9 +35,198 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+
+def _use_wal(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.close()
+
+
+def make_write_engine(url):
+    """Engine for the writer thread. BEGIN is issued explicitly so SAVEPOINTs nest inside one transaction."""
+    write_engine = create_engine(url, connect_args={"check_same_thread": False}, pool_size=1, max_overflow=0)
+
+    @event.listens_for(write_engine, "connect")
+    def _connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None # pysqlite must not open transactions on its own
+        _use_wal(dbapi_connection, connection_record)
+
+    @event.listens_for(write_engine, "begin")
+    def _begin(conn):
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+    return write_engine
+
+
+def make_read_engine(path, pool_size=8):
+    return create_engine(
+        f"sqlite:///file:{path}?mode=ro&uri=true",
+        connect_args={"check_same_thread": False}, pool_size=pool_size, max_overflow=pool_size,
+    )
+
+
+def make_shard_engine(path, shared_path=DB_PATH, **kwargs):
+    shard_engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False, "timeout": 30}, **kwargs)
+
+    @event.listens_for(shard_engine, "connect")
+    def _attach(dbapi_connection, connection_record):
+        dbapi_connection.execute("ATTACH DATABASE ? AS shared", (shared_path,))
+
+    return shard_engine
+
+
+def shard_for(user_id, shards=SHARDS):
+    # Knuth multiplicative hash: consecutive ids (sign-up order) spread evenly
+    return (user_id * 2654435761 & 0xFFFFFFFF) % shards
+
+
+shard_engines = [make_shard_engine(os.path.join(BASE_DIR, f"sql_app.shard{i}.db")) for i in range(SHARDS)] if SHARDS > 1 else []
+user_engines = shard_engines or [engine] # where the user-scoped tables are
+
+
+if SINGLE_WRITER:
+    event.listen(engine, "connect", _use_wal)
+    write_engine = make_write_engine(SQLALCHEMY_DATABASE_URL)
+    read_engine = make_read_engine(DB_PATH)
+else:
+    write_engine = read_engine = engine
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+def create_all():
+    """create_all() that puts every table in the file it lives in."""
+    if not shard_engines:
+        Base.metadata.create_all(bind=engine)
+        return
+    Base.metadata.create_all(bind=engine, tables=[t for t in Base.metadata.sorted_tables if t.name not in SHARD_TABLES])
+    for shard_engine in shard_engines:
+        Base.metadata.create_all(bind=shard_engine, tables=[t for t in Base.metadata.sorted_tables if t.name in SHARD_TABLES])
+
+
+def route(db, user_id):
+    """Point a session that has not run anything yet at the shard of `user_id` (no-op unsharded)."""
+    if shard_engines:
+        db.bind = shard_engines[shard_for(user_id)]
+    return db
+
+
+def fan_out(fn):
+    """fn(session) on every shard in parallel (once, unsharded); returns the results in shard order."""
+    def run(bind):
+        db = SessionLocal(bind=bind)
+        try:
+            return fn(db)
+        finally:
+            db.close()
+    if len(user_engines) == 1:
+        return [run(user_engines[0])]
+    with ThreadPoolExecutor(max_workers=len(user_engines)) as pool:
+        return list(pool.map(run, user_engines))
+
+
+# Email -> user id directory in the shared file. Sharded, it hands out user ids
+# and keeps emails unique across shards; login uses it to find the shard.
+
+def claim_email(email):
+    """New user id for `email`, or None if it is taken."""
+    try:
+        with engine.begin() as conn:
+            return conn.exec_driver_sql("INSERT INTO user_directory (email) VALUES (?) RETURNING id", (email,)).scalar()
+    except IntegrityError:
+        return None
+
+
+def release_email(user_id):
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DELETE FROM user_directory WHERE id = ?", (user_id,))
+
+
+def lookup_email(email):
+    with engine.connect() as conn:
+        return conn.exec_driver_sql("SELECT id FROM user_directory WHERE email = ?", (email,)).scalar()
+
+
+def change_email(user_id, email):
+    """Move `user_id` to a new email; False if another user has it. Idempotent, so safe to retry."""
+    try:
+        with engine.begin() as conn:
+            conn.exec_driver_sql("UPDATE user_directory SET email = ? WHERE id = ?", (email, user_id))
+        return True
+    except IntegrityError:
+        return False
+
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    import random
+    import tempfile
+    import threading
+    import time
+
+    from sqlalchemy.exc import OperationalError
+
+    import models
+
+    parser = argparse.ArgumentParser(description="Database utilities")
+    parser.add_argument("--bench", type=int, metavar="WRITERS", help="write throughput for 1, 2, 4 and 8 shards")
+    parser.add_argument("--writes", type=int, default=50, help="writes per concurrent writer")
+    parser.add_argument("--users", type=int, default=10000)
+    args = parser.parse_args()
+
+    if args.bench:
+        tables = [models.Base.metadata.tables[name] for name in ("user_stats", "user_mission_progress")]
+        total = args.bench * args.writes
+        for shards in (1, 2, 4, 8):
+            tmp = tempfile.mkdtemp()
+            shared = os.path.join(tmp, "shared.db")
+            create_engine(f"sqlite:///{shared}").dispose()
+            binds = [make_shard_engine(os.path.join(tmp, f"shard{i}.db"), shared, pool_size=args.bench, max_overflow=0)
+                     for i in range(shards)]
+            for i, bind in enumerate(binds):
+                models.Base.metadata.create_all(bind=bind, tables=tables)
+                with bind.begin() as conn:
+                    conn.exec_driver_sql(
+                        "INSERT INTO user_stats (user_id, xp_total, credits, streak) VALUES (?, 0, 0, 0)",
+                        [(u,) for u in range(args.users) if shard_for(u, shards) == i],
+                    )
+            errors = []
+
+            def worker(seed):
+                rng = random.Random(seed)
+                for n in range(args.writes):
+                    user_id = rng.randrange(args.users)
+                    try:
+                        with binds[shard_for(user_id, shards)].begin() as conn:
+                            conn.exec_driver_sql("UPDATE user_stats SET xp_total = xp_total + 1 WHERE user_id = ?", (user_id,))
+                            conn.exec_driver_sql(
+                                "INSERT INTO user_mission_progress (user_id, mission_id, status, attempts) "
+                                "VALUES (?, ?, 'completed', 1)", (user_id, seed * args.writes + n))
+                    except OperationalError as e:
+                        errors.append(e)
+
+            threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.bench)]
+            started = time.perf_counter()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            elapsed = time.perf_counter() - started
+            print(f"{shards} shard(s): {total} writes from {args.bench} threads in {elapsed:.2f}s "
+                  f"({total / elapsed:.0f}/s), {len(errors)} 'database is locked' errors")
+            for bind in binds:
+                bind.dispose()
@@ -0,0 +1,207 @@
+"""
+Distractor index for vocabulary quiz options.
+
+Every vocabulary answer text in the catalog and every translation in users'
+vocabulary banks is placed in a bucket by part of speech. For each word, its
+nearest neighbors are ranked by orthographic similarity (bounded edit
+distance, see transcript.py) plus a bonus for sharing the CEFR level. At
+request time options are a random pick from that list, which is O(1) per
+question.
+
+Updates are incremental. New catalog words get their own neighbor list and are
+offered to existing lists in the same length window; words that disappear from
+the catalog are dropped. Bank words (possibly tens of thousands per import)
+join the candidate pool immediately and build their own list on first use.
+Nothing is recomputed wholesale when content changes.
+
+Grammar sections are not indexed: another question's option often fits the
+same blank ("I ___ a student." with "am" and "was"), so they keep their
+authored options.
+"""
+import bisect
+import heapq
+import random
+import re
+import threading
+from typing import NamedTuple
+
+from sqlalchemy import select
+
+import models
+from transcript import bounded_distance, normalize
+
+NEIGHBORS = 8 # stored per word; options are sampled from these
+WINDOW = 48 # candidates compared on each side in the length-sorted bucket
+LEVEL_BONUS = 0.35
+
+
+class Word(NamedTuple):
+    kind: str # "vocabulary" | "grammar"
+    text: str
+    norm: str
+    level: str # course level, or "user" for vocabulary bank words
+    pos: str
+
+
+def guess_pos(text):
+    """Rough part of speech for Spanish answer texts (good enough to keep buckets coherent)."""
+    t = text.strip().lower()
+    if " " in t:
+        return "phrase"
+    if t.endswith("mente"):
+        return "adverb"
+    if re.search(r"(ar|er|ir)$", t):
+        return "verb"
+    if re.search(r"(oso|osa|ble|ivo|iva|al|ente|ante|ico|ica|ado|ada|ido|ida)$", t):
+        return "adjective"
+    return "noun"
+
+
+class DistractorIndex:
+    def __init__(self):
+        self.words = {} # (kind, norm) -> Word
+        self.buckets = {} # (kind, pos) -> list of (len, norm) kept sorted
+        self.neighbors = {} # (kind, norm) -> [(score, norm), ...] best first
+        self.catalog_keys = set()
+        self._lock = threading.RLock()
+
+    # --- building ---
+
+    def _score(self, a, b):
+        longest = max(len(a.norm), len(b.norm)) or 1
+        bound = longest // 2 + 1
+        distance = bounded_distance(a.norm, b.norm, bound)
+        similarity = 0.0 if distance > bound else 1 - distance / longest
+        return similarity + (LEVEL_BONUS if a.level == b.level else 0.0)
+
+    def _window(self, word):
+        bucket = self.buckets.get((word.kind, word.pos), [])
+        i = bisect.bisect_left(bucket, (len(word.norm), word.norm))
+        return bucket[max(0, i - WINDOW): i + WINDOW]
+
+    def _compute(self, key):
+        word = self.words[key]
+        scored = (
+            (self._score(word, self.words[(word.kind, norm)]), norm)
+            for _, norm in self._window(word)
+            if norm != word.norm
+        )
+        self.neighbors[key] = heapq.nlargest(NEIGHBORS, scored)
+
+    def add(self, kind, text, level, pos=None):
+        """Add one answer text; returns its key if it was new."""
+        norm = normalize(text)
+        if not norm:
+            return None
+        key = (kind, norm)
+        with self._lock:
+            if key in self.words:
+                return None
+            word = Word(kind, text, norm, level, pos or (kind if kind == "grammar" else guess_pos(text)))
+            self.words[key] = word
+            bucket = self.buckets.setdefault((kind, word.pos), [])
+            bucket.insert(bisect.bisect_left(bucket, (len(norm), norm)), (len(norm), norm))
+            return key
+
+    def link(self, new_keys):
+        """Compute neighbor lists for new words and offer them to nearby existing lists."""
+        with self._lock:
+            for key in new_keys:
+                self._compute(key)
+            for key in new_keys:
+                word = self.words[key]
+                for _, norm in self._window(word):
+                    other = (word.kind, norm)
+                    if other in new_keys or other not in self.neighbors:
+                        continue
+                    current = self.neighbors[other]
+                    score = self._score(self.words[other], word)
+                    if len(current) < NEIGHBORS or score > current[-1][0]:
+                        current.append((score, word.norm))
+                        current.sort(reverse=True)
+                        del current[NEIGHBORS:]
+
+    def remove(self, key):
+        with self._lock:
+            word = self.words.pop(key, None)
+            if word is None:
+                return
+            bucket = self.buckets.get((word.kind, word.pos), [])
+            i = bisect.bisect_left(bucket, (len(word.norm), word.norm))
+            if i < len(bucket) and bucket[i] == (len(word.norm), word.norm):
+                bucket.pop(i)
+            self.neighbors.pop(key, None)
+            self.catalog_keys.discard(key)
+
+    def refresh_catalog(self, db):
+        """Sync with the seeded catalog; only changed words are (re)linked."""
+        seen = set()
+        new_keys = set()
+        rows = db.execute(
+            select(models.MissionSection.key, models.MissionSection.payload_json, models.Course.level)
+            .join(models.Mission, models.Mission.id == models.MissionSection.mission_id)
+            .join(models.Course, models.Course.id == models.Mission.course_id)
+            .where(models.MissionSection.key == "vocabulary")
+        )
+        for kind, payload, level in rows:
+            if not isinstance(payload, dict):
+                continue
+            texts = list(payload.get("options") or [])
+            if payload.get("correct"):
+                texts.append(payload["correct"])
+            for text in texts:
+                key = self.add(kind, str(text), level)
+                if key:
+                    new_keys.add(key)
+                seen.add((kind, normalize(text)))
+        for key in self.catalog_keys - seen:
+            self.remove(key)
+        self.catalog_keys = seen
+        self.link(new_keys)
+        return len(new_keys)
+
+    def add_user_words(self, translations):
+        """Bank words join the candidate pool right away; their own lists are built on first use."""
+        return sum(1 for t in translations if t and self.add("vocabulary", t, "user"))
+
+    def load_user_banks(self, db, batch=5000):
+        """Stream every distinct bank translation into the index."""
+        result = db.execute(
+            select(models.VocabularyItem.translation).distinct().execution_options(yield_per=batch)
+        ).scalars()
+        chunk = []
+        added = 0
+        for translation in result:
+            chunk.append(translation)
+            if len(chunk) >= batch:
+                added += self.add_user_words(chunk)
+                chunk = []
+        return added + self.add_user_words(chunk)
+
+    # --- serving ---
+
+    def options(self, kind, answer, count=3, rng=random):
+        """`count` distractors for `answer` plus the answer itself, shuffled."""
+        norm = normalize(answer)
+        key = (kind, norm)
+        if key not in self.words:
+            new_key = self.add(kind, answer, "user")
+            if new_key:
+                self.link({new_key})
+        # Under the lock: the startup thread may be adding bank words to the buckets
+        with self._lock:
+            if key not in self.neighbors and key in self.words:
+                self._compute(key) # bank words are linked lazily, on first use
+            pool = [n for _, n in self.neighbors.get(key, ()) if (kind, n) in self.words]
+            picked = rng.sample(pool, count) if len(pool) >= count else pool
+            for (bucket_kind, _), bucket in list(self.buckets.items()):
+                if len(picked) >= count:
+                    break
+                if bucket_kind == kind:
+                    picked += [n for _, n in bucket[:count * 2] if n != norm and n not in picked][:count - len(picked)]
+            options = [self.words[(kind, n)].text for n in picked] + [answer]
+        rng.shuffle(options)
+        return options
+
+
+index = DistractorIndex()
@@ -0,0 +1,232 @@
+"""
+Live per-user updates over server-sent events (GET /me/events).
+
+Write paths publish small deltas after their transaction commits:
+
+    stats              {"xp", "credits", "streak", "xp_gained", "credits_gained"}
+    mission_unlocked   {"mission_id"}
+    certificate        {"id", "title", "level", "date"}
+
+so the dashboard no longer re-fetches /stats and /courses after every submit.
+The pub/sub is in-process: publish() runs on request threads and hands each
+event to the subscribers' event loop with call_soon_threadsafe; a stream is an
+async generator waiting on an asyncio.Event, so an idle connection costs a
+small object and one parked coroutine, not a thread.
+
+Memory per connection is bounded: at most MAX_PENDING undelivered events are
+kept, a newer "stats" replaces a pending one (the totals are absolute), and on
+overflow the backlog is dropped for a single "resync" event telling the client
+to catch up through GET /sync. The first event, "ready", carries the sync
+cursor read before subscribing, for the same reason.
+
+Limits (env): EVENT_STREAMS_MAX connections per process (503 beyond),
+EVENT_STREAMS_PER_USER (429 beyond), EVENT_KEEPALIVE_SECONDS.
+
+Only subscribers of the publishing process are reached. That is the whole
+audience under a single uvicorn worker; with several workers, or behind
+Passenger (a2wsgi holds a WSGI thread per open stream, so keep the limit low
+there), clients still get "resync"/reconnects and fall back to /sync.
+
+Usage:
+    python events.py --bench 10000   # idle connections through the ASGI response, memory and fan-out time
+"""
+import asyncio
+import itertools
+import json
+import os
+import threading
+from collections import deque
+
+MAX_STREAMS = int(os.environ.get("EVENT_STREAMS_MAX", 10_000))
+MAX_PER_USER = int(os.environ.get("EVENT_STREAMS_PER_USER", 5))
+KEEPALIVE_SECONDS = float(os.environ.get("EVENT_KEEPALIVE_SECONDS", 25))
+MAX_PENDING = 16
+RETRY_MS = 5000 # EventSource reconnect delay
+
+
+def _format(event_id, event_type, data):
+    head = f"id: {event_id}\n" if event_id else ""
+    return f"{head}event: {event_type}\ndata: {data}\n\n"
+
+
+class Subscription:
+    __slots__ = ("user_id", "loop", "pending", "wakeup", "overflowed")
+
+    def __init__(self, user_id, loop):
+        self.user_id = user_id
+        self.loop = loop
+        self.pending = deque()
+        self.wakeup = asyncio.Event()
+        self.overflowed = False
+
+    def push(self, item):
+        """Queue (id, type, json) for delivery; runs on the subscriber's loop."""
+        if item[1] == "stats":
+            for i, queued in enumerate(self.pending):
+                if queued[1] == "stats":
+                    self.pending[i] = item
+                    self.wakeup.set()
+                    return
+        if len(self.pending) >= MAX_PENDING:
+            self.pending.clear()
+            self.overflowed = True
+        else:
+            self.pending.append(item)
+        self.wakeup.set()
+
+
+class Broker:
+    def __init__(self, max_streams=MAX_STREAMS, max_per_user=MAX_PER_USER, keepalive=KEEPALIVE_SECONDS):
+        self.max_streams = max_streams
+        self.max_per_user = max_per_user
+        self.keepalive = keepalive
+        self._lock = threading.Lock()
+        self._subs = {} # user_id -> [Subscription]
+        self._ids = itertools.count(1)
+        self.connections = 0
+        self.stats = {"published": 0, "delivered": 0, "resyncs": 0, "rejected": 0}
+
+    def admit(self, user_id):
+        """None when a new stream may open, else (status code, detail)."""
+        with self._lock:
+            if self.connections >= self.max_streams:
+                reason = (503, "Too many open event streams, poll instead")
+            elif len(self._subs.get(user_id, ())) >= self.max_per_user:
+                reason = (429, "Too many event streams for this user")
+            else:
+                return None
+            self.stats["rejected"] += 1
+            return reason
+
+    def publish(self, user_id, event_type, data):
+        """Thread-safe; call after the write committed."""
+        with self._lock:
+            subs = list(self._subs.get(user_id, ()))
+            self.stats["published"] += 1
+            self.stats["delivered"] += len(subs)
+        if not subs:
+            return
+        item = (next(self._ids), event_type, json.dumps(data, separators=(",", ":")))
+        for sub in subs:
+            try:
+                sub.loop.call_soon_threadsafe(sub.push, item)
+            except RuntimeError: # loop already closed, the stream is going away
+                pass
+
+    def _subscribe(self, user_id):
+        sub = Subscription(user_id, asyncio.get_running_loop())
+        with self._lock:
+            self._subs.setdefault(user_id, []).append(sub)
+            self.connections += 1
+        return sub
+
+    def _unsubscribe(self, sub):
+        with self._lock:
+            subs = self._subs.get(sub.user_id, [])
+            if sub in subs:
+                subs.remove(sub)
+                self.connections -= 1
+            if not subs:
+                self._subs.pop(sub.user_id, None)
+
+    async def stream(self, user_id, ready):
+        """SSE body for StreamingResponse; ends when the client disconnects."""
+        sub = self._subscribe(user_id)
+        try:
+            yield f"retry: {RETRY_MS}\n" + _format(None, "ready", json.dumps(ready))
+            while True:
+                try:
+                    await asyncio.wait_for(sub.wakeup.wait(), self.keepalive)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n" # also lets proxies and the server notice dead peers
+                    continue
+                sub.wakeup.clear()
+                chunk = "".join(_format(*item) for item in sub.pending)
+                sub.pending.clear()
+                if sub.overflowed:
+                    sub.overflowed = False
+                    self.stats["resyncs"] += 1
+                    chunk = _format(None, "resync", "{}")
+                if chunk:
+                    yield chunk
+        finally:
+            self._unsubscribe(sub)
+
+    def snapshot(self):
+        with self._lock:
+            return {**self.stats, "connections": self.connections, "users": len(self._subs),
+                    "max_streams": self.max_streams, "max_per_user": self.max_per_user}
+
+
+broker = Broker()
+
+
+# --- BENCHMARK ---
+
+async def _bench(connections, rounds):
+    import time
+    import tracemalloc
+    from starlette.responses import StreamingResponse
+
+    bench = Broker(max_streams=connections, keepalive=KEEPALIVE_SECONDS)
+    received = [0] * connections
+    first_chunk = [asyncio.Event() for _ in range(connections)]
+    disconnect = asyncio.Event()
+
+    async def receive():
+        await disconnect.wait()
+        return {"type": "http.disconnect"}
+
+    def sender(i):
+        async def send(message):
+            if message["type"] == "http.response.body" and message.get("body"):
+                received[i] += 1
+                first_chunk[i].set()
+        return send
+
+    async def connect(i):
+        response = StreamingResponse(bench.stream(i, {"cursor": "0"}), media_type="text/event-stream")
+        scope = {"type": "http", "method": "GET", "path": "/me/events", "headers": [], "asgi": {"version": "3.0"}}
+        await response(scope, receive, sender(i))
+
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    tasks = [asyncio.create_task(connect(i)) for i in range(connections)]
+    for event in first_chunk:
+        await event.wait()
+    opened = time.perf_counter() - started
+    await asyncio.sleep(0.5)
+    per_conn = (tracemalloc.get_traced_memory()[0] - base) / connections
+    tracemalloc.stop() # tracing would dominate the fan-out timings
+    print(f"open: {connections} streams in {opened:.2f}s, {per_conn / 1024:.1f} KiB traced per idle connection")
+
+    loop = asyncio.get_running_loop()
+    for r in range(rounds):
+        before = sum(received)
+        started = time.perf_counter()
+        # Publish from another thread, like the sync endpoints do
+        await loop.run_in_executor(None, lambda: [
+            bench.publish(i, "stats", {"xp": r, "credits": 0, "streak": 1}) for i in range(connections)])
+        while sum(received) - before < connections:
+            await asyncio.sleep(0.005)
+        print(f"fan-out round {r + 1}: {connections} events delivered in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    for _ in range(MAX_PENDING * 2): # a stalled consumer (loop busy) still keeps a bounded backlog
+        bench.publish(0, "mission_unlocked", {"mission_id": 1})
+    await asyncio.sleep(0.1)
+    disconnect.set()
+    await asyncio.gather(*tasks)
+    print(f"closed: {bench.snapshot()}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Event stream utilities")
+    parser.add_argument("--bench", type=int, metavar="CONNECTIONS")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.bench:
+        asyncio.run(_bench(args.bench, args.rounds))
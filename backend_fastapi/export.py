@@ -0,0 +1,131 @@
+"""
+NDJSON export of learner data.
+
+Every record is one JSON object per line with a "type" field (user, stats,
+mission_progress, vocabulary, certificate, inventory). Rows are read through server-side
+cursors (yield_per) and encoded as they arrive, so memory stays constant no
+matter how long a learner's history is.
+
+Progress and vocabulary of archived learners (see archive.py) are read from
+their user_archives blob, one user at a time, and follow the hot rows of the
+same type. They carry "archived": true and no id/change_seq, which the archive
+does not keep.
+
+Usage:
+    python export.py --all exports/all_users.ndjson.gz
+    python export.py --user-id 42 user42.ndjson
+"""
+import argparse
+import gzip
+import json
+import zlib
+
+from sqlalchemy import select
+
+from database import SessionLocal, route, user_engines
+import models
+
+YIELD_PER = 1000
+
+# (record type, model, columns left out of the export)
+EXPORT_TABLES = [
+    ("user", models.User, {"hashed_password"}),
+    ("stats", models.UserStats, set()),
+    ("mission_progress", models.UserMissionProgress, set()),
+    ("vocabulary", models.VocabularyItem, set()),
+    ("certificate", models.Certificate, set()),
+    ("inventory", models.UserInventory, set()),
+]
+
+# record type -> part of the user_archives payload (archive.TABLES) holding more of its rows
+ARCHIVED_PARTS = {"mission_progress": "progress", "vocabulary": "vocabulary"}
+
+
+def _columns(model, excluded):
+    return [c for c in model.__table__.columns if c.name not in excluded]
+
+
+def _dump(record_type, row):
+    return (json.dumps({"type": record_type, **row}, default=str, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def iter_records(db, user_id=None):
+    """Yield encoded NDJSON lines for one user, or for everyone when user_id is None.
+
+    The full export reads each table exactly once (per shard), in table order.
+    """
+    for record_type, model, excluded in EXPORT_TABLES:
+        query = select(*_columns(model, excluded))
+        if user_id is not None:
+            key = model.id if model is models.User else model.user_id
+            query = query.where(key == user_id)
+        result = db.execute(query.execution_options(yield_per=YIELD_PER)).mappings()
+        for row in result:
+            yield _dump(record_type, row)
+        if record_type in ARCHIVED_PARTS:
+            yield from _iter_archived(db, record_type, user_id)
+
+
+def _iter_archived(db, record_type, user_id=None):
+    """Rows of one type kept in user_archives; each payload is decompressed on its own."""
+    A = models.UserArchive
+    query = select(A.user_id, A.payload)
+    if user_id is not None:
+        query = query.where(A.user_id == user_id)
+    for owner, payload in db.execute(query.execution_options(yield_per=YIELD_PER)):
+        part = json.loads(zlib.decompress(payload)).get(ARCHIVED_PARTS[record_type]) or {}
+        columns = part.get("columns") or []
+        for values in part.get("rows") or []:
+            yield _dump(record_type, {"user_id": owner, **dict(zip(columns, values)), "archived": True})
+
+
+def stream_user_export(user_id):
+    """Generator for StreamingResponse; owns its session so it outlives the request scope."""
+    db = route(SessionLocal(), user_id)
+    try:
+        yield from iter_records(db, user_id)
+    finally:
+        db.close()
+
+
+def iter_all_records():
+    """Every user, one shard after another when user data is sharded."""
+    for bind in user_engines:
+        db = SessionLocal(bind=bind)
+        try:
+            yield from iter_records(db)
+        finally:
+            db.close()
+
+
+def stream_all_users_gzip():
+    """Gzip-compressed full export, compressed incrementally in one pass."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) # 31 = gzip container
+    buffer = []
+    size = 0
+    for line in iter_all_records():
+        buffer.append(line)
+        size += len(line)
+        if size >= 64 * 1024:
+            chunk = compressor.compress(b"".join(buffer))
+            buffer, size = [], 0
+            if chunk:
+                yield chunk
+    yield compressor.compress(b"".join(buffer)) + compressor.flush()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export learner data as NDJSON")
+    parser.add_argument("output")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--all", action="store_true", help="export every user (gzip if output ends in .gz)")
+    group.add_argument("--user-id", type=int)
+    args = parser.parse_args()
+
+    opener = gzip.open if args.output.endswith(".gz") else open
+    count = 0
+    with opener(args.output, "wb") as f:
+        for line in iter_all_records() if args.all else stream_user_export(args.user_id):
+            f.write(line)
+            count += 1
+    print(f"Exported {count} records to {args.output}")
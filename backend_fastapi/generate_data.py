@@ -0,0 +1,229 @@
+"""
+Synthetic learner data at production scale, for capacity testing.
+
+Creates N users on top of the seeded catalog, with user_stats,
+user_mission_progress, vocabulary_items and certificates drawn from skewed
+distributions that resemble real usage:
+
+  * progression depth: a third of sign-ups never finish a mission; the rest
+    follow a geometric drop-off through the catalog (course by course, tracks
+    interleaved), with the next mission left "unlocked"
+  * scores 70-100 skewed high, attempts geometric, streaks heavy-tailed
+    (Pareto), last activity mostly recent
+  * vocabulary: the words of completed vocabulary missions, plus a log-normal
+    imported bank for ~10% of users; review dates spread around "now"
+  * one certificate per completed course
+
+Output is deterministic for a given --seed, --now, N and catalog: every date
+is taken relative to --now (default: the current time), never the clock. Rows go in as tuples
+through executemany, one transaction per batch. The vocabulary FTS triggers are
+dropped during the load and the index is rebuilt once at the end; the delta sync
+triggers are dropped too, so generated rows keep change_seq 0 (full sync only).
+
+Usage:
+    python generate_data.py --users 1000000
+    python generate_data.py --users 50000 --seed 7 --batch 20000 --now 2026-01-01T12:00:00
+"""
+import argparse
+import math
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, func
+
+from database import engine, SessionLocal, Base
+import models
+import search
+import sync
+
+BATCH_SIZE = 10000
+DAY_MS = 86_400_000
+SHARED_PASSWORD = "synthetic-password" + "notreallyhashed"
+
+_INSERT_SQL = {
+    "users": "INSERT INTO users (id, email, hashed_password, name, age, theme, inventory, is_active, created_at, "
+             "english_level, daily_goal_min) VALUES (?, ?, ?, ?, ?, 'default', '[]', 1, ?, ?, ?)",
+    "stats": "INSERT INTO user_stats (user_id, credits, xp_total, streak, last_activity_date) VALUES (?, ?, ?, ?, ?)",
+    "progress": "INSERT INTO user_mission_progress (user_id, mission_id, status, score, xp_earned, attempts, "
+                "completed_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+    "vocab": "INSERT INTO vocabulary_items (user_id, word, translation, example, next_review, interval, ease_factor, streak) "
+             "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+    "certs": "INSERT INTO certificates (user_id, title, level, date_awarded) VALUES (?, ?, ?, ?)",
+    "inventory": "INSERT INTO user_inventory (user_id, item_id, qty) VALUES (?, ?, ?)",
+}
+_TRIGGERS = (*search.VOCABULARY_TRIGGERS, *sync.TRIGGERS)
+
+LEVELS = ["A1", "A2", "B1", "B2"]
+INVENTORY_ITEMS = ["streak_freeze", "shield_1", "theme_dark_pro", "avatar_astronaut"]
+BANK_WORDS = [f"{stem}{suffix}" for stem in (
+    "travel", "market", "window", "garden", "letter", "doctor", "bridge", "planet", "jacket", "pencil",
+    "island", "forest", "engine", "silver", "answer", "corner", "mirror", "basket", "ticket", "candle",
+) for suffix in ("", "s", "er", "ing", "ed")]
+
+
+class Catalog:
+    """Missions in the order a learner meets them, plus what completing each one yields."""
+
+    def __init__(self, db):
+        courses = db.query(models.Course).order_by(models.Course.order_index).all()
+        self.sequence = [] # (mission_id, course_index, duration_min)
+        self.course_sizes = []
+        self.courses = [(c.title, c.level) for c in courses]
+        self.words = {} # mission_id -> [(word, translation, example)]
+        for ci, course in enumerate(courses):
+            tracks = [list(t.missions) for t in course.tracks]
+            size = 0
+            for depth in range(max((len(t) for t in tracks), default=0)):
+                for missions in tracks:
+                    if depth < len(missions):
+                        m = missions[depth]
+                        self.sequence.append((m.id, ci, m.duration_min or 5))
+                        size += 1
+            self.course_sizes.append(size)
+        for mission_id, payload in db.execute(
+            select(models.MissionSection.mission_id, models.MissionSection.payload_json)
+            .where(models.MissionSection.key == "vocabulary")
+        ):
+            if isinstance(payload, dict) and payload.get("word"):
+                self.words.setdefault(mission_id, []).append(
+                    (payload["word"], payload.get("translation", ""), payload.get("example") or f"The word is {payload['word']}")
+                )
+
+
+class Generator:
+    def __init__(self, catalog, seed, first_id, now):
+        """`now` (naive UTC) is the reference for review dates, last activity and timestamps."""
+        self.catalog = catalog
+        self.rng = random.Random(seed)
+        self.next_id = first_id
+        self.now = str(now)
+        self.today = now.date()
+        self.now_ms = now.replace(tzinfo=timezone.utc).timestamp() * 1000
+        self.mean_depth = max(1.0, len(catalog.sequence) * 0.2)
+        # Per-row draws come from pools sampled once; the distributions stay, the cost per row drops
+        pool = random.Random(seed + 1)
+        self.scores = [round(70 + 30 * pool.betavariate(2.5, 1.2), 1) for _ in range(4096)]
+        self.eases = [round(min(3.0, max(1.3, pool.gauss(2.5, 0.3))), 2) for _ in range(4096)]
+        self.intervals = [pool.choice((1, 1, 2, 3, 6, 10, 17, 30, 60)) for _ in range(4096)]
+        self.review_streaks = [pool.randint(0, 8) for _ in range(4096)]
+
+    def _depth(self):
+        rng = self.rng
+        if rng.random() < 0.33:
+            return 0
+        depth = 1 + int(-math.log(1 - rng.random()) * self.mean_depth)
+        return min(depth, len(self.catalog.sequence))
+
+    def user(self, rows):
+        rng = self.rng
+        uid = self.next_id
+        self.next_id += 1
+        created = datetime(2024, 1, 1) + timedelta(seconds=rng.randrange(0, 600 * 86400))
+        depth = self._depth()
+        rows["users"].append((
+            uid, f"synthetic{uid}@example.com", SHARED_PASSWORD, f"Learner {uid}", rng.randint(8, 70),
+            str(created), rng.choice(LEVELS), rng.choice((5, 10, 15, 20)),
+        ))
+        for item in INVENTORY_ITEMS:
+            if rng.random() < 0.08:
+                rows["inventory"].append((uid, item, 1))
+
+        # Progress: completed prefix of the catalog, next mission unlocked
+        now = self.now
+        done_per_course = [0] * len(self.catalog.course_sizes)
+        for mission_id, ci, _ in self.catalog.sequence[:depth]:
+            score = self.scores[rng.getrandbits(12)]
+            attempts = 1 + int(-math.log(1 - rng.random()) * 0.6)
+            rows["progress"].append((uid, mission_id, "completed", score, 25, attempts, now, now))
+            done_per_course[ci] += 1
+            for word in self.catalog.words.get(mission_id, ()):
+                rows["vocab"].append(self._vocab(uid, *word))
+        if depth < len(self.catalog.sequence):
+            rows["progress"].append((uid, self.catalog.sequence[depth][0], "unlocked", 0.0, 0, 0, None, now))
+
+        courses_done = 0
+        for ci, (done, size) in enumerate(zip(done_per_course, self.catalog.course_sizes)):
+            if size and done == size:
+                courses_done += 1
+                title, level = self.catalog.courses[ci]
+                rows["certs"].append((uid, title, level, (created.date() + timedelta(days=rng.randint(7, 300))).isoformat()))
+
+        # Imported banks (a minority of users, log-normal size)
+        if rng.random() < 0.1:
+            for i in range(min(2000, int(rng.lognormvariate(4.0, 1.0)))):
+                word = rng.choice(BANK_WORDS)
+                rows["vocab"].append(self._vocab(uid, f"{word} {i}", word.upper(), None))
+
+        active = depth > 0
+        streak = min(365, int(rng.paretovariate(1.3)) - 1) if active else 0
+        last_active = self.today - timedelta(days=int(rng.expovariate(1 / 20))) if active else None
+        credits = max(0, 25 * depth + 100 * courses_done - rng.randint(0, 25 * depth + 1))
+        rows["stats"].append((uid, credits, 25 * depth, streak, last_active.isoformat() if last_active else None))
+
+    def _vocab(self, uid, word, translation, example):
+        # Independent draws: due date, interval, ease and streak are unrelated across words
+        rng = self.rng
+        return (uid, word, translation, example, self.now_ms + (rng.random() * 60 - 30) * DAY_MS,
+                self.intervals[rng.getrandbits(12)], self.eases[rng.getrandbits(12)],
+                self.review_streaks[rng.getrandbits(12)])
+
+
+def generate(n_users, seed=42, batch_size=BATCH_SIZE, now=None):
+    now = now or datetime.utcnow()
+    Base.metadata.create_all(bind=engine)
+    search.ensure_schema(engine)
+    sync.ensure_schema(engine)
+    db = SessionLocal()
+    try:
+        if not db.query(models.Mission).first():
+            from main import seed_courses # catalog first; importing main is only needed here
+            seed_courses(db)
+        catalog = Catalog(db)
+        first_id = (db.query(func.max(models.User.id)).scalar() or 0) + 1
+    finally:
+        db.close()
+    print(f"Generating {n_users} users from id {first_id} over {len(catalog.sequence)} missions (seed {seed})...")
+
+    gen = Generator(catalog, seed, first_id, now)
+    started = time.time()
+    counts = dict.fromkeys(_INSERT_SQL, 0)
+    with engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA synchronous=OFF")
+        for trigger in _TRIGGERS:
+            conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {trigger}")
+        conn.commit()
+        try:
+            done = 0
+            while done < n_users:
+                rows = {name: [] for name in _INSERT_SQL}
+                for _ in range(min(batch_size, n_users - done)):
+                    gen.user(rows)
+                done += len(rows["users"])
+                cursor = conn.connection.cursor()
+                for name, sql in _INSERT_SQL.items():
+                    cursor.executemany(sql, rows[name])
+                    counts[name] += len(rows[name])
+                cursor.close()
+                conn.commit()
+                elapsed = time.time() - started
+                print(f"Progress: {done} users in {elapsed:.1f}s ({done / elapsed:,.0f} users/s)")
+        finally:
+            print("Rebuilding vocabulary search index...")
+            conn.exec_driver_sql("INSERT INTO search_vocabulary(search_vocabulary) VALUES ('rebuild')")
+            conn.commit()
+            search.ensure_schema(engine) # puts the triggers back
+            sync.ensure_schema(engine)
+    elapsed = time.time() - started
+    print(f"Done in {elapsed:.1f}s: " + ", ".join(f"{n} {name}" for name, n in counts.items()))
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic learners for capacity testing")
+    parser.add_argument("--users", type=int, required=True)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch", type=int, default=BATCH_SIZE)
+    parser.add_argument("--now", type=datetime.fromisoformat, help="reference time (UTC, ISO) for all dates, default now")
+    args = parser.parse_args()
+    generate(args.users, args.seed, args.batch, args.now)
@@ -0,0 +1,402 @@
+"""
+Server-side proxy for AI lesson and tutor generation, with a shared cache.
+
+The browser used to call the model directly, so every learner paid for the
+same lesson again. POST /ai/lesson and /ai/chat now build the prompt here and
+go through three layers before the backend is called:
+
+  * a content-addressed key: sha256 of the normalized request (topic case-
+    and whitespace-folded, message whitespace-folded, level upper-cased, age
+    reduced to the adult/kid audience the prompt actually depends on) plus
+    backend and model; the model still gets the topic as the learner typed it
+  * single-flight: concurrent identical requests wait for the one generation
+    already running and share its result (or its error)
+  * an in-memory LRU of AI_CACHE_ENTRIES entries backed by one JSON file per
+    key under AI_CACHE_DIR; both expire after AI_CACHE_TTL seconds
+
+Failures are never cached.
+
+The backend is pluggable through AI_BACKEND: "gemini" (REST API, needs
+GEMINI_API_KEY), "stub" (deterministic local output, for tests and offline
+development) or "package.module:attr" for anything else with the same
+generate(kind, request) method. The default is gemini when a key is set,
+otherwise stub.
+
+Usage:
+    python generation.py --bench 50   # concurrent identical lesson requests against the stub
+"""
+import hashlib
+import importlib
+import json
+import os
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import OrderedDict
+
+CACHE_DIR = os.environ.get("AI_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "ai_cache"))
+CACHE_ENTRIES = int(os.environ.get("AI_CACHE_ENTRIES", 512))
+CACHE_TTL = float(os.environ.get("AI_CACHE_TTL", 7 * 86400))
+MODEL = os.environ.get("AI_MODEL", "gemini-2.0-flash")
+TIMEOUT = float(os.environ.get("AI_TIMEOUT", 60))
+
+
+class GenerationError(Exception):
+    pass
+
+
+# --- PROMPTS ---
+
+CEFR_GUIDELINES = """
+STRICTLY ADHERE TO THIS CEFR LEVEL: {level}
+
+- If A1 (Beginner): Focus on introducing oneself, asking basic personal questions, everyday phrases. Speak slowly/simply.
+- If A2 (Pre-intermediate): Describe surroundings, family, routines. Simple terms.
+- If B1 (Intermediate): Travel topics, opinions, understanding main points of texts.
+- If B2 (Upper-intermediate): Fluent conversation, complex texts, wide range of subjects.
+- If C1 (Advanced): Social, academic, professional contexts. Fluent and spontaneous.
+- If C2 (Expert): Near-native command, complex structures, nuance.
+"""
+
+ADULT_INSTRUCTION = """You are 'Pro English Coach', a sophisticated linguistics expert designed for career-focused adults.
+{guidelines}
+Target Audience: Adult.
+Tone: Professional, Concise, Encouraging, Practical.
+Style: Use a "SaaS Dashboard" or "Corporate Training" tone. Focus on real-world application (Business, Travel, Socializing).
+
+Structure:
+1. Concept Brief: Clear grammar rule or communication strategy.
+2. Key Vocabulary: 8-12 high-value words useful for professionals/travelers.
+3. Usage Scenarios: How to use this in a meeting, email, or trip.
+4. Assessment: A quiz checking for nuance and correctness.
+"""
+
+KID_INSTRUCTION = """You are 'Commander Nova' from the 'Inglés Genius Space Academy'.
+{guidelines}
+Target Audience: Child.
+Tone: Super energetic, Gamified, Emoji-rich 🚀🌟.
+Style: Use a "Space Adventure" theme. The user is a 'Cadet'. The lesson is a 'Mission'.
+
+Structure:
+1. Mission Briefing: Explain the concept using a space or adventure analogy.
+2. Gear (Vocabulary): 6-8 words. Keep definitions simple and fun.
+3. Fun Fact: A cool fact related to the topic or space.
+4. Flight Check (Quiz): Interactive questions to verify mission readiness.
+"""
+
+TUTOR_INSTRUCTION = """You are an English Tutor. User Level: {level}.
+Adjust your vocabulary and grammar complexity strictly to this CEFR level.
+If A1/A2, use simple words. If C1/C2, use sophisticated language.
+If the user uploads an image, describe it in English suitable for their level and ask a question about it."""
+
+_STR = {"type": "STRING"}
+
+
+def _described(description):
+    return {"type": "STRING", "description": description}
+
+
+LESSON_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "title": _described("Title of the lesson"),
+        "emoji": _described("A single emoji representing the topic"),
+        "objective": _described("A short objective statement for the lesson."),
+        "explanation_es": _described("Detailed explanation in Spanish adapted to the CEFR level."),
+        "explanation_en": _described("Detailed explanation in English adapted to the CEFR level."),
+        "activeProduction": _described("A task for the user to write a sentence or paragraph using the learned concepts."),
+        "vocabulary": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {"word": _STR, "translation": _STR, "example": _described("Example sentence using the word")},
+                "required": ["word", "translation", "example"],
+            },
+            "description": "List of 8-12 vocabulary items.",
+        },
+        "quiz": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {"question": _STR, "options": {"type": "ARRAY", "items": _STR}, "correctAnswer": _STR,
+                               "explanation": _described("Brief explanation of why the answer is correct.")},
+                "required": ["question", "options", "correctAnswer", "explanation"],
+            },
+            "description": "A quiz with 5-8 questions.",
+        },
+    },
+    "required": ["title", "emoji", "objective", "explanation_es", "explanation_en", "activeProduction", "vocabulary", "quiz"],
+}
+
+
+def _fold(text):
+    return re.sub(r"\s+", " ", (text or "").strip())
+
+
+def lesson_request(level, topic, age):
+    """Lesson request with only what changes the prompt; the topic goes to the model as typed."""
+    return {
+        "level": (level or "A1").strip().upper(),
+        "topic": (topic or "").strip(),
+        "audience": "adult" if (age or 0) >= 18 else "kid",
+    }
+
+
+def chat_request(level, message, history, attachment=None):
+    return {
+        "level": (level or "A1").strip().upper(),
+        "message": _fold(message),
+        "history": [{"role": h.get("role"), "text": _fold(" ".join(p.get("text", "") for p in h.get("parts", [])))}
+                    for h in history or []],
+        # The image itself is part of the request, but only its digest goes into the key
+        "attachment": attachment,
+    }
+
+
+# --- BACKENDS ---
+
+class StubBackend:
+    """Deterministic output shaped like the real thing; no network."""
+    name = "stub"
+
+    def generate(self, kind, request):
+        if kind == "lesson":
+            topic = request["topic"]
+            words = re.findall(r"\w+", topic) or ["english"]
+            return {
+                "title": f"{topic.title()} ({request['level']})",
+                "emoji": "🚀" if request["audience"] == "kid" else "📘",
+                "objective": f"Talk about {topic}.",
+                "explanation_es": f"En esta lección practicas vocabulario sobre {topic}.",
+                "explanation_en": f"In this lesson you practise vocabulary about {topic}.",
+                "activeProduction": f"Write two sentences about {topic}.",
+                "vocabulary": [{"word": w, "translation": w, "example": f"I like {w}."} for w in words[:8]],
+                "quiz": [{"question": f"Which word is about {topic}?", "options": [words[0], "table", "blue"],
+                          "correctAnswer": words[0], "explanation": f"{words[0]} is in the lesson."}],
+            }
+        return {"text": f"({request['level']}) You said: {request['message']}"}
+
+
+class GeminiBackend:
+    name = "gemini"
+    URL = "https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent?key={key}"
+
+    def __init__(self, api_key=None, model=MODEL):
+        self.api_key = api_key or os.environ.get("GEMINI_API_KEY", "")
+        self.model = model
+
+    def _call(self, body):
+        req = urllib.request.Request(
+            self.URL.format(model=self.model, key=self.api_key),
+            data=json.dumps(body).encode("utf-8"), headers={"Content-Type": "application/json"},
+        )
+        try:
+            with urllib.request.urlopen(req, timeout=TIMEOUT) as res:
+                data = json.load(res)
+        except (urllib.error.URLError, TimeoutError, ValueError) as e:
+            raise GenerationError(f"Model request failed: {e}")
+        try:
+            return "".join(p.get("text", "") for p in data["candidates"][0]["content"]["parts"])
+        except (KeyError, IndexError):
+            raise GenerationError("Model returned no content")
+
+    def generate(self, kind, request):
+        level = request["level"]
+        if kind == "lesson":
+            template = ADULT_INSTRUCTION if request["audience"] == "adult" else KID_INSTRUCTION
+            text = self._call({
+                "contents": [{"role": "user", "parts": [{"text": f'Create a complete English lesson about "{request["topic"]}".'}]}],
+                "systemInstruction": {"parts": [{"text": template.format(guidelines=CEFR_GUIDELINES.format(level=level))}]},
+                "generationConfig": {"responseMimeType": "application/json", "responseSchema": LESSON_SCHEMA},
+            })
+            try:
+                return json.loads(text)
+            except ValueError:
+                raise GenerationError("Model returned invalid JSON")
+
+        parts = [{"text": request["message"]}]
+        if request.get("attachment"):
+            data = request["attachment"].split(",", 1)[-1]
+            parts.insert(0, {"inlineData": {"mimeType": "image/png", "data": data}})
+        contents = [{"role": h["role"], "parts": [{"text": h["text"]}]} for h in request["history"]]
+        return {"text": self._call({
+            "contents": contents + [{"role": "user", "parts": parts}],
+            "systemInstruction": {"parts": [{"text": TUTOR_INSTRUCTION.format(level=level)}]},
+        })}
+
+
+def load_backend(spec=None):
+    spec = spec or os.environ.get("AI_BACKEND") or ("gemini" if os.environ.get("GEMINI_API_KEY") else "stub")
+    if spec == "stub":
+        return StubBackend()
+    if spec == "gemini":
+        return GeminiBackend()
+    module, _, attr = spec.partition(":")
+    backend = getattr(importlib.import_module(module), attr)
+    return backend() if isinstance(backend, type) else backend
+
+
+# --- CACHE ---
+
+class _Flight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class GenerationCache:
+    def __init__(self, backend, directory=CACHE_DIR, entries=CACHE_ENTRIES, ttl=CACHE_TTL):
+        self.backend = backend
+        self.directory = directory
+        self.entries = entries
+        self.ttl = ttl
+        self._lru = OrderedDict() # key -> (created, value)
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "shared": 0, "generated": 0, "errors": 0}
+
+    def key(self, kind, request):
+        request = dict(request)
+        if "topic" in request:
+            request["topic"] = _fold(request["topic"]).casefold() # "Ordering  FOOD" shares "ordering food"
+        if request.get("attachment"):
+            request["attachment"] = hashlib.sha256(request["attachment"].encode("utf-8")).hexdigest()
+        canonical = json.dumps({"kind": kind, "backend": getattr(self.backend, "name", type(self.backend).__name__),
+                                "model": getattr(self.backend, "model", None), "request": request},
+                               sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def _remember(self, key, created, value):
+        # caller holds the lock
+        self._lru[key] = (created, value)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.entries:
+            self._lru.popitem(last=False)
+
+    def _lookup(self, key):
+        now = time.time()
+        with self._lock:
+            hit = self._lru.get(key)
+            if hit and now - hit[0] < self.ttl:
+                self._lru.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return hit[1], "memory"
+            self._lru.pop(key, None)
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None, None
+        if now - record["created"] >= self.ttl:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None, None
+        with self._lock:
+            self._remember(key, record["created"], record["value"])
+            self.stats["disk_hits"] += 1
+        return record["value"], "disk"
+
+    def _store(self, key, value):
+        created = time.time()
+        with self._lock:
+            self._remember(key, created, value)
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"created": created, "value": value}, f, ensure_ascii=False)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"AI cache: could not persist {key}: {e}") # memory copy still serves
+
+    def get(self, kind, request):
+        """(value, source) where source is memory, disk, shared or generated."""
+        key = self.key(kind, request)
+        value, source = self._lookup(key)
+        if source:
+            return value, source
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.stats["shared"] += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, "shared"
+
+        try:
+            # A flight that just landed may have filled the cache between the lookup and the claim
+            value, source = self._lookup(key)
+            if not source:
+                value = self.backend.generate(kind, request)
+                self._store(key, value)
+                with self._lock:
+                    self.stats["generated"] += 1
+                source = "generated"
+            flight.result = value
+            return value, source
+        except Exception as e:
+            with self._lock:
+                self.stats["errors"] += 1
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def snapshot(self):
+        with self._lock:
+            return {**self.stats, "entries": len(self._lru), "in_flight": len(self._flights),
+                    "backend": getattr(self.backend, "name", type(self.backend).__name__)}
+
+
+cache = GenerationCache(load_backend())
+
+
+if __name__ == "__main__":
+    import argparse
+    import tempfile
+    from concurrent.futures import ThreadPoolExecutor
+
+    parser = argparse.ArgumentParser(description="AI generation cache utilities")
+    parser.add_argument("--bench", type=int, metavar="REQUESTS", help="concurrent identical requests against a slow stub")
+    args = parser.parse_args()
+
+    if args.bench:
+        class SlowStub(StubBackend):
+            calls = 0
+
+            def generate(self, kind, request):
+                SlowStub.calls += 1
+                time.sleep(0.5) # roughly a fast model call
+                return super().generate(kind, request)
+
+        bench = GenerationCache(SlowStub(), directory=tempfile.mkdtemp())
+        request = lesson_request("a1", "  Ordering  FOOD ", 30)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.bench) as pool:
+            sources = list(pool.map(lambda _: bench.get("lesson", request)[1], range(args.bench)))
+        print(f"{args.bench} concurrent requests: {SlowStub.calls} generation(s) in {time.perf_counter() - started:.2f}s, "
+              f"sources {dict((s, sources.count(s)) for s in set(sources))}")
+        variants = [lesson_request("A1", "ordering food", 40), lesson_request("A1 ", "Ordering food", 70)]
+        print("normalized variants:", [bench.get("lesson", v)[1] for v in variants])
+        bench._lru.clear()
+        print("after memory eviction:", bench.get("lesson", request)[1], "| backend calls:", SlowStub.calls)
@@ -0,0 +1,148 @@
+"""
+Server-side grading of mission answers.
+
+Answer keys are compiled once from the catalog (mission_sections.payload_json)
+into tuples per mission, so grading a submission is a handful of dict/tuple
+lookups and never touches the database. seed_courses() calls invalidate() after
+it rewrites content.
+
+Accepted answer formats (per section, in section order):
+    {"answers": ["Hola", "Perro", 2]}            # list; ints are option indexes
+    {"answers": {"0": "Hola", "2": "Gato"}}      # dict keyed by section index
+
+Usage:
+    python grading.py --bench
+"""
+import threading
+import time
+from typing import NamedTuple
+
+from sqlalchemy import select
+
+import models
+
+PASS_SCORE = 70
+
+
+class SectionKey(NamedTuple):
+    index: int
+    correct: str # casefolded
+    options: tuple # casefolded, in display order
+
+
+class GradeResult(NamedTuple):
+    score: float
+    correct: int
+    total: int
+    results: list # per gradable section: True / False
+
+
+_keys = None
+_lock = threading.Lock()
+
+
+def _normalize(value):
+    return " ".join(str(value).split()).casefold()
+
+
+def compile_keys(db):
+    """Build {mission_id: (SectionKey, ...)} from every section that has a `correct` answer."""
+    keys = {}
+    rows = db.execute(
+        select(models.MissionSection.mission_id, models.MissionSection.order_index, models.MissionSection.payload_json)
+        .order_by(models.MissionSection.mission_id, models.MissionSection.order_index)
+    )
+    for mission_id, index, payload in rows:
+        if not isinstance(payload, dict) or payload.get("correct") is None:
+            continue
+        options = tuple(_normalize(o) for o in payload.get("options") or ())
+        keys.setdefault(mission_id, []).append(SectionKey(index, _normalize(payload["correct"]), options))
+    return {mission_id: tuple(sections) for mission_id, sections in keys.items()}
+
+
+def invalidate():
+    global _keys
+    with _lock:
+        _keys = None
+
+
+def get_keys(db):
+    global _keys
+    keys = _keys
+    if keys is None:
+        with _lock:
+            if _keys is None:
+                _keys = compile_keys(db)
+            keys = _keys
+    return keys
+
+
+def _answer_for(answers, key):
+    if isinstance(answers, dict):
+        return answers.get(str(key.index), answers.get(key.index))
+    if isinstance(answers, (list, tuple)) and key.index < len(answers):
+        return answers[key.index]
+    return None
+
+
+def grade_with_keys(sections, answers):
+    results = []
+    for key in sections:
+        given = _answer_for(answers, key)
+        if isinstance(given, int) and not isinstance(given, bool):
+            ok = 0 <= given < len(key.options) and key.options[given] == key.correct
+        else:
+            ok = given is not None and _normalize(given) == key.correct
+        results.append(ok)
+    total = len(results)
+    correct = sum(results)
+    return GradeResult(round(correct * 100 / total, 1) if total else 0.0, correct, total, results)
+
+
+def grade(db, mission_id, answers):
+    """Grade one submission; None when the mission has nothing gradable."""
+    sections = get_keys(db).get(mission_id)
+    if not sections or answers is None:
+        return None
+    return grade_with_keys(sections, answers)
+
+
+def grade_batch(db, submissions):
+    """Grade [(mission_id, answers), ...] in one call (offline sync)."""
+    keys = get_keys(db)
+    out = []
+    for mission_id, answers in submissions:
+        sections = keys.get(mission_id)
+        out.append(grade_with_keys(sections, answers) if sections and answers is not None else None)
+    return out
+
+
+if __name__ == "__main__":
+    import argparse
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Answer grading utilities")
+    parser.add_argument("--bench", action="store_true", help="time compile + grading against the seeded catalog")
+    parser.add_argument("-n", type=int, default=100_000)
+    args = parser.parse_args()
+
+    if args.bench:
+        db = SessionLocal()
+        try:
+            started = time.perf_counter()
+            keys = get_keys(db)
+            compile_ms = (time.perf_counter() - started) * 1000
+            if not keys:
+                raise SystemExit("No gradable sections; start the API once to seed the catalog.")
+            mission_ids = list(keys)
+            payloads = [(m, [k.options[1] if len(k.options) > 1 else k.correct for k in keys[m]]) for m in mission_ids]
+
+            started = time.perf_counter()
+            for i in range(args.n):
+                mission_id, answers = payloads[i % len(payloads)]
+                grade(db, mission_id, answers)
+            per_call_us = (time.perf_counter() - started) / args.n * 1e6
+            print(f"Compiled {len(keys)} answer keys in {compile_ms:.1f}ms")
+            print(f"grade(): {per_call_us:.2f}us per submission over {args.n} calls")
+        finally:
+            db.close()
@@ -0,0 +1,104 @@
+"""
+Shop items owned by learners, one user_inventory (user_id, item_id, qty) row per item.
+
+Replaces the JSON list in users.inventory (migrate_db_inventory.py moves it
+over). Prices live here, not in the client: POST /shop/purchase charges and
+grants in one transaction, the charge being a single conditional
+    UPDATE user_stats SET credits = credits - cost WHERE user_id = ? AND credits >= cost
+so two purchases racing for the last credits cannot both succeed. Spending a
+streak freeze at login is one UPDATE ... SET qty = qty - 1 WHERE qty > 0 on the
+primary key. /profile/update does not touch inventory: a client-sent list
+would grant items without paying for them.
+
+Responses keep the old shape: a list of item ids, repeated per unit owned.
+"""
+from fastapi import HTTPException
+from sqlalchemy import select, update
+
+import models
+
+# item_id -> (price, kind). "stack": units add up; "unique": owned at most once;
+# "instant": applied on the client at purchase, nothing is stored.
+CATALOG = {
+    "shield_1": (200, "stack"),
+    "heart_refill": (350, "instant"),
+    "theme_dark_pro": (500, "unique"),
+    "badge_biz": (1000, "unique"),
+    "mascot_hero": (400, "unique"),
+    "frame_galaxy": (300, "unique"),
+}
+
+# The shop's "Protector de Racha", and the id older clients stored for it
+STREAK_FREEZE_ITEMS = ("shield_1", "streak_freeze")
+
+MAX_QTY = 99
+
+
+def item_list(db, user_id):
+    """Owned items in the legacy list-of-ids shape."""
+    rows = db.execute(
+        select(models.UserInventory.item_id, models.UserInventory.qty)
+        .where(models.UserInventory.user_id == user_id, models.UserInventory.qty > 0)
+        .order_by(models.UserInventory.item_id)
+    )
+    return [item_id for item_id, qty in rows for _ in range(qty)]
+
+
+def _grant(db, user_id, item_id, qty, unique):
+    """Add `qty` units; returns False when a unique item is already owned or a stack would pass MAX_QTY."""
+    if unique:
+        sql = ("INSERT INTO user_inventory (user_id, item_id, qty) VALUES (?, ?, 1) "
+               "ON CONFLICT(user_id, item_id) DO UPDATE SET qty = 1 WHERE user_inventory.qty = 0 RETURNING qty")
+        params = (user_id, item_id)
+    else:
+        sql = ("INSERT INTO user_inventory (user_id, item_id, qty) VALUES (?, ?, ?) "
+               "ON CONFLICT(user_id, item_id) DO UPDATE SET qty = qty + excluded.qty "
+               "WHERE user_inventory.qty + excluded.qty <= ? RETURNING qty")
+        params = (user_id, item_id, qty, MAX_QTY)
+    return db.connection().exec_driver_sql(sql, params).first() is not None
+
+
+def purchase(db, user_id, item_id, qty=1):
+    """Charge and grant in the caller's transaction (caller commits); returns ((credits, xp, streak), items)."""
+    if item_id not in CATALOG:
+        raise HTTPException(status_code=404, detail="Unknown item")
+    price, kind = CATALOG[item_id]
+    if kind != "stack":
+        qty = 1
+    if not 1 <= qty <= MAX_QTY:
+        raise HTTPException(status_code=400, detail=f"qty must be between 1 and {MAX_QTY}")
+    cost = price * qty
+
+    S = models.UserStats
+    # Savepoint: a grant must not survive a failed charge, nor a charge a refused grant
+    with db.begin_nested():
+        if kind != "instant" and not _grant(db, user_id, item_id, qty, unique=kind == "unique"):
+            detail = "Item already owned" if kind == "unique" else f"You can hold at most {MAX_QTY} of this item"
+            raise HTTPException(status_code=400, detail=detail)
+        totals = db.execute(
+            update(S)
+            .where(S.user_id == user_id, S.credits >= cost)
+            .values(credits=S.credits - cost, version=S.version + 1)
+            .returning(S.credits, S.xp_total, S.streak)
+            .execution_options(synchronize_session=False)
+        ).first()
+        if totals is None:
+            raise HTTPException(status_code=400, detail="Not enough credits")
+    return tuple(totals), item_list(db, user_id)
+
+
+def use_streak_freeze(db, user_id):
+    """Spend one streak freeze if the user has any; True when one was used (caller commits)."""
+    I = models.UserInventory
+    for item_id in STREAK_FREEZE_ITEMS:
+        used = db.execute(
+            update(I)
+            .where(I.user_id == user_id, I.item_id == item_id, I.qty > 0)
+            .values(qty=I.qty - 1)
+            .returning(I.qty)
+            .execution_options(synchronize_session=False)
+        ).first()
+        if used is not None:
+            return True
+    return False
+
@@ -0,0 +1,510 @@
+"""
+Streaming importer for the legacy PHP/MySQL data (backend/database.sql).
+
+Two sources are supported:
+  * a mysqldump file with extended INSERTs for `users` and `user_progress`
+  * the `user_progress` table (models.UserProgress) still living in sql_app.db
+
+Rows are consumed in bounded batches, each JSON blob is parsed exactly once and
+the normalized rows (users, user_stats, vocabulary_items, certificates,
+user_mission_progress, user_inventory) are written with executemany. Every batch commits
+together with its ImportCheckpoint row, so an interrupted run resumes where the
+last committed batch ended.
+
+Legacy accounts whose email is already registered here are skipped and reported,
+together with their progress, so one conflict does not stop the import.
+
+Mission progress comes from unlocked_level_index (the legacy level the learner
+reached): the first mission of every track is unlocked in each course up to that
+level, as /auth/register does for the first course. completedTopics holds ids of
+the old generated lessons, which have no counterpart in the mission catalog, so
+completions are not imported.
+
+Usage:
+    python legacy_import.py dump.sql
+    python legacy_import.py --table
+    python legacy_import.py --generate-dump 1000000 sample_dump.sql
+"""
+import argparse
+import json
+import random
+import re
+import time
+from datetime import date, datetime
+
+from sqlalchemy import select, func, update
+
+from database import engine, Base
+import models
+
+BATCH_SIZE = 5000
+TABLE_SOURCE = "table:user_progress"
+
+# Column order of backend/database.sql (google_id comes from update_db_for_google.sql)
+# Legacy unlocked_level_index points into this list (LEVEL_ORDER in src/types.ts)
+LEGACY_LEVELS = ["A1", "A2", "B1", "B2", "C1", "C2"]
+
+LEGACY_COLUMNS = {
+    "users": ["id", "name", "email", "password_hash", "age", "is_premium", "created_at", "google_id"],
+    "user_progress": [
+        "user_id", "coins", "xp", "level", "unlocked_level_index",
+        "streak_current", "streak_best", "last_login_date", "json_data",
+    ],
+}
+
+_INSERT_RE = re.compile(r"INSERT\s+(?:IGNORE\s+)?INTO\s+`?(\w+)`?\s*(?:\(([^)]*)\))?\s*VALUES\s*", re.I)
+_TOKEN_RE = re.compile(r"'((?:[^'\\]+|\\.|'')*)'|(NULL)|([-+0-9.eE]+)|(\()|(\))", re.S)
+_ESCAPE_RE = re.compile(r"\\(.)|''", re.S)
+_ESCAPES = {"0": "\0", "b": "\b", "n": "\n", "r": "\r", "t": "\t", "Z": "\x1a"}
+
+
+# --- DUMP PARSING ---
+
+def _unescape(value):
+    if "\\" not in value and "''" not in value:
+        return value
+    return _ESCAPE_RE.sub(lambda m: "'" if m.group(1) is None else _ESCAPES.get(m.group(1), m.group(1)), value)
+
+
+def _number(text):
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+def _iter_tuples(text):
+    row = None
+    for m in _TOKEN_RE.finditer(text):
+        string, null, number, opening, closing = m.groups()
+        if opening:
+            row = []
+        elif closing:
+            if row is not None:
+                yield row
+            row = None
+        elif row is None:
+            continue
+        elif string is not None:
+            row.append(_unescape(string))
+        elif null:
+            row.append(None)
+        else:
+            row.append(_number(number))
+
+
+def iter_dump_rows(path, start=0, skip=0):
+    """Yield (table, row_dict, line_offset, row_index) for legacy INSERT statements.
+
+    Expects mysqldump's default layout of one (extended) INSERT per line.
+    `start`/`skip` come from a checkpoint: the byte offset of a line and how many
+    of its rows were already imported.
+    """
+    with open(path, "rb") as f:
+        f.seek(start)
+        offset = start
+        for raw in f:
+            line_offset = offset
+            offset += len(raw)
+            line = raw.decode("utf-8", errors="replace")
+            m = _INSERT_RE.match(line)
+            if not m or m.group(1) not in LEGACY_COLUMNS:
+                continue
+            table = m.group(1)
+            if m.group(2):
+                columns = [c.strip(" `") for c in m.group(2).split(",")]
+            else:
+                columns = LEGACY_COLUMNS[table]
+            for idx, values in enumerate(_iter_tuples(line[m.end():])):
+                if line_offset == start and idx < skip:
+                    continue
+                yield table, dict(zip(columns, values)), line_offset, idx
+
+
+# --- ROW MAPPING ---
+
+def _parse_date(value):
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(str(value)[:10]).isoformat()
+    except ValueError:
+        return None
+
+
+def _parse_datetime(value):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+
+def _load_blob(raw):
+    if not raw:
+        return {}
+    if isinstance(raw, dict):
+        return raw
+    try:
+        blob = json.loads(raw)
+    except (TypeError, ValueError):
+        return {}
+    return blob if isinstance(blob, dict) else {}
+
+
+# Plain executemany statements: SQLAlchemy's per-row parameter processing costs
+# more than SQLite itself at import volumes, so rows are kept as tuples.
+_INSERT_SQL = {
+    "users": "INSERT INTO users (id, email, hashed_password, name, age, theme, inventory, is_active, created_at, daily_goal_min) "
+             "VALUES (?, ?, ?, ?, ?, 'default', '[]', 1, ?, 10)",
+    "stats": "INSERT OR IGNORE INTO user_stats (user_id, credits, xp_total, streak, last_activity_date) VALUES (?, ?, ?, ?, ?)",
+    "vocab": "INSERT INTO vocabulary_items (user_id, word, translation, example, next_review, interval, ease_factor, streak) "
+             "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+    "certs": "INSERT INTO certificates (user_id, title, level, date_awarded) VALUES (?, ?, ?, ?)",
+    "progress": "INSERT OR IGNORE INTO user_mission_progress (user_id, mission_id, status, score, xp_earned, attempts, "
+                "updated_at) VALUES (?, ?, 'unlocked', 0.0, 0, 0, ?)",
+    "inventories": "INSERT OR IGNORE INTO user_inventory (user_id, item_id, qty) VALUES (?, ?, ?)",
+}
+
+
+class _Batch:
+    def __init__(self):
+        self.users = []
+        self.stats = []
+        self.vocab = []
+        self.certs = []
+        self.progress = []
+        self.inventories = []
+        self.size = 0
+        self.skipped = [] # emails of legacy accounts that were already registered
+
+    def add_user(self, row, id_offset):
+        created = _parse_datetime(row.get("created_at")) or datetime.utcnow()
+        self.users.append((
+            int(row["id"]) + id_offset,
+            row.get("email"),
+            row.get("password_hash") or "",
+            row.get("name"),
+            row.get("age"),
+            str(created),
+        ))
+        self.size += 1
+
+    def add_progress(self, user_id, blob, stats, unlocks):
+        """`stats` is (credits, xp_total, streak, last_activity_date); `unlocks` the mission ids to unlock."""
+        self.stats.append((user_id, *stats))
+
+        now_ms = time.time() * 1000
+        seen = set()
+        for item in blob.get("vocabularyBank") or []:
+            if not isinstance(item, dict) or not item.get("word"):
+                continue
+            key = item["word"].strip().lower()
+            if key in seen:
+                continue
+            seen.add(key)
+            self.vocab.append((
+                user_id,
+                item["word"],
+                item.get("translation", ""),
+                item.get("example"),
+                float(item.get("nextReview") or now_ms),
+                int(item.get("interval") or 1),
+                float(item.get("easeFactor") or 2.5),
+                int(item.get("streak") or 0),
+            ))
+
+        for cert in blob.get("certificates") or []:
+            if isinstance(cert, dict) and cert.get("title"):
+                self.certs.append((user_id, cert["title"], cert.get("level"), cert.get("date")))
+
+        now = str(datetime.utcnow())
+        self.progress += [(user_id, mission_id, now) for mission_id in unlocks]
+
+        inventory = blob.get("inventory")
+        if isinstance(inventory, list) and inventory:
+            counts = {}
+            for item_id in inventory:
+                counts[str(item_id)] = counts.get(str(item_id), 0) + 1
+            self.inventories += [(user_id, item_id, qty) for item_id, qty in counts.items()]
+        self.size += 1
+
+    def flush(self, conn, existing=False):
+        """Write everything collected so far. `existing` drops rows the users already have."""
+        if existing:
+            self._drop_existing(conn)
+        else:
+            self._drop_conflicts(conn)
+        skipped = self.skipped
+        cursor = conn.connection.cursor()
+        for name, sql in _INSERT_SQL.items():
+            rows = getattr(self, name)
+            if rows:
+                cursor.executemany(sql, rows)
+        cursor.close()
+        self.__init__()
+        return skipped
+
+    def _drop_conflicts(self, conn):
+        """Skip new accounts whose email is taken, and rows of users that were never created."""
+        emails = {}
+        for row in self.users:
+            emails.setdefault((row[1] or "").lower(), row)
+        fresh = list(emails.values())
+        marks = ",".join("?" * len(fresh))
+        taken = {r[0].lower() for r in conn.exec_driver_sql(
+            f"SELECT email FROM users WHERE lower(email) IN ({marks})", tuple(r[1].lower() for r in fresh)
+        ) if r[0]} if fresh else set()
+        keep = [r for r in fresh if (r[1] or "").lower() not in taken]
+        self.skipped += [r[1] for r in self.users if r not in keep]
+        self.users = keep
+
+        per_user = ("stats", "vocab", "certs", "progress", "inventories")
+        user_ids = {r[0] for name in per_user for r in getattr(self, name)}
+        if not user_ids:
+            return
+        known = {r[0] for r in self.users}
+        known.update(conn.execute(
+            select(models.User.id).where(models.User.id.between(min(user_ids), max(user_ids)))
+        ).scalars())
+        for name in per_user:
+            setattr(self, name, [r for r in getattr(self, name) if r[0] in known])
+
+    def _drop_existing(self, conn):
+        user_ids = {r[0] for r in self.vocab + self.certs}
+        if not user_ids:
+            return
+        lo, hi = min(user_ids), max(user_ids)
+        V, C = models.VocabularyItem, models.Certificate
+        have_words = {
+            (uid, (word or "").strip().lower())
+            for uid, word in conn.execute(select(V.user_id, V.word).where(V.user_id.between(lo, hi)))
+        }
+        have_certs = set(conn.execute(select(C.user_id, C.title).where(C.user_id.between(lo, hi))))
+        self.vocab = [r for r in self.vocab if (r[0], r[1].strip().lower()) not in have_words]
+        self.certs = [r for r in self.certs if (r[0], r[1]) not in have_certs]
+
+
+# --- CHECKPOINTS ---
+
+def _load_checkpoint(conn, source):
+    table = models.ImportCheckpoint.__table__
+    row = conn.execute(select(table).where(table.c.source == source)).mappings().first()
+    if row:
+        return dict(row)
+    id_offset = conn.execute(select(func.coalesce(func.max(models.User.id), 0))).scalar()
+    row = {"source": source, "position": 0, "rows_done": 0, "id_offset": id_offset}
+    conn.execute(table.insert(), row)
+    conn.commit()
+    return row
+
+
+def _save_checkpoint(conn, source, position, rows_done):
+    table = models.ImportCheckpoint.__table__
+    conn.execute(
+        update(table).where(table.c.source == source).values(
+            position=position, rows_done=rows_done, updated_at=datetime.utcnow()
+        )
+    )
+
+
+def _level_unlocks(conn):
+    """Mission ids to unlock for each legacy unlocked_level_index (see LEGACY_LEVELS)."""
+    entries = conn.exec_driver_sql(
+        "SELECT c.order_index, c.level, m.id FROM missions m JOIN courses c ON c.id = m.course_id "
+        "WHERE m.order_index = 0 ORDER BY c.order_index, c.id, m.track_id"
+    ).all()
+    first_course = entries[0][0] if entries else None
+    unlocks = []
+    for index in range(len(LEGACY_LEVELS)):
+        reached = set(LEGACY_LEVELS[:index + 1])
+        unlocks.append(list(dict.fromkeys(
+            mission_id for order, level, mission_id in entries
+            if order == first_course or reached & set((level or "").split("/"))
+        )))
+    return unlocks
+
+
+def _unlocks_for(unlocks, level_index):
+    if not unlocks:
+        return []
+    try:
+        index = int(level_index or 0)
+    except (TypeError, ValueError):
+        index = 0
+    return unlocks[max(0, min(index, len(unlocks) - 1))]
+
+
+def _report_skipped(skipped):
+    for email in skipped:
+        print(f"Skipped legacy user {email}: email already registered")
+    return len(skipped)
+
+
+# --- IMPORTERS ---
+
+def import_dump(path, batch_size=BATCH_SIZE):
+    Base.metadata.create_all(bind=engine)
+    started = time.time()
+    imported = skipped = 0
+    with engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA synchronous=NORMAL")
+        checkpoint = _load_checkpoint(conn, path)
+        id_offset = checkpoint["id_offset"]
+        unlocks = _level_unlocks(conn)
+        print(f"Importing {path} from byte {checkpoint['position']} (user id offset {id_offset})...")
+
+        batch = _Batch()
+        position = None
+        for table, row, line_offset, idx in iter_dump_rows(path, checkpoint["position"], checkpoint["rows_done"]):
+            if table == "users":
+                batch.add_user(row, id_offset)
+            else:
+                stats = (
+                    row.get("coins") or 0,
+                    row.get("xp") or 0,
+                    row.get("streak_current") or 0,
+                    _parse_date(row.get("last_login_date")),
+                )
+                batch.add_progress(int(row["user_id"]) + id_offset, _load_blob(row.get("json_data")), stats,
+                                   _unlocks_for(unlocks, row.get("unlocked_level_index")))
+            position = (line_offset, idx + 1)
+
+            if batch.size >= batch_size:
+                imported += batch.size
+                skipped += _report_skipped(batch.flush(conn))
+                _save_checkpoint(conn, path, *position)
+                conn.commit()
+                _report(imported, started)
+
+        if batch.size:
+            imported += batch.size
+            skipped += _report_skipped(batch.flush(conn))
+        if position:
+            _save_checkpoint(conn, path, *position)
+        conn.commit()
+
+    _report(imported, started, final=True)
+    if skipped:
+        print(f"{skipped} legacy users skipped because their email is already registered")
+    return imported
+
+
+def import_table(batch_size=BATCH_SIZE):
+    """Normalize blobs left in the FastAPI `user_progress` table (users already exist)."""
+    Base.metadata.create_all(bind=engine)
+    started = time.time()
+    imported = 0
+    legacy = models.UserProgress.__table__
+    with engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA synchronous=NORMAL")
+        last_id = _load_checkpoint(conn, TABLE_SOURCE)["position"]
+        unlocks = _level_unlocks(conn)
+
+        while True:
+            rows = conn.execute(
+                select(legacy.c.id, legacy.c.user_id, legacy.c.json_data, legacy.c.unlocked_level_index)
+                .where(legacy.c.id > last_id)
+                .order_by(legacy.c.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+
+            batch = _Batch()
+            for row_id, user_id, raw, level_index in rows:
+                blob = _load_blob(raw)
+                streak = blob.get("streak")
+                stats = (
+                    int(blob.get("coins") or 0),
+                    int(blob.get("xp") or 0),
+                    int(streak.get("current") or 0) if isinstance(streak, dict) else int(streak or 0),
+                    _parse_date(streak.get("lastLoginDate")) if isinstance(streak, dict) else None,
+                )
+                batch.add_progress(user_id, blob, stats, _unlocks_for(unlocks, level_index))
+                last_id = row_id
+
+            imported += batch.size
+            batch.flush(conn, existing=True)
+            _save_checkpoint(conn, TABLE_SOURCE, last_id, 0)
+            conn.commit()
+            _report(imported, started)
+
+    _report(imported, started, final=True)
+    return imported
+
+
+def _report(count, started, final=False):
+    elapsed = max(time.time() - started, 1e-6)
+    label = "Done" if final else "Progress"
+    print(f"{label}: {count} legacy rows in {elapsed:.1f}s ({count / elapsed:,.0f} rows/s)")
+
+
+# --- SAMPLE DUMP GENERATOR ---
+
+def _sql(value):
+    if value is None:
+        return "NULL"
+    if isinstance(value, (int, float)):
+        return str(value)
+    escaped = str(value).replace("\\", "\\\\").replace("'", "\\'").replace("\n", "\\n")
+    return f"'{escaped}'"
+
+
+def write_sample_dump(path, n_users, seed=42, rows_per_insert=500):
+    """Write a mysqldump-style file with `n_users` users and their progress blobs."""
+    rng = random.Random(seed)
+    words = [f"word{i}" for i in range(400)]
+
+    def chunks(make_row):
+        for start in range(1, n_users + 1, rows_per_insert):
+            stop = min(start + rows_per_insert, n_users + 1)
+            yield ",".join("(" + ",".join(_sql(v) for v in make_row(uid)) + ")" for uid in range(start, stop))
+
+    def user_row(uid):
+        return (uid, f"Learner {uid}", f"learner{uid}@example.com", "$2y$10$legacyhash", rng.randint(8, 70),
+                rng.randint(0, 1), "2024-01-01 10:00:00", None)
+
+    def progress_row(uid):
+        vocab = [
+            {"word": w, "translation": w.upper(), "example": f"I know {w}.", "nextReview": 1700000000000,
+             "interval": rng.randint(1, 30), "easeFactor": 2.5, "streak": rng.randint(0, 5)}
+            for w in rng.sample(words, rng.randint(0, 12))
+        ]
+        certs = [{"id": "1", "title": "Inglés Básico", "level": "A1", "date": "2024-03-01"}] if rng.random() < 0.2 else []
+        blob = {
+            "inventory": ["streak_freeze"] if rng.random() < 0.1 else [],
+            "vocabularyBank": vocab,
+            "certificates": certs,
+            "completedTopics": [],
+            "placementTestCompleted": True,
+        }
+        return (uid, rng.randint(0, 5000), rng.randint(0, 20000), "A1", rng.randint(0, 3), rng.randint(0, 60),
+                rng.randint(0, 90), "2024-06-01", json.dumps(blob, ensure_ascii=False))
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("-- Generated legacy dump\n")
+        for values in chunks(user_row):
+            f.write(f"INSERT INTO `users` VALUES {values};\n")
+        for values in chunks(progress_row):
+            f.write(f"INSERT INTO `user_progress` VALUES {values};\n")
+    print(f"Wrote {n_users} legacy users to {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import legacy PHP/MySQL progress data")
+    parser.add_argument("dump", nargs="?", help="mysqldump file with users/user_progress INSERTs")
+    parser.add_argument("--table", action="store_true", help="normalize the local user_progress table instead")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--generate-dump", type=int, metavar="N", help="write a synthetic dump with N users to DUMP")
+    args = parser.parse_args()
+
+    if args.generate_dump:
+        write_sample_dump(args.dump or "sample_dump.sql", args.generate_dump)
+    elif args.table:
+        import_table(args.batch_size)
+    elif args.dump:
+        import_dump(args.dump, args.batch_size)
+    else:
+        parser.print_help()
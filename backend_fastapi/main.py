@@ -1,12 +1,40 @@
-from fastapi import FastAPI, Depends, HTTPException, status, Body
+from fastapi import FastAPI, Depends, HTTPException, status, Body, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, FileResponse, PlainTextResponse
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from database import engine, Base, get_db
+from sqlalchemy import func, case, select, update as sql_update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
+from database import engine, write_engine, read_engine, Base, get_db, get_read_db, SessionLocal, SINGLE_WRITER
+from database import SHARDS, shard_engines, user_engines, create_all, route, fan_out
+import database
 import models
+import events
+import vocab_import
+import export
+import admission
+import grading
+import transcript
+import distractors
+import search
+import mission_stats
+import attempts
+import archive
+import generation
+import inventory
+import write_queue
+import coalesce
+import profiler
+import reminders
+import roster
+import static_catalog
+import sync
 from datetime import datetime, date
-import json
+import heapq
+import os
+import random
+import threading
 import time
 
 # --- SCHEMAS ---
@@ -37,7 +65,11 @@ class ProfileUpdate(BaseModel):
     xp: int | None = None
     credits: int | None = None  # backend: credits
     streak: int | None = None
-    inventory: list[str] | None = None
+    inventory: list[str] | None = None # ignored: items are only granted by POST /shop/purchase
+
+    # Relative changes, applied atomically in SQL (a negative credits_delta is a purchase)
+    xp_delta: int | None = None
+    credits_delta: int | None = None
     
     placementTestCompleted: bool | None = None
     unlockedLevelIndex: int | None = None
@@ -50,15 +82,58 @@ class ProfileUpdate(BaseModel):
     activeBadge: str | None = None
 
 class MissionSubmit(BaseModel):
-    score: float # 0-100
-    answers: dict | None = None # Optional payload
+    score: float # 0-100, only used for missions without gradable sections
+    answers: dict | list | None = None # Graded server-side when present
+    duration_sec: int | None = None # Time spent, for activity charts
+
+class GradeItem(BaseModel):
+    mission_id: int
+    answers: dict | list
+
+class GradeBatch(BaseModel):
+    submissions: list[GradeItem]
+
+class Utterance(BaseModel):
+    section: int # order_index of the speaking/listening section
+    text: str
+
+class TranscriptBatch(BaseModel):
+    utterances: list[Utterance]
+
+class LessonRequest(BaseModel):
+    topic: str
+    level: str = "A1"
+    age: int | None = None # defaults to the profile's age
+
+class ChatRequest(BaseModel):
+    message: str
+    level: str = "A1"
+    history: list[dict] = [] # [{"role": "user"|"model", "parts": [{"text": ...}]}]
+    attachment: str | None = None # base64 image (data URL or raw)
+
+class ReviewGrade(BaseModel):
+    difficulty: str # hard, good or easy (the ReviewCenter buttons)
+
+class PurchaseRequest(BaseModel):
+    item_id: str # an inventory.CATALOG id
+    qty: int = 1 # only stackable items take more than one
 
 # --- APP SETUP ---
 
 # CRITICAL: Create tables before app startup to avoid "no such table" errors
-Base.metadata.create_all(bind=engine)
+create_all()
+search.ensure_schema(engine, vocabulary=not shard_engines)
+for bind in shard_engines:
+    search.ensure_schema(bind, sections=False)
+for bind in user_engines:
+    sync.ensure_schema(bind)
 
 app = FastAPI()
+# Opt-in request profiling (PROFILE_ENABLED=1, see profiler.py); the route class must be set before any route
+app.router.route_class = profiler.ProfiledRoute
+app.middleware("http")(profiler.middleware)
+if profiler.ENABLED:
+    profiler.instrument(engine, write_engine, read_engine, *shard_engines)
 
 # CORS: Allow local dev and production explicitly
 origins = [
@@ -594,12 +669,38 @@ def seed_courses(db: Session):
                         db.add(section)
     
     db.commit()
+    grading.invalidate()
+    transcript.invalidate()
+    distractors.index.refresh_catalog(db)
+    if static_catalog.STATIC_DIR:
+        static_catalog.export(db)
     print("Seeding Complete (Updated Content).")
 
 @app.on_event("startup")
 def startup_event():
     db = next(get_db())
     seed_courses(db)
+    attempts.log.start()
+    if SINGLE_WRITER:
+        write_queue.writer.start()
+    # Bank words only feed the distractor pool; no need to hold up startup for them
+    threading.Thread(target=_load_distractor_banks, daemon=True).start()
+    if reminders.scheduler.enabled:
+        threading.Thread(target=_start_reminders, daemon=True).start()
+
+@app.on_event("shutdown")
+def shutdown_event():
+    # Buffered attempt history must reach the database before the worker exits
+    write_queue.writer.stop()
+    attempts.log.stop()
+    reminders.scheduler.stop()
+
+def _load_distractor_banks():
+    fan_out(distractors.index.load_user_banks)
+
+def _start_reminders():
+    reminders.scheduler.rebuild(row for rows in fan_out(reminders.load_due) for row in rows)
+    reminders.scheduler.start()
 
 # --- AUTH ENDPOINTS ---
 
@@ -609,12 +710,32 @@ def ping():
 
 @app.post("/auth/register")
 def register(user: UserCreate, db: Session = Depends(get_db)):
+    return write_queue.writer.run(db, _register, user)
+
+def _register(db: Session, user: UserCreate):
+    user_id = None
+    if SHARDS > 1:
+        # The directory hands out the id (and keeps emails unique); the id picks the shard
+        user_id = database.claim_email(user.email)
+        if user_id is None:
+            raise HTTPException(status_code=400, detail="Email already registered")
+        route(db, user_id)
+        try:
+            return _create_user(db, user, user_id)
+        except Exception:
+            db.rollback()
+            database.release_email(user_id)
+            raise
+
     existing = db.query(models.User).filter(models.User.email == user.email).first()
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
+    return _create_user(db, user, user_id)
 
+def _create_user(db: Session, user: UserCreate, user_id: int | None):
     fake_hashed = user.password + "notreallyhashed"
     db_user = models.User(
+        id=user_id,
         email=user.email, 
         hashed_password=fake_hashed, 
         name=user.name, 
@@ -645,11 +766,22 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
 
 @app.post("/auth/login")
 def login(creds: LoginRequest, db: Session = Depends(get_db)):
+    # Login writes the streak, so it goes through the writer like the other write endpoints
+    return run_write(db, _login, creds)
+
+def _login(db: Session, creds: LoginRequest):
+    if SHARDS > 1:
+        user_id = database.lookup_email(creds.email)
+        if user_id is None:
+            raise HTTPException(status_code=400, detail="User not found")
+        route(db, user_id)
     user = db.query(models.User).filter(models.User.email == creds.email).first()
     if not user:
          raise HTTPException(status_code=400, detail="User not found")
     if user.hashed_password != creds.password + "notreallyhashed":
          raise HTTPException(status_code=400, detail="Incorrect password")
+    if user.archived_at:
+        archive.restore(db, user) # committed with the streak update below
     
     if not user.stats:
         stats = models.UserStats(user_id=user.id, credits=0, xp_total=0, streak=0, last_activity_date=None)
@@ -671,11 +803,8 @@ def login(creds: LoginRequest, db: Session = Depends(get_db)):
             pass
         elif delta > 1:
             # Missed a day!
-            # Check for Streak Freeze
-            inventory = json.loads(user.inventory) if user.inventory else []
-            if "streak_freeze" in inventory:
-                inventory.remove("streak_freeze")
-                user.inventory = json.dumps(inventory)
+            # Check for Streak Freeze (one indexed decrement, see inventory.py)
+            if inventory.use_streak_freeze(db, user.id):
                 streak_msg = "Tu Protector de Racha salvo tu progreso!"
                 # Update last active to yesterday so it looks like they didn't miss?
                 # Or just keep streak as is and set today.
@@ -692,8 +821,7 @@ def login(creds: LoginRequest, db: Session = Depends(get_db)):
     # Get Certificates
     certs = [{"id": str(c.id), "title": c.title, "level": c.level, "date": c.date_awarded} for c in user.certificates]
     
-    # helper for inv
-    user_inv = json.loads(user.inventory) if user.inventory else []
+    user_inv = inventory.item_list(db, user.id)
 
     return {
         "success": True, 
@@ -720,23 +848,103 @@ def login(creds: LoginRequest, db: Session = Depends(get_db)):
 from fastapi.security import OAuth2PasswordBearer
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db),
+                     read_db: Session = Depends(get_read_db)):
     # Simple "fake-jwt-token-for-{user_id}" parsing
     try:
         user_id = int(token.replace("fake-jwt-token-for-", ""))
+        # Both request sessions follow the user to their shard (sessions are cached per request)
+        route(db, user_id)
+        route(read_db, user_id)
         user = db.query(models.User).get(user_id)
         if not user:
             raise HTTPException(status_code=401, detail="Invalid user")
-        return user
     except:
         raise HTTPException(status_code=401, detail="Invalid token format")
+    if user.archived_at:
+        # Back after a long break with a stored token: restore the archived rows first
+        run_write(db, _rehydrate, user.id)
+    return user
+
+def _rehydrate(db: Session, user_id: int):
+    user = db.get(models.User, user_id)
+    if user.archived_at:
+        archive.restore(db, user)
+        db.commit()
+
+# user_stats and user_mission_progress are versioned (models.py): a write based on a
+# stale read fails with StaleDataError, or IntegrityError for a duplicate progress row,
+# instead of awarding twice. The unit is re-run on fresh rows a bounded number of times.
+CONFLICT_RETRIES = 4
+
+def run_write(db: Session, fn, *args):
+    for attempt in range(CONFLICT_RETRIES + 1):
+        try:
+            return write_queue.writer.run(db, fn, *args)
+        except (StaleDataError, IntegrityError):
+            db.rollback()
+            if attempt == CONFLICT_RETRIES:
+                raise HTTPException(status_code=409, detail="Concurrent update, please retry")
+            time.sleep(random.uniform(0, 0.01 * 2 ** attempt))
+
+# Admins are configured per deployment: ADMIN_EMAILS="a@x.com,b@y.com"
+ADMIN_EMAILS = {e.strip().lower() for e in os.environ.get("ADMIN_EMAILS", "").split(",") if e.strip()}
 
-@app.post("/profile/update")
+def get_admin_user(user: models.User = Depends(get_current_user)):
+    if (user.email or "").lower() not in ADMIN_EMAILS:
+        raise HTTPException(status_code=403, detail="Admin only")
+    return user
+
+@app.post("/profile/update", dependencies=[Depends(admission.admit_writer)])
 def update_profile(
     update: ProfileUpdate,
     user: models.User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
+    write = lambda u: run_write(db, _update_profile, user.id, u)
+    # Purchases and credential changes can fail on their own, so they are never merged with other updates
+    if update.new_email or update.password or (update.credits_delta or 0) < 0:
+        result = write(update)
+    else:
+        result = profile_updates.submit(user.id, update, write)
+    totals = result["user"]
+    events.broker.publish(user.id, "stats", {
+        "xp": totals["xp"], "credits": totals["credits"], "streak": totals["streak"],
+        "xp_gained": update.xp_delta or 0, "credits_gained": update.credits_delta or 0,
+    })
+    return result
+
+def _merge_profile_updates(updates):
+    """Later values win for plain fields; deltas add up."""
+    fields = {}
+    for u in updates:
+        fields.update(u.model_dump(exclude_none=True))
+    fields["xp_delta"] = sum(u.xp_delta or 0 for u in updates)
+    fields["credits_delta"] = sum(u.credits_delta or 0 for u in updates)
+    return ProfileUpdate(**fields)
+
+profile_updates = coalesce.Coalescer(_merge_profile_updates)
+
+def _update_profile(db: Session, user_id: int, update: ProfileUpdate):
+    moved_from = None
+    if SHARDS > 1 and update.new_email:
+        # The directory commits on its own in the shared file: move the email there
+        # first, and put it back if the shard transaction does not go through
+        user = db.get(models.User, user_id)
+        if user and update.new_email != user.email:
+            if not database.change_email(user_id, update.new_email):
+                raise HTTPException(status_code=400, detail="Email already taken")
+            moved_from = user.email
+    try:
+        return _apply_profile_update(db, user_id, update)
+    except Exception:
+        if moved_from is not None:
+            db.rollback()
+            database.change_email(user_id, moved_from)
+        raise
+
+def _apply_profile_update(db: Session, user_id: int, update: ProfileUpdate):
+    user = db.get(models.User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -795,18 +1003,32 @@ def update_profile(
         user.stats.streak = int(update.streak)
 
     # ----------------------------
-    # 5) Inventory (DB handles it as JSON string)
+    # 5) Inventory: older clients still send their whole item list here. It is
+    # not written: it would hand out unpaid items and drop ones bought
+    # concurrently through POST /shop/purchase, the only way items are granted.
     # ----------------------------
-    if update.inventory is not None:
-        try:
-            user.inventory = json.dumps(list(update.inventory))
-        except Exception:
-            raise HTTPException(status_code=400, detail="Invalid inventory format")
 
-    db.commit()
-    db.refresh(user)
+    # ----------------------------
+    # 6) Deltas: one UPDATE ... SET x = x + ? so they compose with submit_mission's rewards
+    # ----------------------------
+    stats = (user.stats.xp_total, user.stats.credits, user.stats.streak)
+    xp_delta = update.xp_delta or 0
+    credits_delta = update.credits_delta or 0
+    if xp_delta or credits_delta:
+        db.flush()
+        row = db.execute(
+            sql_update(models.UserStats)
+            .where(models.UserStats.user_id == user.id, models.UserStats.credits + credits_delta >= 0)
+            .values(xp_total=models.UserStats.xp_total + xp_delta, credits=models.UserStats.credits + credits_delta,
+                    version=models.UserStats.version + 1)
+            .returning(models.UserStats.xp_total, models.UserStats.credits, models.UserStats.streak)
+            .execution_options(synchronize_session=False)
+        ).first()
+        if row is None:
+            raise HTTPException(status_code=400, detail="Not enough credits")
+        stats = tuple(row)
 
-    return {
+    response = {
         "success": True,
         "message": "Profile updated",
         "user": {
@@ -816,17 +1038,45 @@ def update_profile(
             "age": user.age,
             "avatar": user.avatar,
             "theme": user.theme,
-            "xp": user.stats.xp_total if user.stats else 0,
-            "credits": user.stats.credits if user.stats else 0,
-            "streak": user.stats.streak if user.stats else 0,
-            "inventory": user.inventory,
+            "xp": stats[0],
+            "credits": stats[1],
+            "streak": stats[2],
+            "inventory": inventory.item_list(db, user.id),
         }
     }
+    db.commit()
+    return response
+
+# --- SHOP ---
+
+@app.post("/shop/purchase", dependencies=[Depends(admission.admit_writer)])
+def shop_purchase(purchase: PurchaseRequest, user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+    """Charge the catalog price and grant the item in one transaction; 400 when credits are short."""
+    result = run_write(db, _shop_purchase, user.id, purchase.item_id, purchase.qty)
+    events.broker.publish(user.id, "stats", {
+        "xp": result["xp"], "credits": result["credits"], "streak": result["streak"],
+        "xp_gained": 0, "credits_gained": -result["spent"],
+    })
+    return result
+
+def _shop_purchase(db: Session, user_id: int, item_id: str, qty: int):
+    (credits, xp_total, streak), items = inventory.purchase(db, user_id, item_id, qty)
+    db.commit()
+    price, kind = inventory.CATALOG[item_id]
+    return {
+        "success": True,
+        "item_id": item_id,
+        "spent": price * (qty if kind == "stack" else 1),
+        "credits": credits,
+        "xp": xp_total,
+        "streak": streak,
+        "inventory": items,
+    }
 
 # --- LMS ENDPOINTS ---
 
 @app.get("/courses")
-def get_courses(user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+def get_courses(user: models.User = Depends(get_current_user), db: Session = Depends(get_read_db)):
     all_courses = db.query(models.Course).filter(models.Course.is_active == True).order_by(models.Course.order_index).all()
     
     courses_data = []
@@ -949,20 +1199,46 @@ def get_solar_system(course_id: int, user: models.User = Depends(get_current_use
         "solar_system": tracks_data
     }
 
+@app.get("/catalog/version")
+def catalog_version():
+    # Mission content itself is served as static files (see static_catalog.py)
+    version = static_catalog.current_version()
+    if not version:
+        raise HTTPException(status_code=404, detail="Static catalog not exported")
+    return {
+        "success": True,
+        "version": version,
+        "base_url": static_catalog.STATIC_URL,
+        "manifest": f"{static_catalog.STATIC_URL}/manifest.{version}.json"
+    }
+
 @app.get("/missions/{mission_id}")
-def get_mission(mission_id: int, db: Session = Depends(get_db)):
+def get_mission(mission_id: int, db: Session = Depends(get_read_db)):
     mission = db.query(models.Mission).get(mission_id)
     if not mission:
         raise HTTPException(status_code=404, detail="Mission not found")
-    
+    return static_catalog.mission_body(mission)
+
+@app.get("/missions/{mission_id}/quiz")
+def get_mission_quiz(mission_id: int, db: Session = Depends(get_read_db)):
+    # Same as /missions/{id} but with freshly drawn options for vocabulary sections.
+    # Answers to these must be submitted as option text, not index. Grammar sections
+    # keep their authored options (distractors from other blanks can also be correct).
+    mission = db.query(models.Mission).get(mission_id)
+    if not mission:
+        raise HTTPException(status_code=404, detail="Mission not found")
+
     sections = []
     for sec in mission.sections:
+        payload = sec.payload_json
+        if sec.key == "vocabulary" and isinstance(payload, dict) and payload.get("correct"):
+            payload = {**payload, "options": distractors.index.options(sec.key, payload["correct"])}
         sections.append({
             "key": sec.key,
             "title": sec.title,
-            "payload": sec.payload_json
+            "payload": payload
         })
-    
+
     return {
         "success": True,
         "mission": {
@@ -974,13 +1250,43 @@ def get_mission(mission_id: int, db: Session = Depends(get_db)):
         }
     }
 
-@app.post("/missions/{mission_id}/submit")
+@app.post("/missions/{mission_id}/submit", dependencies=[Depends(admission.admit_writer)])
 def submit_mission(mission_id: int, submission: MissionSubmit, user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+    result = run_write(db, _submit_mission, user.id, mission_id, submission)
+    reminders.scheduler.refresh(db, user.id) # a pass may have added words to the bank
+    _publish_submit(user.id, result)
+    return result
+
+def _publish_submit(user_id: int, result: dict):
+    # Live dashboard deltas (events.py); published only once the submit committed
+    if result["xp_gained"] or result["credits_gained"]:
+        events.broker.publish(user_id, "stats", {
+            "xp": result["new_total_xp"], "credits": result["new_total_credits"], "streak": result["streak"],
+            "xp_gained": result["xp_gained"], "credits_gained": result["credits_gained"],
+        })
+    for unlocked_id in result["unlocked_mission_ids"]:
+        events.broker.publish(user_id, "mission_unlocked", {"mission_id": unlocked_id})
+    if result["certificate_awarded"]:
+        events.broker.publish(user_id, "certificate", result["certificate_awarded"])
+
+def _submit_mission(db: Session, user_id: int, mission_id: int, submission: MissionSubmit):
+    user = db.get(models.User, user_id)
     next_mission = None
-    passed = submission.score >= 70
+    unlocked = []
+    awarded = None
     
     mission = db.query(models.Mission).get(mission_id)
     if not mission: raise HTTPException(404, "Mission not found")
+
+    # Graded server-side; the client's score only counts for missions with nothing to grade
+    graded = grading.grade(db, mission_id, submission.answers)
+    if graded is None:
+        # Speaking missions: answers are what the learner said (speech-to-text transcripts)
+        graded = transcript.grade_speaking(db, mission_id, submission.answers)
+    if graded is None and (mission_id in grading.get_keys(db) or transcript.mission_targets(db, mission_id)):
+        raise HTTPException(status_code=400, detail="Answers are required for this mission")
+    score = graded.score if graded else submission.score
+    passed = score >= grading.PASS_SCORE
     
     user_stats = db.query(models.UserStats).filter(models.UserStats.user_id == user.id).first()
     
@@ -994,7 +1300,7 @@ def submit_mission(mission_id: int, submission: MissionSubmit, user: models.User
         db.add(progress)
     
     progress.attempts += 1
-    progress.score = submission.score
+    progress.score = score
     
     xp_gained = 0
     message = "Mission Complete"
@@ -1038,6 +1344,7 @@ def submit_mission(mission_id: int, submission: MissionSubmit, user: models.User
             if not next_prog:
                 new_prog = models.UserMissionProgress(user_id=user.id, mission_id=next_mission.id, status="unlocked")
                 db.add(new_prog)
+                unlocked.append(next_mission.id)
         
         # Connect Vocabulary to User (SRS System)
         for section in mission.sections:
@@ -1103,6 +1410,7 @@ def submit_mission(mission_id: int, submission: MissionSubmit, user: models.User
                          ).first()
                          if not m1_prog:
                              db.add(models.UserMissionProgress(user_id=user.id, mission_id=m1.id, status="unlocked"))
+                             unlocked.append(m1.id)
 
     # --- COURSE COMPLETION CHECK ---
     # Check if all missions in this course are completed
@@ -1133,11 +1441,16 @@ def submit_mission(mission_id: int, submission: MissionSubmit, user: models.User
                     date_awarded=date.today().strftime("%Y-%m-%d")
                 )
                 db.add(new_cert)
+                awarded = new_cert
             
             # Always return message so User sees Victory Modal on replay of last mission
             course_msg = f"Felicidades! Has completado el curso {course.title}."
 
     db.commit()
+
+    # Attempt history is append-only and written in batches (see attempts.py)
+    attempts.log.record(user.id, mission_id, score, attempts.clamp_duration(submission.duration_sec, mission.duration_min),
+                        submission.answers, passed, completed=xp_gained > 0)
     
     # --- VOCABULARY PROCESSING ---
     # Attempt to extract vocabulary from mission sections
@@ -1183,13 +1496,66 @@ def submit_mission(mission_id: int, submission: MissionSubmit, user: models.User
         "new_total_credits": user_stats.credits,
         "streak": user_stats.streak,
         "status": progress.status,
+        "score": score,
+        "graded": graded is not None,
         "message": message,
         "course_completed": course_msg,
-        "next_mission_id": next_mission_id
+        "next_mission_id": next_mission_id,
+        "unlocked_mission_ids": unlocked,
+        "certificate_awarded": sync._certificate(awarded) if awarded else None
     }
 
+@app.post("/missions/grade")
+def grade_missions(batch: GradeBatch, user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+    # Batch grading for offline sync: grades only, progress is still recorded through /submit
+    results = grading.grade_batch(db, [(item.mission_id, item.answers) for item in batch.submissions])
+    return {
+        "success": True,
+        "results": [
+            {
+                "mission_id": item.mission_id,
+                "graded": r is not None,
+                "score": r.score if r else None,
+                "correct": r.correct if r else 0,
+                "total": r.total if r else 0,
+                "sections": r.results if r else []
+            }
+            for item, r in zip(batch.submissions, results)
+        ]
+    }
+
+@app.post("/missions/{mission_id}/transcripts")
+def score_transcripts(mission_id: int, batch: TranscriptBatch, user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+    by_section = {}
+    for i, u in enumerate(batch.utterances):
+        by_section.setdefault(u.section, []).append(i)
+
+    results = [None] * len(batch.utterances)
+    for section, positions in by_section.items():
+        target = transcript.get_target(db, mission_id, section)
+        if target is None:
+            continue
+        scores = transcript.score_batch(target, [batch.utterances[i].text for i in positions])
+        for i, s in zip(positions, scores):
+            results[i] = {
+                "section": section,
+                "expected": target.text,
+                "score": s.score,
+                "char_similarity": s.char_similarity,
+                "token_similarity": s.token_similarity,
+                "passed": s.score >= grading.PASS_SCORE
+            }
+    return {"success": True, "results": results}
+
+def rank_for_xp(xp):
+    rank = "Cadet (A1)"
+    if xp >= 1000: rank = "Explorer (A2)"
+    if xp >= 2500: rank = "Captain (B1)"
+    if xp >= 5000: rank = "Admiral (B2)"
+    return rank
+
 @app.get("/stats")
-def get_stats(user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+def get_stats(user: models.User = Depends(get_current_user), db: Session = Depends(get_read_db)):
     stats = db.query(models.UserStats).filter(models.UserStats.user_id == user.id).first()
     if not stats:
         return {"success": False, "error": "No stats found"}
@@ -1212,11 +1578,7 @@ def get_stats(user: models.User = Depends(get_current_user), db: Session = Depen
         if m:
             minutes_count += m.duration_min
 
-    # Rank Logic
-    rank = "Cadet (A1)"
-    if stats.xp_total >= 1000: rank = "Explorer (A2)"
-    if stats.xp_total >= 2500: rank = "Captain (B1)"
-    if stats.xp_total >= 5000: rank = "Admiral (B2)"
+    rank = rank_for_xp(stats.xp_total)
     
     # Achievements Calculation
     perfect_scores = db.query(models.UserMissionProgress).filter(
@@ -1261,3 +1623,440 @@ def get_stats(user: models.User = Depends(get_current_user), db: Session = Depen
         "certificates": certs,
         "vocabularyBank": vocab_items
     }
+
+# --- BOOTSTRAP ---
+
+@app.get("/me/bootstrap")
+def bootstrap(user: models.User = Depends(get_current_user), db: Session = Depends(get_read_db)):
+    """Everything the app needs at launch (profile, courses with progress, stats, vocabulary bank, due reviews).
+
+    Fixed query budget regardless of course or mission count: the auth lookup plus
+    six queries (stats, course totals, per-course progress, certificates, vocabulary,
+    inventory).
+    """
+    stats = db.execute(
+        select(models.UserStats.xp_total, models.UserStats.credits, models.UserStats.streak)
+        .where(models.UserStats.user_id == user.id)
+    ).first() or (0, 0, 0)
+    xp_total, credits, streak = stats
+
+    catalog = db.execute(
+        select(models.Course, func.count(models.Mission.id))
+        .outerjoin(models.Mission, models.Mission.course_id == models.Course.id)
+        .where(models.Course.is_active == True)
+        .group_by(models.Course.id)
+        .order_by(models.Course.order_index)
+    ).all()
+
+    completed = models.UserMissionProgress.status == "completed"
+    progress = {
+        course_id: (done, minutes, perfect)
+        for course_id, done, minutes, perfect in db.execute(
+            select(
+                models.Mission.course_id,
+                func.sum(case((completed, 1), else_=0)),
+                func.sum(case((completed, models.Mission.duration_min), else_=0)),
+                func.sum(case((models.UserMissionProgress.score >= 100, 1), else_=0)),
+            )
+            .join(models.Mission, models.Mission.id == models.UserMissionProgress.mission_id)
+            .where(models.UserMissionProgress.user_id == user.id)
+            .group_by(models.Mission.course_id)
+        )
+    }
+
+    certs = [
+        {"id": str(c.id), "title": c.title, "level": c.level, "date": c.date_awarded}
+        for c in db.execute(select(models.Certificate).where(models.Certificate.user_id == user.id)).scalars()
+    ]
+
+    now_ms = time.time() * 1000 # next_review is a JS timestamp
+    bank = db.execute(
+        select(models.VocabularyItem).where(models.VocabularyItem.user_id == user.id)
+    ).scalars().all()
+    words = len(bank)
+    due = sum(1 for v in bank if v.next_review is not None and v.next_review <= now_ms)
+
+    courses_data = []
+    for i, (c, total_missions) in enumerate(catalog):
+        completed_count = progress.get(c.id, (0, 0, 0))[0] or 0
+        is_completed = total_missions > 0 and completed_count >= total_missions
+        courses_data.append({
+            "id": c.id,
+            "title": c.title,
+            "description": c.description,
+            "level": c.level,
+            "order_index": c.order_index,
+            "is_active": c.is_active,
+            "is_unlocked": i == 0 or courses_data[i-1]["is_completed"],
+            "is_completed": is_completed,
+            "progress_percent": int((completed_count / total_missions * 100)) if total_missions > 0 else 0,
+            "total_missions": total_missions,
+            "completed_count": completed_count
+        })
+
+    missions_count = sum(p[0] or 0 for p in progress.values())
+    return {
+        "success": True,
+        "user": {
+            "id": user.id,
+            "email": user.email,
+            "name": user.name,
+            "age": user.age,
+            "avatar": user.avatar,
+            "theme": user.theme,
+            "xp": xp_total,
+            "credits": credits,
+            "streak": streak,
+            "inventory": inventory.item_list(db, user.id),
+            "activeBadge": user.active_badge,
+            "certificates": certs
+        },
+        "courses": courses_data,
+        "stats": {
+            "xp": xp_total,
+            "credits": credits,
+            "streak": streak,
+            "rank": rank_for_xp(xp_total),
+            "missions_completed": missions_count,
+            "words_learned": words or missions_count * 3,
+            "minutes_spent": sum(p[1] or 0 for p in progress.values())
+        },
+        "achievements": {
+            "lessonsCompleted": missions_count,
+            "wordsLearned": words,
+            "quizPerfect": sum(p[2] or 0 for p in progress.values())
+        },
+        "vocabularyBank": [sync._vocabulary(v) for v in bank],
+        "due_reviews": due
+    }
+
+# --- LEADERBOARD ---
+
+@app.get("/leaderboard")
+def leaderboard(limit: int = 20, user: models.User = Depends(get_current_user), db: Session = Depends(get_read_db)):
+    """Top learners by XP and the caller's rank; with sharded user data every shard answers and the lists are merged."""
+    limit = max(1, min(limit, 100))
+    my_xp = db.execute(select(models.UserStats.xp_total).where(models.UserStats.user_id == user.id)).scalar() or 0
+    top = (
+        select(models.User.id, models.User.name, models.User.avatar, models.UserStats.xp_total, models.UserStats.streak)
+        .join(models.UserStats, models.UserStats.user_id == models.User.id)
+        .order_by(models.UserStats.xp_total.desc(), models.User.id)
+        .limit(limit)
+    )
+    ahead = select(func.count()).select_from(models.UserStats).where(models.UserStats.xp_total > my_xp)
+    per_shard = fan_out(lambda s: (s.execute(top).all(), s.execute(ahead).scalar()))
+
+    merged = heapq.merge(*(rows for rows, _ in per_shard), key=lambda r: (-r.xp_total, r.id))
+    return {
+        "success": True,
+        "leaders": [
+            {"rank": i + 1, "id": r.id, "name": r.name, "avatar": r.avatar, "xp": r.xp_total, "streak": r.streak}
+            for i, r in enumerate(list(merged)[:limit])
+        ],
+        "me": {"rank": 1 + sum(n for _, n in per_shard), "xp": my_xp},
+    }
+
+# --- AI GENERATION (cached proxy, see generation.py) ---
+
+@app.post("/ai/lesson")
+def generate_lesson(req: LessonRequest, user: models.User = Depends(get_current_user)):
+    if not req.topic.strip():
+        raise HTTPException(status_code=400, detail="Topic is required")
+    request = generation.lesson_request(req.level, req.topic, req.age if req.age is not None else user.age)
+    try:
+        lesson, source = generation.cache.get("lesson", request)
+    except generation.GenerationError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    return {"success": True, "lesson": lesson, "cached": source != "generated"}
+
+@app.post("/ai/chat")
+def tutor_chat(req: ChatRequest, user: models.User = Depends(get_current_user)):
+    request = generation.chat_request(req.level, req.message, req.history, req.attachment)
+    try:
+        reply, source = generation.cache.get("chat", request)
+    except generation.GenerationError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    return {"success": True, "text": reply["text"], "cached": source != "generated"}
+
+# --- DELTA SYNC ---
+
+@app.get("/sync")
+def sync_changes(since: str | None = None, user: models.User = Depends(get_current_user), db: Session = Depends(get_read_db)):
+    """Progress, vocabulary, stats and certificates changed since the cursor of the previous call.
+
+    Without a cursor everything is returned with "full": true; keep the returned
+    cursor and pass it back as ?since= to get only what changed.
+    """
+    cursor = sync.parse_cursor(since)
+    if cursor is None:
+        raise HTTPException(status_code=400, detail="Invalid sync cursor")
+    return {"success": True, **sync.changes(db, user.id, cursor)}
+
+# --- LIVE EVENTS ---
+
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login", auto_error=False)
+
+def get_stream_user(header_token: str | None = Depends(optional_oauth2_scheme), token: str | None = None,
+                    db: Session = Depends(get_db), read_db: Session = Depends(get_read_db)):
+    # EventSource cannot send headers, so streams also take ?token=
+    return get_current_user(header_token or token or "", db, read_db)
+
+@app.get("/me/events")
+def me_events(user: models.User = Depends(get_stream_user), db: Session = Depends(get_db),
+              read_db: Session = Depends(get_read_db)):
+    """Server-sent events with stats, unlock and certificate deltas (see events.py).
+
+    The first event, "ready", carries a sync cursor: GET /sync?since=<cursor>
+    once covers anything committed before the stream was open, and again after
+    a "resync" event.
+    """
+    rejected = events.broker.admit(user.id)
+    if rejected:
+        raise HTTPException(status_code=rejected[0], detail=rejected[1], headers={"Retry-After": "30"})
+    ready = {"cursor": str(sync.current(db))}
+    user_id = user.id
+    # The stream can stay open for hours; it must not hold pooled connections meanwhile
+    db.close()
+    read_db.close()
+    return StreamingResponse(
+        events.broker.stream(user_id, ready),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# --- VOCABULARY ENDPOINTS ---
+
+@app.post("/vocabulary/import", dependencies=[Depends(admission.admit_writer)])
+def import_vocabulary(file: UploadFile = File(...), user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+    # Streams the uploaded CSV/TSV deck; duplicates of existing words are skipped
+    imported, skipped = vocab_import.import_file(db, user.id, file.file)
+    reminders.scheduler.refresh(db, user.id)
+    return {"success": True, "imported": imported, "skipped": skipped}
+
+REVIEW_DIFFICULTIES = ("hard", "good", "easy")
+ONE_DAY_MS = 86_400_000
+
+@app.post("/vocabulary/{item_id}/review", dependencies=[Depends(admission.admit_writer)])
+def review_word(item_id: int, grade: ReviewGrade, user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+    if grade.difficulty not in REVIEW_DIFFICULTIES:
+        raise HTTPException(status_code=400, detail="difficulty must be 'hard', 'good' or 'easy'")
+    word = run_write(db, _review_word, user.id, item_id, grade.difficulty)
+    reminders.scheduler.refresh(db, user.id)
+    return {"success": True, "word": word}
+
+def _review_word(db: Session, user_id: int, item_id: int, difficulty: str):
+    # Same SM-2 variant as ReviewCenter.tsx, so the server owns next_review
+    item = db.query(models.VocabularyItem).filter(
+        models.VocabularyItem.id == item_id, models.VocabularyItem.user_id == user_id
+    ).first()
+    if not item:
+        raise HTTPException(status_code=404, detail="Word not found")
+    interval, ease, streak = item.interval or 1, item.ease_factor or 2.5, item.streak or 0
+    if difficulty == "hard":
+        interval, streak, ease = 1, 0, max(1.3, ease - 0.2)
+    elif difficulty == "good":
+        interval = 1 if streak == 0 else 3 if streak == 1 else round(interval * ease)
+        streak += 1
+    else:
+        interval = 2 if streak == 0 else 4 if streak == 1 else round(interval * ease * 1.3)
+        streak += 1
+        ease += 0.15
+    item.interval, item.ease_factor, item.streak = interval, ease, streak
+    item.next_review = time.time() * 1000 + interval * ONE_DAY_MS
+    db.commit()
+    return sync._vocabulary(item)
+
+@app.get("/vocabulary/quiz")
+def vocabulary_quiz(count: int = 10, user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+    # Review questions from the user's own bank, due words first
+    count = max(1, min(count, 50))
+    items = db.query(models.VocabularyItem).filter(
+        models.VocabularyItem.user_id == user.id
+    ).order_by(models.VocabularyItem.next_review).limit(count).all()
+
+    questions = []
+    for v in items:
+        questions.append({
+            "id": v.id,
+            "word": v.word,
+            "options": distractors.index.options("vocabulary", v.translation),
+            "correct": v.translation
+        })
+    random.shuffle(questions)
+    return {"success": True, "questions": questions}
+
+# --- SEARCH ---
+
+@app.get("/search")
+def search_content(q: str, scope: str = "missions", limit: int = 20, cursor: str | None = None,
+                   user: models.User = Depends(get_current_user), db: Session = Depends(get_read_db)):
+    limit = max(1, min(limit, 50))
+    if scope == "vocabulary":
+        results, next_cursor = search.search_vocabulary(db, user.id, q, limit, cursor)
+    elif scope == "missions":
+        results, next_cursor = search.search_sections(db, q, limit, cursor)
+    else:
+        raise HTTPException(status_code=400, detail="scope must be 'missions' or 'vocabulary'")
+    return {"success": True, "results": results, "next_cursor": next_cursor}
+
+# --- MONITORING ---
+
+@app.get("/admin/admission")
+def admission_stats(admin: models.User = Depends(get_admin_user)):
+    return {"success": True, "writer_gate": admission.writer_gate.snapshot(), "write_queue": write_queue.writer.snapshot()}
+
+@app.get("/admin/ai/cache")
+def ai_cache_stats(admin: models.User = Depends(get_admin_user)):
+    return {"success": True, "cache": generation.cache.snapshot()}
+
+@app.get("/admin/reminders")
+def reminder_stats(admin: models.User = Depends(get_admin_user)):
+    return {"success": True, "enabled": reminders.scheduler.enabled, "scheduler": reminders.scheduler.snapshot()}
+
+@app.post("/admin/users/import")
+def import_roster(file: UploadFile = File(...), admin: models.User = Depends(get_admin_user)):
+    """Register a CSV roster (email, name, password, age, english_level, daily_goal_min) in bulk."""
+    try:
+        report = roster.import_file(file.file)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"success": True, **report.as_dict()}
+
+@app.get("/admin/events")
+def event_stats(admin: models.User = Depends(get_admin_user)):
+    return {"success": True, "events": events.broker.snapshot()}
+
+@app.get("/admin/missions/difficulty")
+def mission_difficulty(course_id: int | None = None, limit: int = 5,
+                       admin: models.User = Depends(get_admin_user), db: Session = Depends(get_read_db)):
+    limit = max(1, min(limit, 50))
+    return {"success": True, "courses": mission_stats.course_report(db, course_id, limit)}
+
+@app.get("/admin/profiles")
+def list_profiles(admin: models.User = Depends(get_admin_user)):
+    return {"success": True, "enabled": profiler.ENABLED, "profiles": profiler.list_profiles()}
+
+@app.get("/admin/profiles/{profile_id}")
+def download_profile(profile_id: str, format: str = "json", admin: models.User = Depends(get_admin_user)):
+    path = profiler.profile_path(profile_id)
+    if not path:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "collapsed":
+        # One "frame;frame;frame count" line per stack, for flamegraph tools
+        return PlainTextResponse(profiler.collapsed(profile_id))
+    return FileResponse(path, media_type="application/json", filename=f"{profile_id}.json")
+
+# --- ACTIVITY ---
+
+@app.get("/me/activity")
+def get_activity(days: int = 30, user: models.User = Depends(get_current_user), db: Session = Depends(get_read_db)):
+    days = max(1, min(days, 366))
+    return {"success": True, "daily": attempts.daily_activity(db, user.id, days)}
+
+@app.get("/me/activity/heatmap")
+def get_activity_heatmap(weeks: int = 26, user: models.User = Depends(get_current_user), db: Session = Depends(get_read_db)):
+    weeks = max(1, min(weeks, 53))
+    return {"success": True, "heatmap": attempts.heatmap(db, user.id, weeks)}
+
+# --- EXPORT ENDPOINTS ---
+
+@app.get("/me/export")
+def export_me(user: models.User = Depends(get_current_user)):
+    return StreamingResponse(
+        export.stream_user_export(user.id),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="ingles-genius-{user.id}.ndjson"'}
+    )
+
+@app.get("/admin/export")
+def export_all_users(admin: models.User = Depends(get_admin_user)):
+    return StreamingResponse(
+        export.stream_all_users_gzip(),
+        media_type="application/gzip",
+        headers={"Content-Disposition": 'attachment; filename="ingles-genius-users.ndjson.gz"'}
+    )
+
+
+if __name__ == "__main__":
+    import argparse
+    from concurrent.futures import ThreadPoolExecutor
+    from types import SimpleNamespace
+
+    parser = argparse.ArgumentParser(description="API utilities")
+    parser.add_argument("--stress", type=int, metavar="REQUESTS",
+                        help="per learner: concurrent duplicate submits, profile deltas and purchases; "
+                             "checks XP and credits are awarded exactly once")
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--threads", type=int, default=32)
+    args = parser.parse_args()
+
+    if args.stress:
+        # Writes stress<stamp>_<n>@example.com learners to the configured database; use a scratch copy
+        startup_event()
+        stamp = int(time.time())
+        n = min(args.stress, inventory.MAX_QTY)
+        start_credits = inventory.CATALOG["shield_1"][0] * (n // 2) # roughly half the purchases are affordable
+
+        with SessionLocal() as db:
+            mission = db.query(models.Mission).order_by(models.Mission.id).first()
+            answers = {str(s.order_index): s.payload_json.get("correct") or transcript._section_text(s.payload_json)
+                       for s in mission.sections if isinstance(s.payload_json, dict)}
+
+        def call(endpoint, user_id, *params):
+            db = route(SessionLocal(), user_id)
+            try:
+                return endpoint(*params, SimpleNamespace(id=user_id), db)
+            except HTTPException as e:
+                return e.status_code
+            except Exception as e:
+                return type(e).__name__
+            finally:
+                db.close()
+
+        user_ids = []
+        for i in range(args.users):
+            with SessionLocal() as db:
+                user_ids.append(register(UserCreate(email=f"stress{stamp}_{i}@example.com", password="stress",
+                                                    name=f"Stress {i}"), db)["user_id"])
+            call(update_profile, user_ids[-1], ProfileUpdate(credits=start_credits))
+
+        jobs = []
+        for user_id in user_ids:
+            for _ in range(n):
+                jobs.append(("submit", user_id, submit_mission, mission.id, MissionSubmit(score=0, answers=answers)))
+                jobs.append(("profile", user_id, update_profile, ProfileUpdate(xp_delta=1, credits_delta=10)))
+                jobs.append(("purchase", user_id, shop_purchase, PurchaseRequest(item_id="shield_1")))
+        random.shuffle(jobs)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            results = list(pool.map(lambda job: (job[0], job[1], call(job[2], job[1], *job[3:])), jobs))
+        elapsed = time.perf_counter() - started
+
+        outcomes = {}
+        failures = []
+        for user_id in user_ids:
+            mine = [(kind, r) for kind, uid, r in results if uid == user_id]
+            ok = {kind: [r for k, r in mine if k == kind and isinstance(r, dict)] for kind in ("submit", "profile", "purchase")}
+            for kind, r in mine:
+                if not isinstance(r, dict):
+                    outcomes[(kind, r)] = outcomes.get((kind, r), 0) + 1
+            rewarded = sum(1 for r in ok["submit"] if r["xp_gained"])
+            expected_xp = sum(r["xp_gained"] for r in ok["submit"]) + len(ok["profile"])
+            expected_credits = (start_credits + sum(r["credits_gained"] for r in ok["submit"])
+                                + 10 * len(ok["profile"]) - sum(r["spent"] for r in ok["purchase"]))
+            with route(SessionLocal(), user_id) as db:
+                stats = db.query(models.UserStats).filter(models.UserStats.user_id == user_id).one()
+                shields = inventory.item_list(db, user_id).count("shield_1")
+            if rewarded != 1:
+                failures.append(f"user {user_id}: mission reward granted {rewarded} times")
+            if (stats.xp_total, stats.credits, shields) != (expected_xp, expected_credits, len(ok["purchase"])):
+                failures.append(f"user {user_id}: xp/credits/shields {stats.xp_total}/{stats.credits}/{shields}, "
+                                f"expected {expected_xp}/{expected_credits}/{len(ok['purchase'])}")
+        shutdown_event()
+
+        print(f"{len(jobs)} writes from {args.threads} threads for {args.users} learners in {elapsed:.2f}s "
+              f"({len(jobs) / elapsed:.0f}/s); refused: {outcomes or 'none'}")
+        if failures:
+            raise SystemExit("FAILED:\n  " + "\n  ".join(failures))
+        print("OK: one mission reward per learner, every accepted delta and purchase counted once")
@@ -0,0 +1,26 @@
+import sqlite3
+import os
+
+DB_FILE = os.path.join(os.path.dirname(__file__), "sql_app.db")
+
+# users.archived_at for hot/cold tiering (see archive.py); user_archives itself
+# is created by create_all() at startup.
+def migrate():
+    if not os.path.exists(DB_FILE):
+        print(f"Database {DB_FILE} not found.")
+        return
+
+    conn = sqlite3.connect(DB_FILE)
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("ALTER TABLE users ADD COLUMN archived_at DATETIME")
+        print("Added users.archived_at")
+    except sqlite3.OperationalError as e:
+        print(f"Skipping users.archived_at: {e}")
+
+    conn.commit()
+    conn.close()
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,35 @@
+import sqlite3
+import os
+
+DB_FILE = os.path.join(os.path.dirname(__file__), "sql_app.db")
+
+# Indexes declared in models.py after the tables already existed in production.
+# create_all() never touches existing tables, so they are added here.
+INDEXES = [
+    ("ix_vocabulary_items_user_id", "vocabulary_items", "user_id"),
+    ("ix_user_mission_progress_user_id", "user_mission_progress", "user_id"),
+    ("ix_certificates_user_id", "certificates", "user_id"),
+    ("ix_user_stats_xp_total", "user_stats", "xp_total"),
+    ("ix_vocabulary_items_user_review", "vocabulary_items", "user_id, next_review"),
+]
+
+def migrate():
+    if not os.path.exists(DB_FILE):
+        print(f"Database {DB_FILE} not found.")
+        return
+
+    conn = sqlite3.connect(DB_FILE)
+    cursor = conn.cursor()
+
+    for name, table, columns in INDEXES:
+        try:
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+            print(f"Ensured index {name}")
+        except sqlite3.OperationalError as e:
+            print(f"Skipping {name}: {e}")
+
+    conn.commit()
+    conn.close()
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,50 @@
+import sqlite3
+import os
+import json
+
+DB_FILE = os.path.join(os.path.dirname(__file__), "sql_app.db")
+
+# Moves the users.inventory JSON lists into user_inventory rows (see inventory.py).
+# Users that already have rows there are skipped, so the script can be re-run.
+def migrate():
+    if not os.path.exists(DB_FILE):
+        print(f"Database {DB_FILE} not found.")
+        return
+
+    conn = sqlite3.connect(DB_FILE)
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS user_inventory (
+            user_id INTEGER NOT NULL REFERENCES users (id),
+            item_id VARCHAR NOT NULL,
+            qty INTEGER NOT NULL,
+            PRIMARY KEY (user_id, item_id)
+        )
+    """)
+
+    rows = cursor.execute("""
+        SELECT id, inventory FROM users
+        WHERE inventory IS NOT NULL AND inventory NOT IN ('', '[]')
+          AND NOT EXISTS (SELECT 1 FROM user_inventory i WHERE i.user_id = users.id)
+    """).fetchall()
+    items = []
+    for user_id, blob in rows:
+        try:
+            owned = json.loads(blob)
+        except ValueError:
+            print(f"Skipping user {user_id}: inventory is not JSON")
+            continue
+        counts = {}
+        for item_id in owned if isinstance(owned, list) else []:
+            counts[str(item_id)] = counts.get(str(item_id), 0) + 1
+        items += [(user_id, item_id, qty) for item_id, qty in counts.items()]
+
+    cursor.executemany("INSERT OR IGNORE INTO user_inventory (user_id, item_id, qty) VALUES (?, ?, ?)", items)
+    print(f"Moved {len(items)} inventory items of {len(rows)} users")
+
+    conn.commit()
+    conn.close()
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,39 @@
+import sqlite3
+import os
+
+DB_FILE = os.path.join(os.path.dirname(__file__), "sql_app.db")
+
+# change_seq columns for delta sync (see sync.py). Existing rows keep 0 and are
+# only sent on a full sync; sync_sequence, sync_tombstones and the triggers are
+# created at startup.
+TABLES = ["user_stats", "user_mission_progress", "vocabulary_items", "certificates"]
+INDEXES = [
+    ("ix_user_mission_progress_user_change", "user_mission_progress", "user_id, change_seq"),
+    ("ix_vocabulary_items_user_change", "vocabulary_items", "user_id, change_seq"),
+    ("ix_certificates_user_change", "certificates", "user_id, change_seq"),
+]
+
+def migrate():
+    if not os.path.exists(DB_FILE):
+        print(f"Database {DB_FILE} not found.")
+        return
+
+    conn = sqlite3.connect(DB_FILE)
+    cursor = conn.cursor()
+
+    for table in TABLES:
+        try:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN change_seq INTEGER NOT NULL DEFAULT 0")
+            print(f"Added {table}.change_seq")
+        except sqlite3.OperationalError as e:
+            print(f"Skipping {table}.change_seq: {e}")
+
+    for name, table, columns in INDEXES:
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+        print(f"Ensured index {name}")
+
+    conn.commit()
+    conn.close()
+
+if __name__ == "__main__":
+    migrate()
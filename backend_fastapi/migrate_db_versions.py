@@ -0,0 +1,41 @@
+import sqlite3
+import os
+
+DB_FILE = os.path.join(os.path.dirname(__file__), "sql_app.db")
+
+# Version columns for optimistic concurrency (see models.UserStats / UserMissionProgress)
+COLUMNS = [
+    ("user_stats", "version"),
+    ("user_mission_progress", "version"),
+]
+
+def migrate():
+    if not os.path.exists(DB_FILE):
+        print(f"Database {DB_FILE} not found.")
+        return
+
+    conn = sqlite3.connect(DB_FILE)
+    cursor = conn.cursor()
+
+    for table, column in COLUMNS:
+        try:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} INTEGER NOT NULL DEFAULT 1")
+            print(f"Added {table}.{column}")
+        except sqlite3.OperationalError as e:
+            print(f"Skipping {table}.{column}: {e}")
+
+    # One progress row per user and mission, so concurrent first submits conflict instead of duplicating
+    try:
+        cursor.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_user_mission_progress_user_mission "
+            "ON user_mission_progress (user_id, mission_id)"
+        )
+        print("Ensured uq_user_mission_progress_user_mission")
+    except sqlite3.IntegrityError as e:
+        print(f"Skipping unique index, merge duplicate progress rows first: {e}")
+
+    conn.commit()
+    conn.close()
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,145 @@
+"""
+Incremental per-mission difficulty analytics.
+
+mission_stats keeps running counters (attempts, passes, completions, score sum)
+and mission_score_bins a 21-bin score histogram per mission, which serves as a
+fixed-size quantile sketch for the bounded 0-100 score range. Both are advanced
+with additive upserts from the attempt log flush (attempts.py), so concurrent
+workers never overwrite each other and no query ever aggregates
+user_mission_progress or mission_attempts.
+
+Reports cost O(missions in course), independent of how many learners there are.
+
+Usage:
+    python mission_stats.py --rebuild   # recompute from mission_attempts
+"""
+from collections import defaultdict
+
+from sqlalchemy import select
+
+import models
+
+BINS = 21
+
+_UPSERT_STATS = (
+    "INSERT INTO mission_stats (mission_id, course_id, attempts, passes, completions, score_sum) "
+    "VALUES (?, (SELECT course_id FROM missions WHERE id = ?), ?, ?, ?, ?) "
+    "ON CONFLICT(mission_id) DO UPDATE SET attempts = attempts + excluded.attempts, "
+    "passes = passes + excluded.passes, completions = completions + excluded.completions, "
+    "score_sum = score_sum + excluded.score_sum"
+)
+_UPSERT_BIN = (
+    "INSERT INTO mission_score_bins (mission_id, bin, count) VALUES (?, ?, ?) "
+    "ON CONFLICT(mission_id, bin) DO UPDATE SET count = count + excluded.count"
+)
+
+
+def score_bin(score):
+    return min(BINS - 1, max(0, int(score // 5)))
+
+
+def apply(cursor, attempts):
+    """Fold [(mission_id, score, passed, completed), ...] into the rollups using a DBAPI cursor."""
+    totals = defaultdict(lambda: [0, 0, 0, 0.0])
+    bins = defaultdict(int)
+    for mission_id, score, passed, completed in attempts:
+        t = totals[mission_id]
+        t[0] += 1
+        t[1] += int(passed)
+        t[2] += int(completed)
+        t[3] += score
+        bins[(mission_id, score_bin(score))] += 1
+    cursor.executemany(_UPSERT_STATS, [(m, m, *t) for m, t in totals.items()])
+    cursor.executemany(_UPSERT_BIN, [(m, b, n) for (m, b), n in bins.items()])
+
+
+def quantile(histogram, q):
+    """Approximate score quantile from a bin histogram (linear inside the bin)."""
+    total = sum(histogram)
+    if not total:
+        return None
+    target = q * total
+    seen = 0
+    for b, count in enumerate(histogram):
+        if count and seen + count >= target:
+            if b == BINS - 1:
+                return 100.0
+            return round(5 * b + 5 * (target - seen) / count, 1)
+        seen += count
+    return 100.0
+
+
+def course_report(db, course_id=None, limit=5):
+    """{course_id: {"hardest": [...], "easiest": [...]}} ranked by pass rate, then average score."""
+    S, M = models.MissionStats, models.Mission
+    query = select(S, M.title).join(M, M.id == S.mission_id).where(S.attempts > 0)
+    if course_id is not None:
+        query = query.where(S.course_id == course_id)
+    rows = db.execute(query).all()
+
+    histograms = defaultdict(lambda: [0] * BINS)
+    bin_query = select(models.MissionScoreBin.mission_id, models.MissionScoreBin.bin, models.MissionScoreBin.count)
+    if course_id is not None:
+        bin_query = bin_query.where(models.MissionScoreBin.mission_id.in_([s.mission_id for s, _ in rows]))
+    for mission_id, b, count in db.execute(bin_query):
+        histograms[mission_id][b] = count
+
+    by_course = defaultdict(list)
+    for s, title in rows:
+        h = histograms[s.mission_id]
+        by_course[s.course_id].append({
+            "mission_id": s.mission_id,
+            "title": title,
+            "attempts": s.attempts,
+            "completions": s.completions,
+            "pass_rate": round(s.passes / s.attempts, 3),
+            "avg_score": round(s.score_sum / s.attempts, 1),
+            "median_score": quantile(h, 0.5),
+            "p10_score": quantile(h, 0.1),
+            "p90_score": quantile(h, 0.9),
+        })
+
+    report = {}
+    for cid, missions in by_course.items():
+        missions.sort(key=lambda m: (m["pass_rate"], m["avg_score"]))
+        report[cid] = {"hardest": missions[:limit], "easiest": missions[::-1][:limit]}
+    return report
+
+
+def rebuild(engine):
+    """Recompute both rollups from the attempt history (one-time backfill or repair)."""
+    from grading import PASS_SCORE
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DELETE FROM mission_stats")
+        conn.exec_driver_sql("DELETE FROM mission_score_bins")
+        cursor = conn.connection.cursor()
+        first_pass = set()
+        batch = []
+        rows = conn.exec_driver_sql(
+            "SELECT user_id, mission_id, score FROM mission_attempts ORDER BY id"
+        )
+        for user_id, mission_id, score in rows:
+            passed = score >= PASS_SCORE
+            completed = passed and (user_id, mission_id) not in first_pass
+            if completed:
+                first_pass.add((user_id, mission_id))
+            batch.append((mission_id, score, passed, completed))
+            if len(batch) >= 10000:
+                apply(cursor, batch)
+                batch = []
+        apply(cursor, batch)
+        cursor.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    from database import engine, Base
+
+    parser = argparse.ArgumentParser(description="Mission difficulty rollups")
+    parser.add_argument("--rebuild", action="store_true")
+    args = parser.parse_args()
+    if args.rebuild:
+        Base.metadata.create_all(bind=engine)
+        rebuild(engine)
+        print("Mission stats rebuilt from mission_attempts.")
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, JSON, Float, DateTime, Date
+from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, JSON, Float, DateTime, Date, Index, LargeBinary
 from sqlalchemy.orm import relationship
 from database import Base
 from datetime import datetime
@@ -13,7 +13,7 @@ class User(Base):
     age = Column(Integer, nullable=True)
     avatar = Column(String, nullable=True)
     theme = Column(String, default="default")
-    inventory = Column(String, default="[]") # JSON list of item IDs
+    inventory = Column(String, default="[]") # Legacy JSON list of item IDs, superseded by user_inventory
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
@@ -22,6 +22,7 @@ class User(Base):
     motivation = Column(String, nullable=True)
     daily_goal_min = Column(Integer, default=10)
     active_badge = Column(String, nullable=True)
+    archived_at = Column(DateTime, nullable=True) # progress/vocabulary moved to user_archives (archive.py)
     
     # Relationships
     stats = relationship("UserStats", back_populates="user", uselist=False)
@@ -47,12 +48,18 @@ class UserStats(Base):
     
     user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
     credits = Column(Integer, default=0)
-    xp_total = Column(Integer, default=0)
+    xp_total = Column(Integer, default=0, index=True) # leaderboard
     streak = Column(Integer, default=0)
     last_activity_date = Column(Date, nullable=True)
+    # Optimistic concurrency: ORM updates become UPDATE ... WHERE version = <read version>
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    # Delta sync (see sync.py): stamped by triggers on every insert/update
+    change_seq = Column(Integer, nullable=False, server_default="0")
     
     user = relationship("User", back_populates="stats")
 
+    __mapper_args__ = {"version_id_col": version}
+
 class Course(Base):
     __tablename__ = "courses"
     
@@ -109,7 +116,7 @@ class UserMissionProgress(Base):
     __tablename__ = "user_mission_progress"
     
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
     mission_id = Column(Integer, ForeignKey("missions.id"))
     status = Column(String, default="locked") # locked, unlocked, completed
     score = Column(Float, default=0.0)
@@ -117,25 +124,37 @@ class UserMissionProgress(Base):
     attempts = Column(Integer, default=0)
     completed_at = Column(DateTime, nullable=True)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    # Delta sync (see sync.py): stamped by triggers on every insert/update
+    change_seq = Column(Integer, nullable=False, server_default="0")
     
     user = relationship("User", back_populates="mission_progress")
 
+    __table_args__ = (
+        Index("uq_user_mission_progress_user_mission", "user_id", "mission_id", unique=True),
+        Index("ix_user_mission_progress_user_change", "user_id", "change_seq"),
+    )
+    __mapper_args__ = {"version_id_col": version}
+
 class Certificate(Base):
     __tablename__ = "certificates"
     
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
     title = Column(String) # "Inglés Básico", etc.
     level = Column(String) # A1, B1, etc.
     date_awarded = Column(String) # Storing as string for simplicity in this legacy setup, or Date
+    change_seq = Column(Integer, nullable=False, server_default="0")
     
     user = relationship("User", back_populates="certificates")
 
+    __table_args__ = (Index("ix_certificates_user_change", "user_id", "change_seq"),)
+
 class VocabularyItem(Base):
     __tablename__ = "vocabulary_items"
     
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
     word = Column(String, index=True)
     translation = Column(String)
     example = Column(String, nullable=True)
@@ -145,8 +164,115 @@ class VocabularyItem(Base):
     interval = Column(Integer, default=1) # Days
     ease_factor = Column(Float, default=2.5)
     streak = Column(Integer, default=0)
+    change_seq = Column(Integer, nullable=False, server_default="0")
     
     user = relationship("User", back_populates="vocabulary")
 
+    __table_args__ = (
+        Index("ix_vocabulary_items_user_change", "user_id", "change_seq"),
+        Index("ix_vocabulary_items_user_review", "user_id", "next_review"), # MIN(next_review) per user, see reminders.py
+    )
+
 # Modify User to include relationship
 User.vocabulary = relationship("VocabularyItem", back_populates="user")
+
+class ImportCheckpoint(Base):
+    """Resume position for long-running legacy imports (see legacy_import.py)"""
+    __tablename__ = "import_checkpoints"
+
+    source = Column(String, primary_key=True) # dump path or "table:user_progress"
+    position = Column(Integer, default=0) # byte offset (dump) or last row id (table)
+    rows_done = Column(Integer, default=0) # rows already consumed at `position`
+    id_offset = Column(Integer, default=0) # legacy user id -> users.id shift
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class MissionAttempt(Base):
+    """Append-only history of every submit (written in batches, see attempts.py)"""
+    __tablename__ = "mission_attempts"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    mission_id = Column(Integer, ForeignKey("missions.id"))
+    score = Column(Float, default=0.0)
+    duration_sec = Column(Integer, default=0)
+    answers_digest = Column(String, nullable=True) # sha256 of the submitted answers
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class UserDailyActivity(Base):
+    """Per-user, per-day rollup of mission_attempts for activity charts"""
+    __tablename__ = "user_daily_activity"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    attempts = Column(Integer, default=0)
+    seconds = Column(Integer, default=0)
+    passed = Column(Integer, default=0)
+
+class MissionStats(Base):
+    """Running difficulty counters per mission (maintained by mission_stats.py)"""
+    __tablename__ = "mission_stats"
+
+    mission_id = Column(Integer, ForeignKey("missions.id"), primary_key=True)
+    course_id = Column(Integer, ForeignKey("courses.id"), index=True)
+    attempts = Column(Integer, default=0)
+    passes = Column(Integer, default=0)
+    completions = Column(Integer, default=0) # first passes, i.e. learners who completed it
+    score_sum = Column(Float, default=0.0)
+
+class MissionScoreBin(Base):
+    """Score histogram per mission: bin i counts scores in [5i, 5i+5), bin 20 is a perfect 100"""
+    __tablename__ = "mission_score_bins"
+
+    mission_id = Column(Integer, ForeignKey("missions.id"), primary_key=True)
+    bin = Column(Integer, primary_key=True)
+    count = Column(Integer, default=0)
+
+class SyncSequence(Base):
+    """Single-row counter behind change_seq (see sync.py)"""
+    __tablename__ = "sync_sequence"
+
+    id = Column(Integer, primary_key=True)
+    seq = Column(Integer, nullable=False, default=0)
+
+class SyncTombstone(Base):
+    """Deleted rows, so delta sync can tell clients to drop them"""
+    __tablename__ = "sync_tombstones"
+
+    seq = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    kind = Column(String, nullable=False) # progress, vocabulary, stats, certificates
+    row_id = Column(Integer, nullable=False)
+
+    __table_args__ = (Index("ix_sync_tombstones_user_seq", "user_id", "seq"),)
+
+class UserDirectory(Base):
+    """Email -> user id, kept in the shared file when user data is sharded (see database.py)"""
+    __tablename__ = "user_directory"
+
+    id = Column(Integer, primary_key=True)
+    email = Column(String, unique=True, nullable=False)
+
+class UserArchive(Base):
+    """Cold copy of an inactive user's progress and vocabulary rows (zlib JSON, see archive.py)"""
+    __tablename__ = "user_archives"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    archived_at = Column(DateTime, default=datetime.utcnow)
+    row_count = Column(Integer, default=0)
+    payload = Column(LargeBinary)
+
+class ReviewReminder(Base):
+    """Last due-review reminder sent per user, so restarts and other workers never repeat it (see reminders.py)"""
+    __tablename__ = "review_reminders"
+
+    user_id = Column(Integer, primary_key=True)
+    due_at = Column(Float, nullable=False) # the next_review the reminder was for
+    sent_at = Column(DateTime, default=datetime.utcnow)
+
+class UserInventory(Base):
+    """Shop items owned per user (see inventory.py); replaces the users.inventory JSON list"""
+    __tablename__ = "user_inventory"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    item_id = Column(String, primary_key=True)
+    qty = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,290 @@
+"""
+Opt-in sampling profiler for slow requests (PROFILE_ENABLED=1).
+
+Every request gets a lightweight profile context. While it runs, a sampler
+thread reads the stack of the worker thread executing its endpoint every
+PROFILE_INTERVAL_MS (sys._current_frames, the thread-aware equivalent of a
+SIGPROF sampler: signals only ever interrupt the main thread, and the endpoints
+run in the threadpool). SQL statements are timed through engine events. When
+the request ends, the profile is kept if
+
+  * it was picked by PROFILE_SAMPLE_RATE (fraction of requests),
+  * it took longer than PROFILE_SLOW_MS, or
+  * it carried a valid X-Debug-Profile header ("<expires>.<hmac>", see --sign),
+
+and written as JSON to a ring buffer of PROFILE_KEEP files in PROFILE_DIR.
+Everything else is dropped. Stacks are stored collapsed ("a;b;c" -> samples),
+the format flamegraph tools read.
+
+Usage:
+    python profiler.py --sign 3600   # debug header value valid for an hour
+"""
+import contextvars
+import functools
+import hashlib
+import hmac
+import inspect
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from fastapi.routing import APIRoute
+
+ENABLED = os.environ.get("PROFILE_ENABLED") == "1"
+SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", 0.01))
+SLOW_MS = float(os.environ.get("PROFILE_SLOW_MS", 1000))
+INTERVAL = float(os.environ.get("PROFILE_INTERVAL_MS", 5)) / 1000
+KEEP = int(os.environ.get("PROFILE_KEEP", 50))
+SECRET = os.environ.get("PROFILE_SECRET", "")
+PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles"))
+HEADER = "x-debug-profile"
+
+MAX_STACKS = 2000
+MAX_SQL = 500
+MAX_DEPTH = 64
+
+_current = contextvars.ContextVar("profile", default=None)
+
+
+class Profile:
+    __slots__ = ("method", "path", "forced", "started", "stacks", "samples", "sql", "sql_ms", "_sql_started")
+
+    def __init__(self, method, path, forced):
+        self.method = method
+        self.path = path
+        self.forced = forced # "sampled" | "debug" | None
+        self.started = time.perf_counter()
+        self.stacks = Counter()
+        self.samples = 0
+        self.sql = []
+        self.sql_ms = 0.0
+        self._sql_started = {}
+
+
+# --- STACK SAMPLER ---
+
+_owners = {} # thread id -> Profile whose endpoint that thread is running
+_owners_lock = threading.Lock()
+_wake = threading.Event()
+_sampler = None
+
+
+def _collapse(frame):
+    parts = []
+    while frame is not None and len(parts) < MAX_DEPTH:
+        code = frame.f_code
+        parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+        frame = frame.f_back
+    return ";".join(reversed(parts))
+
+
+def _sample_loop():
+    while True:
+        if not _owners:
+            _wake.wait()
+            _wake.clear()
+            continue
+        time.sleep(INTERVAL)
+        with _owners_lock:
+            owners = list(_owners.items())
+        frames = sys._current_frames()
+        for thread_id, profile in owners:
+            frame = frames.get(thread_id)
+            if frame is None:
+                continue
+            profile.samples += 1
+            stack = _collapse(frame)
+            if stack in profile.stacks or len(profile.stacks) < MAX_STACKS:
+                profile.stacks[stack] += 1
+
+
+def _claim(profile):
+    global _sampler
+    with _owners_lock:
+        _owners[threading.get_ident()] = profile
+        if _sampler is None:
+            _sampler = threading.Thread(target=_sample_loop, name="profiler-sampler", daemon=True)
+            _sampler.start()
+    _wake.set()
+
+
+def _release():
+    with _owners_lock:
+        _owners.pop(threading.get_ident(), None)
+
+
+class ProfiledRoute(APIRoute):
+    """Route class that lets the sampler find the worker thread running a sync endpoint."""
+
+    def __init__(self, path, endpoint, **kwargs):
+        if ENABLED and not inspect.iscoroutinefunction(endpoint):
+            endpoint = _track_thread(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+
+def _track_thread(endpoint):
+    @functools.wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        profile = _current.get()
+        if profile is None:
+            return endpoint(*args, **kwargs)
+        _claim(profile)
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            _release()
+    return wrapper
+
+
+# --- SQL ---
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current.get()
+    if profile is not None:
+        profile._sql_started[id(cursor)] = time.perf_counter()
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current.get()
+    if profile is None:
+        return
+    started = profile._sql_started.pop(id(cursor), None)
+    if started is None:
+        return
+    ms = (time.perf_counter() - started) * 1000
+    profile.sql_ms += ms
+    if len(profile.sql) < MAX_SQL:
+        profile.sql.append({"statement": " ".join(statement.split())[:500], "ms": round(ms, 3), "many": executemany})
+
+
+def instrument(*engines):
+    from sqlalchemy import event
+
+    for engine in set(engines):
+        event.listen(engine, "before_cursor_execute", _before_execute)
+        event.listen(engine, "after_cursor_execute", _after_execute)
+
+
+# --- DEBUG HEADER ---
+
+def sign(ttl_seconds):
+    expires = int(time.time() + ttl_seconds)
+    digest = hmac.new(SECRET.encode(), str(expires).encode(), hashlib.sha256).hexdigest()
+    return f"{expires}.{digest}"
+
+
+def verify(value):
+    if not SECRET or not value or "." not in value:
+        return False
+    expires, digest = value.split(".", 1)
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    expected = hmac.new(SECRET.encode(), expires.encode(), hashlib.sha256).hexdigest()
+    return hmac.compare_digest(digest, expected)
+
+
+# --- RING BUFFER ---
+
+_write_lock = threading.Lock()
+
+
+def _save(profile, status_code, duration_ms, reason):
+    record = {
+        "method": profile.method,
+        "path": profile.path,
+        "status": status_code,
+        "duration_ms": round(duration_ms, 1),
+        "reason": reason,
+        "captured_at": datetime.utcnow().isoformat() + "Z",
+        "interval_ms": INTERVAL * 1000,
+        "samples": profile.samples,
+        "stacks": dict(profile.stacks.most_common()),
+        "sql_count": len(profile.sql),
+        "sql_ms": round(profile.sql_ms, 1),
+        "sql": profile.sql,
+    }
+    with _write_lock:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        profile_id = f"{time.time_ns()}-{reason}"
+        record["id"] = profile_id
+        with open(os.path.join(PROFILE_DIR, profile_id + ".json"), "w") as f:
+            json.dump(record, f)
+        files = sorted(n for n in os.listdir(PROFILE_DIR) if n.endswith(".json"))
+        for name in files[:-KEEP]:
+            os.remove(os.path.join(PROFILE_DIR, name))
+    return profile_id
+
+
+def list_profiles():
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    out = []
+    for name in sorted(os.listdir(PROFILE_DIR), reverse=True):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(PROFILE_DIR, name)) as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            continue
+        out.append({k: record.get(k) for k in ("id", "method", "path", "status", "duration_ms", "reason",
+                                                "captured_at", "samples", "sql_count", "sql_ms")})
+    return out
+
+
+def profile_path(profile_id):
+    """Path of a stored profile, or None (ids are file names, never paths)."""
+    if not profile_id or os.path.basename(profile_id) != profile_id:
+        return None
+    path = os.path.join(PROFILE_DIR, profile_id + ".json")
+    return path if os.path.exists(path) else None
+
+
+def collapsed(profile_id):
+    with open(profile_path(profile_id)) as f:
+        stacks = json.load(f)["stacks"]
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.items())
+
+
+# --- MIDDLEWARE ---
+
+async def middleware(request, call_next):
+    if not ENABLED:
+        return await call_next(request)
+    from starlette.concurrency import run_in_threadpool
+
+    forced = "debug" if verify(request.headers.get(HEADER)) else "sampled" if random.random() < SAMPLE_RATE else None
+    profile = Profile(request.method, request.url.path, forced)
+    token = _current.set(profile)
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        _current.reset(token)
+        duration_ms = (time.perf_counter() - profile.started) * 1000
+        reason = profile.forced or ("slow" if duration_ms >= SLOW_MS else None)
+        if reason:
+            try:
+                profile_id = await run_in_threadpool(_save, profile, status_code, duration_ms, reason)
+                print(f"Profile {profile_id}: {profile.method} {profile.path} {duration_ms:.0f}ms")
+            except OSError as e:
+                print(f"Could not store profile: {e}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Request profiler utilities")
+    parser.add_argument("--sign", type=int, metavar="SECONDS", help=f"print a {HEADER} header value")
+    args = parser.parse_args()
+    if args.sign:
+        if not SECRET:
+            sys.exit("PROFILE_SECRET is not set")
+        print(f"{HEADER}: {sign(args.sign)}")
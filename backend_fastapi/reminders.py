@@ -0,0 +1,271 @@
+"""
+Due-review reminders without scanning vocabulary_items.
+
+The scheduler keeps each learner's earliest next_review in a min-heap of
+(due_ms, user_id) plus a dict of the value currently scheduled per user.
+Changing a user's due time pushes a new entry (O(log n)) and leaves the old one
+to be skipped when it surfaces (lazy deletion), so there is no heap search and
+no periodic scan: a background thread sleeps until the top entry is due.
+
+  * startup: one grouped query per user file,
+    SELECT user_id, MIN(next_review) ... GROUP BY user_id, answered from the
+    (user_id, next_review) index alone, then heapify (O(n)). It runs in a
+    background thread like the distractor bank load.
+  * submit, vocabulary import and POST /vocabulary/{id}/review call
+    refresh(db, user_id): one MIN() index seek for that user, then a push.
+  * firing: everyone due is popped together, at most once per
+    REMINDER_DIGEST_SECONDS, and sent to the sink as one digest.
+
+Before sending, each reminder is claimed in review_reminders (user_id, due_at),
+an upsert that only returns users not yet reminded for that due time. A restart,
+or a second worker process with its own heap, therefore never repeats a
+reminder. A learner gets one reminder per due episode; reviewing moves their
+due time and re-arms it.
+
+Disabled unless REMINDER_SINK is set:
+    log              one printed line per digest
+    file:<path>      JSON lines appended to <path>
+    queue            in-process queue.Queue (scheduler.sink.queue), for tests
+    module:attr      any object with send(events)
+
+Usage:
+    python reminders.py --bench 1000000   # heap cost at a million learners
+"""
+import heapq
+import importlib
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import func, select, text
+
+import models
+
+SINK = os.environ.get("REMINDER_SINK")
+DIGEST_SECONDS = float(os.environ.get("REMINDER_DIGEST_SECONDS", 60))
+CLAIM_BATCH = 500
+
+_DUE_BY_USER = """
+    SELECT d.user_id, d.due FROM (
+        SELECT user_id, MIN(next_review) AS due FROM vocabulary_items GROUP BY user_id
+    ) d
+    LEFT JOIN review_reminders r ON r.user_id = d.user_id AND r.due_at = d.due
+    WHERE r.user_id IS NULL
+"""
+_CLAIM = (
+    "INSERT INTO review_reminders (user_id, due_at, sent_at) VALUES (?, ?, ?) "
+    "ON CONFLICT(user_id) DO UPDATE SET due_at = excluded.due_at, sent_at = excluded.sent_at "
+    "WHERE review_reminders.due_at != excluded.due_at RETURNING user_id"
+)
+
+
+# --- SINKS ---
+
+class LogSink:
+    def send(self, events):
+        print(f"Review reminders: {len(events)} learner(s) due")
+
+
+class FileSink:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def send(self, events):
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            for event in events:
+                f.write(json.dumps(event) + "\n")
+
+
+class QueueSink:
+    def __init__(self):
+        self.queue = queue.Queue()
+
+    def send(self, events):
+        self.queue.put(events)
+
+
+def load_sink(spec):
+    if not spec:
+        return None
+    if spec == "log":
+        return LogSink()
+    if spec == "queue":
+        return QueueSink()
+    if spec.startswith("file:"):
+        return FileSink(spec[len("file:"):])
+    module, _, attr = spec.partition(":")
+    sink = getattr(importlib.import_module(module), attr)
+    return sink() if isinstance(sink, type) else sink
+
+
+# --- SCHEDULER ---
+
+def load_due(db):
+    """(user_id, earliest next_review) for every learner not already reminded for it."""
+    return db.execute(text(_DUE_BY_USER)).all()
+
+
+class Scheduler:
+    def __init__(self, sink, claim_bind=None, digest_seconds=DIGEST_SECONDS):
+        self.sink = sink
+        self.claim_bind = claim_bind
+        self.digest_seconds = digest_seconds
+        self._heap = []
+        self._due = {} # user_id -> due_ms of their live heap entry
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        self.stats = {"scheduled": 0, "fired": 0, "digests": 0, "stale_skipped": 0}
+
+    @property
+    def enabled(self):
+        return self.sink is not None
+
+    def rebuild(self, rows):
+        due = {user_id: due_ms for user_id, due_ms in rows if due_ms is not None}
+        heap = [(due_ms, user_id) for user_id, due_ms in due.items()]
+        heapq.heapify(heap)
+        with self._cond:
+            self._due, self._heap = due, heap
+            self._cond.notify()
+        print(f"Review scheduler: {len(heap)} learners with pending reviews")
+
+    def schedule(self, user_id, due_ms):
+        """Set a learner's earliest due time (None: nothing to review)."""
+        with self._cond:
+            if due_ms is None:
+                self._due.pop(user_id, None) # its heap entry is dropped when it surfaces
+                return
+            if self._due.get(user_id) == due_ms:
+                return
+            self._due[user_id] = due_ms
+            heapq.heappush(self._heap, (due_ms, user_id))
+            self.stats["scheduled"] += 1
+            if self._heap[0][1] == user_id:
+                self._cond.notify() # new earliest deadline
+
+    def refresh(self, db, user_id):
+        if not self.enabled:
+            return
+        due_ms = db.execute(
+            select(func.min(models.VocabularyItem.next_review)).where(models.VocabularyItem.user_id == user_id)
+        ).scalar()
+        self.schedule(user_id, due_ms)
+
+    def pop_due(self, now_ms):
+        """Remove and return (user_id, due_ms) for everyone due at `now_ms`; caller holds the lock."""
+        due = []
+        while self._heap and self._heap[0][0] <= now_ms:
+            due_ms, user_id = heapq.heappop(self._heap)
+            if self._due.get(user_id) != due_ms:
+                self.stats["stale_skipped"] += 1
+                continue
+            del self._due[user_id]
+            due.append((user_id, due_ms))
+        return due
+
+    def _claim(self, due):
+        if self.claim_bind is None:
+            return due
+        claimed = []
+        sent_at = str(datetime.utcnow())
+        for start in range(0, len(due), CLAIM_BATCH):
+            chunk = due[start:start + CLAIM_BATCH]
+            with self.claim_bind.begin() as conn:
+                won = {row[0] for item in chunk
+                       for row in conn.exec_driver_sql(_CLAIM, (item[0], item[1], sent_at))}
+            claimed += [item for item in chunk if item[0] in won]
+        return claimed
+
+    def _run(self):
+        last_fire = 0.0
+        while True:
+            with self._cond:
+                while not self._stopping:
+                    now = time.time()
+                    wake = max(self._heap[0][0] / 1000 if self._heap else now + 3600, last_fire + self.digest_seconds)
+                    if wake <= now:
+                        break
+                    self._cond.wait(wake - now)
+                if self._stopping:
+                    return
+                due = self.pop_due(time.time() * 1000)
+            last_fire = time.time()
+            if not due:
+                continue
+            try:
+                events = [{"type": "review_due", "user_id": user_id, "due_at": due_ms}
+                          for user_id, due_ms in self._claim(due)]
+                if events:
+                    self.sink.send(events)
+                    self.stats["fired"] += len(events)
+                    self.stats["digests"] += 1
+            except Exception as e:
+                print(f"Review reminders failed: {e}")
+
+    def start(self):
+        if not self.enabled or self._thread is not None:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="review-reminders", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        self._thread.join()
+        self._thread = None
+
+    def snapshot(self):
+        with self._cond:
+            return {**self.stats, "learners": len(self._due), "heap": len(self._heap),
+                    "next_due": self._heap[0][0] if self._heap else None}
+
+
+def _make_scheduler():
+    from database import engine
+    return Scheduler(load_sink(SINK), claim_bind=engine)
+
+
+scheduler = _make_scheduler()
+
+
+if __name__ == "__main__":
+    import argparse
+    import random
+    import tracemalloc
+
+    parser = argparse.ArgumentParser(description="Review reminder scheduler utilities")
+    parser.add_argument("--bench", type=int, metavar="LEARNERS")
+    parser.add_argument("--updates", type=int, default=200000)
+    args = parser.parse_args()
+
+    if args.bench:
+        rng = random.Random(1)
+        now_ms = time.time() * 1000
+        bench = Scheduler(QueueSink())
+        tracemalloc.start()
+        rows = [(u, now_ms + rng.uniform(-1, 30) * 86_400_000) for u in range(args.bench)]
+        started = time.perf_counter()
+        bench.rebuild(rows)
+        print(f"rebuild: {args.bench} learners heapified in {time.perf_counter() - started:.2f}s, "
+              f"{tracemalloc.get_traced_memory()[0] / 2**20:.0f} MiB traced (rows included)")
+        del rows
+        started = time.perf_counter()
+        for _ in range(args.updates):
+            bench.schedule(rng.randrange(args.bench), now_ms + rng.uniform(0, 30) * 86_400_000)
+        elapsed = time.perf_counter() - started
+        print(f"schedule: {args.updates} updates in {elapsed:.2f}s ({elapsed / args.updates * 1e6:.1f} us each)")
+        with bench._cond:
+            started = time.perf_counter()
+            due = bench.pop_due(now_ms + 86_400_000)
+            elapsed = time.perf_counter() - started
+        print(f"pop: {len(due)} learners due within a day in {elapsed:.2f}s, "
+              f"{bench.stats['stale_skipped']} stale entries skipped, heap now {len(bench._heap)}")
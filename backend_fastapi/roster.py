@@ -0,0 +1,279 @@
+"""
+Bulk registration of school rosters (CSV), for POST /admin/users/import.
+
+Does what /auth/register does for one learner (users row, user_stats row,
+first mission of every track of the first course unlocked) for thousands at a
+time: the unlock list is looked up once per import, rows go in as tuples
+through executemany, and each chunk of CHUNK_SIZE learners is one
+BEGIN IMMEDIATE transaction. Emails already registered, repeated in the file or
+malformed are reported and skipped; the rest of the roster still goes in. A
+chunk (or shard) whose transaction fails is reported row by row as not
+imported and the import carries on, so the report, with the passwords of
+learners already created, always comes back.
+
+Columns (header row required, only email is mandatory):
+    email, name, password, age, english_level, daily_goal_min
+A learner without a password gets a generated one, returned once so the school
+can hand it out.
+
+Sharded (SQLITE_SHARDS), ids are claimed in the shared user_directory for the
+whole chunk first, then each shard gets its learners; a shard that fails gives
+its ids back.
+
+Usage:
+    python roster.py roster.csv [--passwords issued.csv]
+    python roster.py --generate 5000 roster.csv   # sample roster for timing
+"""
+import argparse
+import csv
+import io
+import secrets
+import time
+from datetime import datetime
+
+from database import engine, shard_engines, shard_for
+
+CHUNK_SIZE = 1000
+COLUMNS = ("email", "name", "password", "age", "english_level", "daily_goal_min")
+
+_INSERT_SQL = {
+    "users": "INSERT INTO users (id, email, hashed_password, name, age, theme, inventory, is_active, created_at, "
+             "english_level, daily_goal_min) VALUES (?, ?, ?, ?, ?, 'default', '[]', 1, ?, ?, ?)",
+    "stats": "INSERT INTO user_stats (user_id, credits, xp_total, streak, last_activity_date) VALUES (?, 0, 0, 0, NULL)",
+    "progress": "INSERT INTO user_mission_progress (user_id, mission_id, status, score, xp_earned, attempts, updated_at) "
+                "VALUES (?, ?, 'unlocked', 0.0, 0, 0, ?)",
+}
+
+
+class Report:
+    def __init__(self):
+        self.created = 0
+        self.skipped = [] # {"row", "email", "reason"}
+        self.passwords = {} # email -> generated password, for learners actually created
+
+    def skip(self, row_number, email, reason):
+        self.skipped.append({"row": row_number, "email": email, "reason": reason})
+        self.passwords.pop(email, None)
+
+    def fail(self, rows, error):
+        """Rows of a transaction that did not commit; they can be imported again."""
+        print(f"Roster import: {len(rows)} rows not imported: {error}")
+        for number, learner in rows:
+            self.skip(number, learner["email"], f"not imported ({type(error).__name__}), retry")
+
+    def issued(self):
+        return [{"email": email, "password": password} for email, password in self.passwords.items()]
+
+    def as_dict(self):
+        return {"created": self.created, "skipped": sorted(self.skipped, key=lambda s: s["row"]),
+                "passwords": self.issued()}
+
+
+def _int(value, default):
+    try:
+        return int(value) if value not in (None, "") else default
+    except ValueError:
+        return None
+
+
+def iter_roster(text_stream, report):
+    """Yield (row number, learner dict) for valid rows; bad rows go to the report."""
+    reader = csv.DictReader(text_stream)
+    if not reader.fieldnames or "email" not in [f.strip().lower() for f in reader.fieldnames]:
+        raise ValueError("Roster needs a header row with an 'email' column")
+    seen = set()
+    for number, raw in enumerate(reader, start=2): # row 1 is the header
+        row = {(k or "").strip().lower(): (v or "").strip() for k, v in raw.items() if k}
+        email = row.get("email", "")
+        if "@" not in email:
+            report.skip(number, email, "invalid email")
+            continue
+        if email.lower() in seen:
+            report.skip(number, email, "repeated in roster")
+            continue
+        age, goal = _int(row.get("age"), 0), _int(row.get("daily_goal_min"), 10)
+        if age is None or goal is None:
+            report.skip(number, email, "age and daily_goal_min must be numbers")
+            continue
+        seen.add(email.lower())
+        password = row.get("password")
+        if not password:
+            password = secrets.token_urlsafe(8)
+            report.passwords[email] = password
+        yield number, {
+            "email": email,
+            "name": row.get("name") or email.split("@")[0],
+            "password": password,
+            "age": age,
+            "english_level": row.get("english_level") or None,
+            "daily_goal_min": goal,
+        }
+
+
+def first_missions(conn):
+    """Mission ids a new learner starts with: order_index 0 of every track of the first course."""
+    return [r[0] for r in conn.exec_driver_sql(
+        "SELECT m.id FROM missions m JOIN tracks t ON t.id = m.track_id "
+        "WHERE m.order_index = 0 AND t.course_id = "
+        "(SELECT id FROM courses ORDER BY order_index, id LIMIT 1) ORDER BY t.order_index"
+    )]
+
+
+def _insert(conn, learners, unlocks):
+    """learners: [(user_id, learner dict)] whose ids are already decided."""
+    now = str(datetime.utcnow())
+    rows = {
+        "users": [(uid, l["email"], l["password"] + "notreallyhashed", l["name"], l["age"], now,
+                   l["english_level"], l["daily_goal_min"]) for uid, l in learners],
+        "stats": [(uid,) for uid, _ in learners],
+        "progress": [(uid, mission_id, now) for uid, _ in learners for mission_id in unlocks],
+    }
+    cursor = conn.connection.cursor()
+    for name, sql in _INSERT_SQL.items():
+        if rows[name]:
+            cursor.executemany(sql, rows[name])
+    cursor.close()
+
+
+def _taken(conn, table, emails):
+    marks = ",".join("?" * len(emails))
+    return {r[0] for r in conn.exec_driver_sql(f"SELECT email FROM {table} WHERE email IN ({marks})", tuple(emails))}
+
+
+def _write_chunk(chunk, unlocks, report):
+    if shard_engines:
+        return _write_chunk_sharded(chunk, unlocks, report)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+        taken = _taken(conn, "users", [l["email"] for _, l in chunk])
+        next_id = conn.exec_driver_sql("SELECT coalesce(max(id), 0) + 1 FROM users").scalar()
+        learners = []
+        for number, learner in chunk:
+            if learner["email"] not in taken:
+                learners.append((next_id, learner))
+                next_id += 1
+        _insert(conn, learners, unlocks)
+    # Reported once committed: a failed chunk is reported whole by import_roster
+    for number, learner in chunk:
+        if learner["email"] in taken:
+            report.skip(number, learner["email"], "already registered")
+    report.created += len(learners)
+
+
+def _release(user_ids):
+    """Give claimed directory ids back; a failure only leaves unused entries, so it is logged, not raised."""
+    try:
+        with engine.begin() as conn:
+            conn.exec_driver_sql(f"DELETE FROM user_directory WHERE id IN ({','.join('?' * len(user_ids))})",
+                                 tuple(user_ids))
+    except Exception as e:
+        print(f"Roster import: could not release {len(user_ids)} directory ids: {e}")
+
+
+def _write_chunk_sharded(chunk, unlocks, report):
+    # The directory hands out ids and keeps emails unique, as in /auth/register
+    with engine.begin() as conn:
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+        taken = _taken(conn, "user_directory", [l["email"] for _, l in chunk])
+        fresh = [(number, l) for number, l in chunk if l["email"] not in taken]
+        cursor = conn.connection.cursor()
+        cursor.executemany("INSERT INTO user_directory (email) VALUES (?)", [(l["email"],) for _, l in fresh])
+        cursor.close()
+        ids = dict(conn.exec_driver_sql(
+            f"SELECT email, id FROM user_directory WHERE email IN ({','.join('?' * len(fresh))})",
+            tuple(l["email"] for _, l in fresh)
+        ).all()) if fresh else {}
+    for number, learner in chunk:
+        if learner["email"] in taken:
+            report.skip(number, learner["email"], "already registered")
+
+    by_shard = {}
+    for number, learner in fresh:
+        uid = ids[learner["email"]]
+        by_shard.setdefault(shard_for(uid), []).append((uid, learner, number))
+    for shard, rows in by_shard.items():
+        learners = [(uid, learner) for uid, learner, _ in rows]
+        try:
+            with shard_engines[shard].begin() as conn:
+                conn.exec_driver_sql("BEGIN IMMEDIATE")
+                _insert(conn, learners, unlocks)
+        except Exception as e:
+            _release([uid for uid, _ in learners])
+            report.fail([(number, learner) for _, learner, number in rows], e)
+            continue
+        report.created += len(learners)
+
+
+def _write_chunk_or_fail(chunk, unlocks, report):
+    try:
+        _write_chunk(chunk, unlocks, report)
+    except Exception as e: # nothing of the chunk committed (sharded: the directory claim failed)
+        report.fail(chunk, e)
+
+
+def import_roster(text_stream, chunk_size=CHUNK_SIZE):
+    """Register every valid learner of a CSV roster; returns the Report."""
+    report = Report()
+    with engine.connect() as conn:
+        unlocks = first_missions(conn)
+    chunk = []
+    for item in iter_roster(text_stream, report):
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            _write_chunk_or_fail(chunk, unlocks, report)
+            chunk = []
+    if chunk:
+        _write_chunk_or_fail(chunk, unlocks, report)
+    print(f"Roster import: {report.created} learners created, {len(report.skipped)} skipped")
+    return report
+
+
+def import_file(binary_file, chunk_size=CHUNK_SIZE):
+    text = io.TextIOWrapper(binary_file, encoding="utf-8-sig", errors="replace", newline="")
+    try:
+        return import_roster(text, chunk_size)
+    finally:
+        text.detach()
+
+
+def write_sample(path, count):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        stamp = int(time.time())
+        for i in range(count):
+            writer.writerow((f"student{stamp}_{i}@school.example", f"Student {i}", "" if i % 10 else "changeme",
+                             10 + i % 8, "A1", 10))
+
+
+if __name__ == "__main__":
+    from database import create_all
+    import models # registers the tables create_all() makes
+
+    parser = argparse.ArgumentParser(description="Register a CSV roster of learners")
+    parser.add_argument("roster")
+    parser.add_argument("--chunk", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--passwords", help="write generated passwords to this CSV")
+    parser.add_argument("--generate", type=int, metavar="N", help="write a sample roster of N learners and exit")
+    args = parser.parse_args()
+
+    if args.generate:
+        write_sample(args.roster, args.generate)
+        print(f"Wrote {args.generate} learners to {args.roster}")
+        raise SystemExit
+
+    create_all()
+    started = time.time()
+    with open(args.roster, "rb") as f:
+        report = import_file(f, args.chunk)
+    elapsed = max(time.time() - started, 1e-6)
+    print(f"{report.created} created, {len(report.skipped)} skipped in {elapsed:.2f}s "
+          f"({report.created / elapsed:,.0f} users/s)")
+    for skipped in report.skipped[:20]:
+        print(f"  row {skipped['row']}: {skipped['email']} ({skipped['reason']})")
+    if args.passwords and report.passwords:
+        with open(args.passwords, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=("email", "password"))
+            writer.writeheader()
+            writer.writerows(report.issued())
+        print(f"Generated passwords written to {args.passwords}")
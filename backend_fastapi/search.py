@@ -0,0 +1,263 @@
+"""
+SQLite FTS5 search over mission content and users' vocabulary.
+
+search_sections holds the searchable text of every mission section (word,
+translation, question, transcript, phrase, example) keyed by section id;
+search_vocabulary is an external-content index over vocabulary_items whose
+user_id column is indexed too, so a vocabulary search MATCHes the caller's id
+token together with the terms and only ever walks that user's entries. Both are
+kept current by triggers, so the seeder, imports and submit_mission need no
+extra code. The unicode61 tokenizer with remove_diacritics folds accents
+("arbol" finds "Árbol"), and every query term is a prefix match.
+
+Results are ranked by bm25 and paged with a keyset cursor "<score>:<rowid>".
+
+Usage:
+    python search.py --bench 100000
+"""
+import re
+import unicodedata
+
+from sqlalchemy import text
+
+TOKENIZER = "unicode61 remove_diacritics 2"
+SECTION_FIELDS = ("word", "translation", "question", "transcript", "phrase", "example")
+
+
+def _body(alias):
+    parts = [f"coalesce(json_extract({alias}.payload_json, '$.{f}'), '')" for f in SECTION_FIELDS]
+    return " || ' ' || ".join(parts)
+
+
+SECTION_SCHEMA = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS search_sections USING fts5(body, tokenize='{TOKENIZER}')",
+    f"""CREATE TRIGGER IF NOT EXISTS mission_sections_search_ai AFTER INSERT ON mission_sections BEGIN
+        INSERT INTO search_sections(rowid, body) VALUES (new.id, {_body('new')});
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS mission_sections_search_ad AFTER DELETE ON mission_sections BEGIN
+        DELETE FROM search_sections WHERE rowid = old.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS mission_sections_search_au AFTER UPDATE OF payload_json ON mission_sections BEGIN
+        DELETE FROM search_sections WHERE rowid = old.id;
+        INSERT INTO search_sections(rowid, body) VALUES (new.id, {_body('new')});
+    END""",
+]
+VOCABULARY_SCHEMA = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS search_vocabulary USING fts5(
+        word, translation, example, user_id, content='vocabulary_items', content_rowid='id', tokenize='{TOKENIZER}')""",
+    """CREATE TRIGGER IF NOT EXISTS vocabulary_items_search_ai AFTER INSERT ON vocabulary_items BEGIN
+        INSERT INTO search_vocabulary(rowid, word, translation, example, user_id)
+        VALUES (new.id, new.word, new.translation, new.example, new.user_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS vocabulary_items_search_ad AFTER DELETE ON vocabulary_items BEGIN
+        INSERT INTO search_vocabulary(search_vocabulary, rowid, word, translation, example, user_id)
+        VALUES ('delete', old.id, old.word, old.translation, old.example, old.user_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS vocabulary_items_search_au
+    AFTER UPDATE OF word, translation, example, user_id ON vocabulary_items BEGIN
+        INSERT INTO search_vocabulary(search_vocabulary, rowid, word, translation, example, user_id)
+        VALUES ('delete', old.id, old.word, old.translation, old.example, old.user_id);
+        INSERT INTO search_vocabulary(rowid, word, translation, example, user_id)
+        VALUES (new.id, new.word, new.translation, new.example, new.user_id);
+    END""",
+]
+VOCABULARY_TRIGGERS = ("vocabulary_items_search_ai", "vocabulary_items_search_ad", "vocabulary_items_search_au")
+
+
+def ensure_schema(engine, sections=True, vocabulary=True):
+    """Create the FTS tables and triggers; backfill them the first time they appear.
+
+    With sharded user data the section index lives in the shared file and the
+    vocabulary index in every shard (triggers only see their own file).
+    """
+    with engine.begin() as conn:
+        existing = dict(conn.exec_driver_sql(
+            "SELECT name, sql FROM sqlite_master WHERE name IN ('search_sections', 'search_vocabulary')"
+        ).all())
+        # An index from before user_id was indexed cannot scope searches: drop it and rebuild
+        if vocabulary and "search_vocabulary" in existing and "user_id" not in existing["search_vocabulary"]:
+            for trigger in VOCABULARY_TRIGGERS:
+                conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {trigger}")
+            conn.exec_driver_sql("DROP TABLE search_vocabulary")
+            del existing["search_vocabulary"]
+        for statement in (SECTION_SCHEMA if sections else []) + (VOCABULARY_SCHEMA if vocabulary else []):
+            conn.exec_driver_sql(statement)
+        if sections and "search_sections" not in existing:
+            conn.exec_driver_sql(f"INSERT INTO search_sections(rowid, body) SELECT s.id, {_body('s')} FROM mission_sections s")
+        if vocabulary and "search_vocabulary" not in existing:
+            conn.exec_driver_sql("INSERT INTO search_vocabulary(search_vocabulary) VALUES ('rebuild')")
+
+
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+
+def build_match(query):
+    """Turn free text into an FTS5 expression: every word must match as a prefix."""
+    terms = _TERM.findall(query or "")
+    return " ".join(f'"{t}"*' for t in terms[:8])
+
+
+def build_user_match(query, user_id):
+    """build_match() limited to one user's rows: their id token AND the terms in the text columns."""
+    match = build_match(query)
+    return f'user_id : "{int(user_id)}" AND {{word translation example}} : ({match})' if match else ""
+
+
+def _fold(word):
+    return "".join(c for c in unicodedata.normalize("NFKD", word.lower()) if not unicodedata.combining(c))
+
+
+def highlight(body, terms, width=12):
+    """Mark words starting with any query term, like FTS5's snippet() but without a second MATCH."""
+    words = body.split()
+    hits = [i for i, w in enumerate(words) if any(_fold(w).startswith(t) for t in terms)]
+    start = max(0, hits[0] - 2) if hits else 0
+    window = words[start:start + width]
+    marked = [f"[{w}]" if start + i in hits else w for i, w in enumerate(window)]
+    return ("…" if start else "") + " ".join(marked) + ("…" if start + width < len(words) else "")
+
+
+def _parse_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        score, rowid = cursor.rsplit(":", 1)
+        return float(score), int(rowid)
+    except ValueError:
+        return None
+
+
+def _page(rows, limit):
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = f"{rows[-1].score!r}:{rows[-1].rowid}" if has_more else None
+    return rows, next_cursor
+
+
+_AFTER = "AND (score > :score OR (score = :score AND rowid > :rowid))"
+
+
+def search_sections(db, query, limit=20, cursor=None):
+    match = build_match(query)
+    if not match:
+        return [], None
+    after = _parse_cursor(cursor)
+    sql = f"""
+        SELECT * FROM (
+            SELECT f.rowid AS rowid, bm25(search_sections) AS score
+            FROM search_sections f WHERE search_sections MATCH :match
+        ) hits
+        WHERE 1 = 1 {_AFTER if after else ''}
+        ORDER BY score, rowid LIMIT :limit
+    """
+    params = {"match": match, "limit": limit + 1}
+    if after:
+        params["score"], params["rowid"] = after
+    rows, next_cursor = _page(db.execute(text(sql), params).all(), limit)
+    if not rows:
+        return [], None
+
+    # Text and mission details only for the page, never for every hit
+    id_list = ",".join(str(r.rowid) for r in rows)
+    details = {
+        r.id: r for r in db.execute(text(
+            "SELECT s.id, s.key, s.mission_id, m.title, m.course_id, f.body FROM search_sections f "
+            "JOIN mission_sections s ON s.id = f.rowid JOIN missions m ON m.id = s.mission_id "
+            f"WHERE f.rowid IN ({id_list})"
+        ))
+    }
+    terms = [_fold(t) for t in _TERM.findall(query)]
+    results = []
+    for r in rows:
+        d = details.get(r.rowid)
+        if d:
+            results.append({
+                "type": "section",
+                "section_id": r.rowid,
+                "section_key": d.key,
+                "mission_id": d.mission_id,
+                "mission_title": d.title,
+                "course_id": d.course_id,
+                "snippet": highlight(d.body, terms),
+            })
+    return results, next_cursor
+
+
+def search_vocabulary(db, user_id, query, limit=20, cursor=None):
+    match = build_user_match(query, user_id)
+    if not match:
+        return [], None
+    after = _parse_cursor(cursor)
+    # The user_id column only scopes the MATCH, it carries no weight in the ranking
+    sql = f"""
+        SELECT * FROM (
+            SELECT v.id AS rowid, v.word, v.translation, v.example, bm25(search_vocabulary, 1, 1, 1, 0) AS score
+            FROM search_vocabulary f JOIN vocabulary_items v ON v.id = f.rowid
+            WHERE search_vocabulary MATCH :match
+        ) hits
+        WHERE 1 = 1 {_AFTER if after else ''}
+        ORDER BY score, rowid LIMIT :limit
+    """
+    params = {"match": match, "limit": limit + 1}
+    if after:
+        params["score"], params["rowid"] = after
+    rows, next_cursor = _page(db.execute(text(sql), params).all(), limit)
+    return [
+        {"type": "vocabulary", "id": r.rowid, "word": r.word, "translation": r.translation, "example": r.example}
+        for r in rows
+    ], next_cursor
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    import os
+    import random
+    import tempfile
+    import time
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from database import Base
+    import models  # noqa: F401 (registers tables)
+
+    parser = argparse.ArgumentParser(description="FTS5 search utilities")
+    parser.add_argument("--bench", type=int, metavar="SECTIONS", help="time queries over a synthetic catalog")
+    args = parser.parse_args()
+
+    if args.bench:
+        path = os.path.join(tempfile.mkdtemp(), "search_bench.db")
+        engine = create_engine(f"sqlite:///{path}")
+        Base.metadata.create_all(bind=engine)
+        ensure_schema(engine)
+        rng = random.Random(7)
+        words = ["library", "árbol", "família", "journey", "meeting", "success", "window", "kitchen",
+                 "teacher", "station", "morning", "weather", "holiday", "question", "answer", "market"]
+        started = time.time()
+        with engine.begin() as conn:
+            conn.exec_driver_sql("INSERT INTO missions (id, title, course_id) VALUES (1, 'Bench', 1)")
+            conn.exec_driver_sql(
+                "INSERT INTO mission_sections (mission_id, key, title, order_index, payload_json) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (1, "vocabulary", f"Exercise {i}", i, json.dumps({
+                        "word": f"{rng.choice(words)}{i}",
+                        "translation": " ".join(rng.sample(words, 2)),
+                        "question": f"Where is the {rng.choice(words)}?",
+                    }))
+                    for i in range(args.bench)
+                ],
+            )
+        print(f"Indexed {args.bench} sections in {time.time() - started:.1f}s (through triggers)")
+
+        db = sessionmaker(bind=engine)()
+        for q in ["library", "arbol", "lib", "where kitchen", "famil", "library123", "kitchen99"]:
+            started = time.perf_counter()
+            for _ in range(20):
+                results, cursor = search_sections(db, q, 20)
+            first_page = (time.perf_counter() - started) / 20 * 1000
+            started = time.perf_counter()
+            search_sections(db, q, 20, cursor)
+            second_page = (time.perf_counter() - started) * 1000
+            print(f"{q!r}: first page {first_page:.1f}ms, next page {second_page:.1f}ms")
+        db.close()
@@ -0,0 +1,215 @@
+"""
+Static export of the mission catalog, served by Apache without Python.
+
+The catalog is the same for every user, so after seed_courses() it is written
+as content-addressed JSON files:
+
+    <dir>/missions/<id>.<hash>.json      same body as GET /missions/{id}
+    <dir>/courses/<id>.<hash>.json       course, tracks and every mission's content
+    <dir>/manifest.<version>.json        id -> file for both, plus the version
+    <dir>/manifest.json                  latest manifest (short cache)
+    <dir>/.htaccess                      immutable caching + precompressed variants
+
+Every JSON file has a .gz twin, and a .br twin when the optional `brotli`
+package is installed. Files whose hash did not change are not rewritten, and
+files referenced by neither the current nor the previous manifest are removed.
+The API only serves the version (GET /catalog/version); clients fetch the rest
+from STATIC_CATALOG_URL and can cache it forever.
+
+Export runs at the end of seed_courses() when STATIC_CATALOG_DIR is set, or by hand:
+    python static_catalog.py [--out DIR]
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+
+import models
+
+try:
+    import brotli
+except ImportError: # optional: gzip alone is enough for Apache to serve
+    brotli = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.environ.get("STATIC_CATALOG_DIR")
+STATIC_URL = os.environ.get("STATIC_CATALOG_URL", "/catalog")
+
+HTACCESS = """# Written by static_catalog.py, do not edit
+<IfModule mod_mime.c>
+  RemoveType .gz .br
+  AddEncoding gzip .gz
+  AddEncoding br .br
+</IfModule>
+<IfModule mod_rewrite.c>
+  RewriteEngine On
+  RewriteCond %{HTTP:Accept-Encoding} \\bbr\\b
+  RewriteCond %{REQUEST_FILENAME}.br -f
+  RewriteRule ^(.+\\.json)$ $1.br [L,E=no-gzip:1]
+  RewriteCond %{HTTP:Accept-Encoding} \\bgzip\\b
+  RewriteCond %{REQUEST_FILENAME}.gz -f
+  RewriteRule ^(.+\\.json)$ $1.gz [L,E=no-gzip:1]
+</IfModule>
+<FilesMatch "\\.json(\\.gz|\\.br)?$">
+  ForceType application/json
+  <IfModule mod_headers.c>
+    Header append Vary Accept-Encoding
+  </IfModule>
+</FilesMatch>
+<IfModule mod_headers.c>
+  <FilesMatch "\\.[0-9a-f]{16}\\.json(\\.gz|\\.br)?$">
+    Header set Cache-Control "public, max-age=31536000, immutable"
+  </FilesMatch>
+  <FilesMatch "^manifest\\.json(\\.gz|\\.br)?$">
+    Header set Cache-Control "public, max-age=60"
+  </FilesMatch>
+</IfModule>
+"""
+
+_manifest = None
+_lock = threading.Lock()
+
+
+def _encode(body):
+    return json.dumps(body, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def _write_atomic(path, data):
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _write_variants(out_dir, rel_path, data, overwrite=False):
+    """Write a JSON file with its compressed twins; returns the files it owns."""
+    path = os.path.join(out_dir, rel_path)
+    files = [rel_path, rel_path + ".gz"] + ([rel_path + ".br"] if brotli else [])
+    if not overwrite and all(os.path.exists(os.path.join(out_dir, f)) for f in files):
+        return files
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _write_atomic(path, data)
+    _write_atomic(path + ".gz", gzip.compress(data, 9, mtime=0))
+    if brotli:
+        _write_atomic(path + ".br", brotli.compress(data, quality=11))
+    return files
+
+
+def mission_body(mission):
+    """Same shape as GET /missions/{id}."""
+    return {
+        "success": True,
+        "mission": {
+            "id": mission.id,
+            "title": mission.title,
+            "description": mission.description,
+            "track": mission.track.key,
+            "sections": [{"key": s.key, "title": s.title, "payload": s.payload_json} for s in mission.sections],
+        },
+    }
+
+
+def export(db, out_dir=None):
+    """Write the catalog to `out_dir` and return the manifest."""
+    global _manifest
+    out_dir = out_dir or STATIC_DIR or os.path.join(BASE_DIR, "static_catalog")
+    os.makedirs(out_dir, exist_ok=True)
+    owned = set()
+    missions = {}
+    courses = {}
+
+    for course in db.query(models.Course).filter(models.Course.is_active == True).order_by(models.Course.order_index):
+        tracks = []
+        bundle_missions = {}
+        for track in course.tracks:
+            summaries = []
+            for mission in track.missions:
+                body = mission_body(mission)
+                data = _encode(body)
+                rel = f"missions/{mission.id}.{_digest(data)}.json"
+                owned.update(_write_variants(out_dir, rel, data))
+                missions[str(mission.id)] = rel
+                bundle_missions[str(mission.id)] = body["mission"]
+                summaries.append({"id": mission.id, "title": mission.title, "xp": mission.xp,
+                                  "order": mission.order_index, "duration_min": mission.duration_min})
+            tracks.append({"id": track.id, "key": track.key, "title": track.title, "color": track.color,
+                           "missions": summaries})
+        data = _encode({
+            "course": {"id": course.id, "title": course.title, "description": course.description,
+                       "level": course.level, "order_index": course.order_index},
+            "tracks": tracks,
+            "missions": bundle_missions,
+        })
+        rel = f"courses/{course.id}.{_digest(data)}.json"
+        owned.update(_write_variants(out_dir, rel, data))
+        courses[str(course.id)] = rel
+
+    version = _digest(_encode({"missions": missions, "courses": courses}))
+    manifest = {"version": version, "missions": missions, "courses": courses}
+    previous = _read_manifest(out_dir)
+    manifest_data = _encode({**manifest, "generated_at": datetime.utcnow().isoformat() + "Z"})
+    owned.update(_write_variants(out_dir, f"manifest.{version}.json", manifest_data))
+    if not previous or previous.get("version") != version:
+        _write_variants(out_dir, "manifest.json", manifest_data, overwrite=True)
+
+    # Keep the previous version's files for clients that still hold its manifest
+    if previous and previous.get("version") != version:
+        for rel in [*previous.get("missions", {}).values(), *previous.get("courses", {}).values(),
+                    f"manifest.{previous['version']}.json"]:
+            owned.update((rel, rel + ".gz", rel + ".br"))
+    _collect_garbage(out_dir, owned)
+
+    _write_atomic(os.path.join(out_dir, ".htaccess"), HTACCESS.encode("utf-8"))
+    with _lock:
+        _manifest = manifest
+    print(f"Static catalog {version}: {len(missions)} missions, {len(courses)} courses -> {out_dir}")
+    return manifest
+
+
+def _read_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, "manifest.json"), "rb") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _collect_garbage(out_dir, owned):
+    for sub in ("missions", "courses", ""):
+        folder = os.path.join(out_dir, sub)
+        if not os.path.isdir(folder):
+            continue
+        for name in os.listdir(folder):
+            rel = f"{sub}/{name}" if sub else name
+            if name.endswith((".json", ".json.gz", ".json.br")) and name.count(".") >= 2 \
+                    and not name.startswith("manifest.json") and rel not in owned:
+                os.remove(os.path.join(folder, name))
+
+
+def current_version():
+    """Version of the last export (this process, or the manifest already on disk)."""
+    global _manifest
+    with _lock:
+        if _manifest is None and STATIC_DIR:
+            _manifest = _read_manifest(STATIC_DIR)
+        return _manifest["version"] if _manifest else None
+
+
+if __name__ == "__main__":
+    import argparse
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Export the mission catalog as static files")
+    parser.add_argument("--out", help="target directory (default: STATIC_CATALOG_DIR or ./static_catalog)")
+    args = parser.parse_args()
+    db = SessionLocal()
+    try:
+        export(db, args.out)
+    finally:
+        db.close()
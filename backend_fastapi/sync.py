@@ -0,0 +1,161 @@
+"""
+Change cursors for delta sync (GET /sync?since=<cursor>).
+
+Every write to user_mission_progress, vocabulary_items, user_stats and
+certificates stamps the row's change_seq with the next value of a single
+counter (sync_sequence), and every delete leaves a tombstone in
+sync_tombstones. Both are done by triggers, so the ORM, the raw executemany
+path in vocab_import and the legacy importers need no extra code.
+
+SQLite has one writer at a time and the counter is bumped inside the writing
+transaction, so sequence order is commit order: once a reader sees seq N,
+every change <= N is visible too. A cursor is therefore just the counter value
+read before the rows; rows committed in between come back again on the next
+sync, never get skipped. Rows from before the migration (or bulk loads that
+drop the triggers, see generate_data.py) keep change_seq 0 and only appear in
+a full sync (no cursor).
+
+Usage:
+    python migrate_db_sync.py   # existing databases: add the columns first
+"""
+from sqlalchemy import select
+
+import models
+
+# kind -> (table, key column)
+TABLES = {
+    "progress": ("user_mission_progress", "id"),
+    "vocabulary": ("vocabulary_items", "id"),
+    "stats": ("user_stats", "user_id"),
+    "certificates": ("certificates", "id"),
+}
+
+RESET = "reset" # tombstone kind: everything before it is stale for that user
+
+_NEXT = "UPDATE sync_sequence SET seq = seq + 1 WHERE id = 1"
+_CURRENT = "(SELECT seq FROM sync_sequence WHERE id = 1)"
+
+SCHEMA = ["INSERT OR IGNORE INTO sync_sequence (id, seq) VALUES (1, 0)"]
+TRIGGERS = []
+for kind, (table, key) in TABLES.items():
+    stamp = f"UPDATE {table} SET change_seq = {_CURRENT} WHERE {key} = new.{key};"
+    SCHEMA += [
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_sync_ai AFTER INSERT ON {table} BEGIN
+            {_NEXT}; {stamp}
+        END""",
+        # The WHEN keeps the stamping UPDATE from re-firing this trigger
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_sync_au AFTER UPDATE ON {table}
+        WHEN new.change_seq IS old.change_seq BEGIN
+            {_NEXT}; {stamp}
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_sync_ad AFTER DELETE ON {table} BEGIN
+            {_NEXT};
+            INSERT INTO sync_tombstones (seq, user_id, kind, row_id) VALUES ({_CURRENT}, old.user_id, '{kind}', old.{key});
+        END""",
+    ]
+    TRIGGERS += [f"{table}_sync_ai", f"{table}_sync_au", f"{table}_sync_ad"]
+
+
+def ensure_schema(engine):
+    """Seed the counter and create the triggers (tables come from models.py)."""
+    with engine.begin() as conn:
+        for statement in SCHEMA:
+            conn.exec_driver_sql(statement)
+
+
+def mark_reset(cursor, user_id):
+    """Make the user's next delta sync a full one (their rows were rebuilt, e.g. by archive.restore)."""
+    cursor.execute(_NEXT)
+    cursor.execute(f"INSERT INTO sync_tombstones (seq, user_id, kind, row_id) VALUES ({_CURRENT}, ?, ?, 0)",
+                   (user_id, RESET))
+
+
+def current(db):
+    return db.execute(select(models.SyncSequence.seq).where(models.SyncSequence.id == 1)).scalar() or 0
+
+
+def parse_cursor(cursor):
+    """Cursor string -> int, or None when it is not one of ours."""
+    if not cursor:
+        return 0
+    return int(cursor) if cursor.isdigit() else None
+
+
+def _progress(p):
+    return {
+        "id": p.id,
+        "mission_id": p.mission_id,
+        "status": p.status,
+        "score": p.score,
+        "xp_earned": p.xp_earned,
+        "attempts": p.attempts,
+        "completed_at": p.completed_at.isoformat() if p.completed_at else None,
+    }
+
+
+def _vocabulary(v):
+    # Same shape as vocabularyBank in GET /stats
+    return {
+        "id": v.id,
+        "word": v.word,
+        "translation": v.translation,
+        "example": v.example,
+        "nextReview": v.next_review,
+        "interval": v.interval,
+        "easeFactor": v.ease_factor,
+        "streak": v.streak,
+    }
+
+
+def _certificate(c):
+    return {"id": str(c.id), "title": c.title, "level": c.level, "date": c.date_awarded}
+
+
+def changes(db, user_id, since=0):
+    """Rows of `user_id` changed after `since`, plus the cursor for the next call.
+
+    since=0 (or a cursor from a reset database) returns everything: "full" tells
+    the client to replace its copy instead of merging.
+    """
+    seq = current(db) # before the rows, see the module docstring
+    full = since <= 0 or since > seq
+
+    # Tombstones first: a reset among them turns this call into a full sync,
+    # and the rows below must then be selected as such
+    deleted = {kind: [] for kind in TABLES if kind != "stats"}
+    if not full:
+        T = models.SyncTombstone
+        for kind, row_id in db.execute(select(T.kind, T.row_id).where(T.user_id == user_id, T.seq > since)):
+            if kind == RESET:
+                full = True
+                deleted = {kind: [] for kind in deleted}
+                break
+            if kind in deleted:
+                deleted[kind].append(row_id)
+
+    def newer(column):
+        return column >= 0 if full else column > since
+
+    P, V, S, C = models.UserMissionProgress, models.VocabularyItem, models.UserStats, models.Certificate
+    progress = db.execute(select(P).where(P.user_id == user_id, newer(P.change_seq))).scalars().all()
+    vocabulary = db.execute(select(V).where(V.user_id == user_id, newer(V.change_seq))).scalars().all()
+    certificates = db.execute(select(C).where(C.user_id == user_id, newer(C.change_seq))).scalars().all()
+    stats = db.execute(
+        select(S.xp_total, S.credits, S.streak, S.last_activity_date)
+        .where(S.user_id == user_id, newer(S.change_seq))
+    ).first()
+
+    return {
+        "cursor": str(seq),
+        "full": full,
+        "stats": {
+            "xp": stats.xp_total,
+            "credits": stats.credits,
+            "streak": stats.streak,
+            "last_activity_date": stats.last_activity_date.isoformat() if stats.last_activity_date else None,
+        } if stats else None,
+        "progress": [_progress(p) for p in progress],
+        "vocabulary": [_vocabulary(v) for v in vocabulary],
+        "certificates": [_certificate(c) for c in certificates],
+        "deleted": deleted,
+    }
@@ -0,0 +1,215 @@
+"""
+Transcript scoring for speaking and listening sections.
+
+What the learner said (speech-to-text) or typed is normalized (accents,
+punctuation, case, English contractions) and compared with the expected phrase
+through character- and token-level edit distance. Distances are computed in a
+band of width `bound` with early exit, so an utterance that is hopeless stops
+after a few rows instead of filling the whole matrix.
+
+Normalized targets are compiled once per section (speaking `phrase`, listening
+`transcript`/`audio_text`) and dropped by invalidate() when content is reseeded.
+"""
+import re
+import threading
+import unicodedata
+from typing import NamedTuple
+
+from sqlalchemy import select
+
+import models
+from grading import GradeResult, PASS_SCORE
+
+# Anything below this similarity scores 0 for that component; it also sets the band width.
+MIN_SIMILARITY = 0.5
+
+_CONTRACTIONS = [
+    (re.compile(r"\bwon't\b"), "will not"),
+    (re.compile(r"\bcan't\b"), "can not"),
+    (re.compile(r"\bcannot\b"), "can not"),
+    (re.compile(r"\bi'm\b"), "i am"),
+    (re.compile(r"\blet's\b"), "let us"),
+    (re.compile(r"n't\b"), " not"),
+    (re.compile(r"'re\b"), " are"),
+    (re.compile(r"'ll\b"), " will"),
+    (re.compile(r"'ve\b"), " have"),
+    (re.compile(r"'d\b"), " would"),
+    (re.compile(r"\b(it|he|she|that|what|where|who|there|here)'s\b"), r"\1 is"),
+]
+_APOSTROPHES = str.maketrans({"’": "'", "‘": "'", "`": "'"})
+_NON_WORD = re.compile(r"[^a-z0-9' ]+")
+
+
+class Target(NamedTuple):
+    text: str
+    chars: str
+    tokens: tuple
+
+
+class TranscriptScore(NamedTuple):
+    score: float # 0-100
+    char_similarity: float
+    token_similarity: float
+
+
+def normalize(text):
+    text = unicodedata.normalize("NFKD", str(text).translate(_APOSTROPHES).lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    for pattern, replacement in _CONTRACTIONS:
+        text = pattern.sub(replacement, text)
+    text = _NON_WORD.sub(" ", text).replace("'", "")
+    return " ".join(text.split())
+
+
+def make_target(text):
+    chars = normalize(text)
+    return Target(text, chars, tuple(chars.split()))
+
+
+def bounded_distance(a, b, bound):
+    """Levenshtein distance between sequences, or bound + 1 once it must exceed `bound`."""
+    n, m = len(a), len(b)
+    if abs(n - m) > bound:
+        return bound + 1
+    if m == 0 or n == 0:
+        return max(n, m)
+    big = bound + 1
+    prev = [j if j <= bound else big for j in range(m + 1)]
+    for i in range(1, n + 1):
+        lo = max(1, i - bound)
+        hi = min(m, i + bound)
+        cur = [big] * (m + 1)
+        cur[0] = i if i <= bound else big
+        ca = a[i - 1]
+        row_min = cur[0]
+        for j in range(lo, hi + 1):
+            v = prev[j - 1] + (ca != b[j - 1])
+            if prev[j] + 1 < v:
+                v = prev[j] + 1
+            if cur[j - 1] + 1 < v:
+                v = cur[j - 1] + 1
+            cur[j] = v
+            if v < row_min:
+                row_min = v
+        if row_min > bound:
+            return big
+        prev = cur
+    return prev[m] if prev[m] <= bound else big
+
+
+def _similarity(expected, given):
+    longest = max(len(expected), len(given))
+    if longest == 0:
+        return 1.0
+    bound = int(longest * (1 - MIN_SIMILARITY))
+    distance = bounded_distance(expected, given, bound)
+    return 0.0 if distance > bound else 1 - distance / longest
+
+
+def score(target, utterance):
+    given = normalize(utterance)
+    char_sim = _similarity(target.chars, given)
+    token_sim = _similarity(target.tokens, tuple(given.split()))
+    return TranscriptScore(round(100 * (char_sim + token_sim) / 2, 1), round(char_sim, 3), round(token_sim, 3))
+
+
+def score_batch(target, utterances):
+    """Score many utterances against one target (e.g. every attempt of a speaking drill)."""
+    seen = {}
+    out = []
+    for utterance in utterances:
+        result = seen.get(utterance)
+        if result is None:
+            result = seen[utterance] = score(target, utterance)
+        out.append(result)
+    return out
+
+
+# --- SECTION TARGETS ---
+
+_targets = None
+_lock = threading.Lock()
+
+
+def _section_text(payload):
+    if not isinstance(payload, dict):
+        return None
+    return payload.get("phrase") or payload.get("transcript") or payload.get("audio_text")
+
+
+def compile_targets(db):
+    """Build {mission_id: {section index: Target}} in section order."""
+    targets = {}
+    rows = db.execute(
+        select(models.MissionSection.mission_id, models.MissionSection.order_index, models.MissionSection.payload_json)
+        .where(models.MissionSection.key.in_(("speaking", "listening")))
+        .order_by(models.MissionSection.mission_id, models.MissionSection.order_index)
+    )
+    for mission_id, index, payload in rows:
+        text = _section_text(payload)
+        if text:
+            targets.setdefault(mission_id, {})[index] = make_target(text)
+    return targets
+
+
+def invalidate():
+    global _targets
+    with _lock:
+        _targets = None
+
+
+def mission_targets(db, mission_id):
+    """{section index: Target} for a mission (empty when it has nothing to say or hear)."""
+    global _targets
+    targets = _targets
+    if targets is None:
+        with _lock:
+            if _targets is None:
+                _targets = compile_targets(db)
+            targets = _targets
+    return targets.get(mission_id, {})
+
+
+def get_target(db, mission_id, index):
+    return mission_targets(db, mission_id).get(index)
+
+
+def _answer_for(answers, index):
+    if isinstance(answers, dict):
+        return answers.get(str(index), answers.get(index))
+    if isinstance(answers, (list, tuple)) and index < len(answers):
+        return answers[index]
+    return None
+
+
+def grade_speaking(db, mission_id, answers):
+    """GradeResult for a speaking mission whose answers are transcripts (list or {index: text}).
+
+    Every phrase of the mission counts: one left unanswered scores 0, as a
+    missing answer does in grading.grade().
+    """
+    targets = mission_targets(db, mission_id)
+    if not targets or answers is None:
+        return None
+    results = []
+    scores = []
+    for index, target in targets.items():
+        text = _answer_for(answers, index)
+        s = score(target, text).score if isinstance(text, str) else 0.0
+        scores.append(s)
+        results.append(s >= PASS_SCORE)
+    return GradeResult(round(sum(scores) / len(scores), 1), sum(results), len(results), results)
+
+
+if __name__ == "__main__":
+    import time
+
+    target = make_target("Where is the library?")
+    samples = ["where's the library", "Where is the Library!", "were is de librery", "I like pizza"]
+    utterances = [f"{samples[i % 4]} {i}" for i in range(20_000)]
+    started = time.perf_counter()
+    score_batch(target, utterances)
+    elapsed = time.perf_counter() - started
+    print(f"{len(utterances)} distinct utterances in {elapsed:.2f}s ({elapsed / len(utterances) * 1e6:.1f}us each)")
+    for s in samples:
+        print(f"{s!r}: {score(target, s)}")
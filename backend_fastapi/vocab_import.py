@@ -0,0 +1,144 @@
+"""
+Bulk vocabulary import from CSV/TSV decks (plain exports or Anki "Notes in Plain Text").
+
+Rows are parsed lazily, checked against the user's existing words with a single
+set built once per import, and inserted with executemany in fixed-size chunks,
+so memory stays flat however large the deck is.
+
+Columns: word, translation[, example]. Anki header lines (`#separator:tab`, ...)
+and a leading "word,translation" header row are skipped; a first row counts as a
+header only when both of its first two fields are column names, so a deck whose
+first card is "word" keeps it.
+
+Usage:
+    python vocab_import.py deck.tsv --email learner@example.com
+"""
+import argparse
+import csv
+import io
+import time
+
+from sqlalchemy import select
+
+from database import SessionLocal
+import models
+import distractors
+
+CHUNK_SIZE = 2000
+
+_INSERT_SQL = (
+    "INSERT INTO vocabulary_items (user_id, word, translation, example, next_review, interval, ease_factor, streak) "
+    "VALUES (?, ?, ?, ?, ?, 1, 2.5, 0)"
+)
+_HEADER_WORDS = {"word", "front", "english", "term"}
+_HEADER_TRANSLATIONS = {"translation", "back", "spanish", "definition", "meaning"}
+
+
+def iter_deck_rows(text_stream):
+    """Yield (word, translation, example) tuples from a text stream."""
+    delimiter = None
+    pending = None
+    for line in text_stream:
+        if line.startswith("#"):
+            if line.startswith("#separator:"):
+                sep = line.split(":", 1)[1].strip().lower()
+                delimiter = {"tab": "\t", "comma": ",", "semicolon": ";"}.get(sep, delimiter)
+            continue
+        if line.strip():
+            pending = line
+            break
+    if pending is None:
+        return
+
+    if delimiter is None:
+        delimiter = "\t" if "\t" in pending else ","
+    first = next(csv.reader([pending], delimiter=delimiter), [])
+    if not _is_header(first):
+        text_stream = _chain([pending], text_stream)
+
+    for fields in csv.reader(text_stream, delimiter=delimiter):
+        if len(fields) < 2:
+            continue
+        word, translation = fields[0].strip(), fields[1].strip()
+        if not word or not translation:
+            continue
+        example = fields[2].strip() if len(fields) > 2 and fields[2].strip() else None
+        yield word, translation, example
+
+
+def _is_header(fields):
+    return (len(fields) >= 2 and fields[0].strip().lower() in _HEADER_WORDS
+            and fields[1].strip().lower() in _HEADER_TRANSLATIONS)
+
+
+def _chain(head, tail):
+    yield from head
+    yield from tail
+
+
+def import_deck(db, user_id, rows, chunk_size=CHUNK_SIZE):
+    """Insert new words for `user_id`; returns (imported, skipped)."""
+    known = {
+        w.strip().lower()
+        for w in db.execute(select(models.VocabularyItem.word).where(models.VocabularyItem.user_id == user_id)).scalars()
+        if w
+    }
+    now_ms = time.time() * 1000
+    imported = skipped = 0
+    chunk = []
+    for word, translation, example in rows:
+        key = word.lower()
+        if key in known:
+            skipped += 1
+            continue
+        known.add(key)
+        chunk.append((user_id, word, translation, example, now_ms))
+        if len(chunk) >= chunk_size:
+            imported += _write_chunk(db, chunk)
+            chunk = []
+    if chunk:
+        imported += _write_chunk(db, chunk)
+    return imported, skipped
+
+
+def _write_chunk(db, chunk):
+    cursor = db.connection().connection.cursor()
+    cursor.executemany(_INSERT_SQL, chunk)
+    cursor.close()
+    db.commit()
+    distractors.index.add_user_words(row[2] for row in chunk)
+    return len(chunk)
+
+
+def import_file(db, user_id, binary_file):
+    text = io.TextIOWrapper(binary_file, encoding="utf-8-sig", errors="replace", newline="")
+    try:
+        return import_deck(db, user_id, iter_deck_rows(text))
+    finally:
+        text.detach()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import a CSV/TSV vocabulary deck for one user")
+    parser.add_argument("deck")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--email")
+    group.add_argument("--user-id", type=int)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        user_id = args.user_id
+        if args.email:
+            user = db.query(models.User).filter(models.User.email == args.email).first()
+            if not user:
+                raise SystemExit(f"No user with email {args.email}")
+            user_id = user.id
+        started = time.time()
+        with open(args.deck, "rb") as f:
+            imported, skipped = import_file(db, user_id, f)
+        elapsed = max(time.time() - started, 1e-6)
+        print(f"Imported {imported} words ({skipped} duplicates skipped) in {elapsed:.1f}s "
+              f"({(imported + skipped) / elapsed:,.0f} rows/s)")
+    finally:
+        db.close()
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { HashRouter } from 'react-router-dom';
 import { AnimatePresence } from 'framer-motion';
 import { jwtDecode } from 'jwt-decode';
@@ -114,6 +114,8 @@ const App: React.FC = () => {
     const [hearts, setHearts] = useState(20);
 
     const [user, setUser] = useState<UserProfile | null>(null);
+    // Courses from /me/bootstrap; cleared after a mission so the dashboard fetches fresh progress
+    const [launchCourses, setLaunchCourses] = useState<any[] | null>(null);
 
     // Navigation State
     // Default to 'loading' ONLY if token exists
@@ -204,6 +206,21 @@ const App: React.FC = () => {
         setViewState('app');
     };
 
+    // Profile, stats, vocabulary and courses in one round trip (GET /me/bootstrap)
+    const enterApp = async (userData: any = {}) => {
+        const res = await apiService.getBootstrap();
+        if (!res.success || !res.user) return false;
+        setLaunchCourses(res.courses || null);
+        loadUserFromBackend({
+            ...userData,
+            ...res.user,
+            coins: res.user.credits,
+            achievements: res.achievements,
+            vocabularyBank: res.vocabularyBank || []
+        });
+        return true;
+    };
+
     const handleAuthAction = async (data?: any) => {
         // --- 1. GOOGLE LOGIN (REAL BACKEND) ---
         if (data?.google && data?.token) {
@@ -219,7 +236,7 @@ const App: React.FC = () => {
 
                 const res = await apiService.googleLogin(googleData);
                 if (res.success && res.user) {
-                    loadUserFromBackend(res.user);
+                    if (!(await enterApp(res.user))) loadUserFromBackend(res.user);
                 } else {
                     alert("Google Error: " + (res.error || "Server connection failed"));
                 }
@@ -262,7 +279,7 @@ const App: React.FC = () => {
                 const loginRes = await apiService.login({ email, password });
                 if (loginRes.success) {
                     // Start fresh flow
-                    loadUserFromBackend(loginRes.user);
+                    if (!(await enterApp(loginRes.user))) loadUserFromBackend(loginRes.user);
                 }
             } else {
                 console.error("Registration Error Payload:", res);
@@ -273,7 +290,7 @@ const App: React.FC = () => {
             // CALL LOGIN API
             const res = await apiService.login({ email, password });
             if (res.success) {
-                loadUserFromBackend(res.user);
+                if (!(await enterApp(res.user))) loadUserFromBackend(res.user);
             } else {
                 alert("Login failed: " + (res.error || "Check credentials"));
             }
@@ -305,30 +322,65 @@ const App: React.FC = () => {
         }
     };
 
+    // --- LIVE EVENTS ---
+    // While the stream is open the server pushes stats and certificates, so nothing is re-fetched after a submit
+    const eventsLive = useRef(false);
+    useEffect(() => {
+        if (!user?.email) return;
+        const source = apiService.subscribeEvents((type, data) => {
+            if (type === 'ready') {
+                eventsLive.current = true;
+            } else if (type === 'stats') {
+                setXp(data.xp);
+                setCoins(data.credits);
+                setUser(prev => prev ? { ...prev, xp: data.xp, coins: data.credits, streak: { ...prev.streak, current: data.streak } } : null);
+            } else if (type === 'certificate') {
+                setUser(prev => prev ? { ...prev, certificates: [...(prev.certificates || []).filter(c => c.id !== data.id), data] } : null);
+            } else if (type === 'mission_unlocked') {
+                window.dispatchEvent(new CustomEvent('mission-unlocked', { detail: data }));
+            } else if (type === 'resync') {
+                refreshStats();
+            }
+        });
+        if (source) source.onerror = () => { eventsLive.current = false; };
+        return () => {
+            eventsLive.current = false;
+            source?.close();
+        };
+    }, [user?.email]);
+
     // --- MISSION COMPLETION HANDLING ---
     const handleMissionComplete = (xpGained: number) => {
         // Optimistic UI Update
         const newXp = xp + xpGained;
         setXp(newXp);
 
-        // Refresh full stats in background
-        apiService.getStats().then(res => {
+        // Course progress changed: the dashboard fetches it again on its next mount
+        setLaunchCourses(null);
+
+        // Without a live stream, refresh full stats in background
+        if (!eventsLive.current) refreshStats();
+
+        // setActiveMissionId(null); // Decoupled: handled by onBack or onNextMission
+    };
+
+    const refreshStats = () => {
+        apiService.getBootstrap().then(res => {
             if (res.success && res.stats) {
                 setXp(res.stats.xp);
                 setCoins(res.stats.credits);
+                setLaunchCourses(res.courses || null);
                 setUser(prev => prev ? {
                     ...prev,
                     xp: res.stats.xp,
                     coins: res.stats.credits,
                     streak: { ...prev.streak, current: res.stats.streak },
-                    certificates: res.certificates || prev.certificates,
+                    certificates: res.user?.certificates || prev.certificates,
                     vocabularyBank: res.vocabularyBank || prev.vocabularyBank,
                     achievements: res.achievements || prev.achievements
                 } : null);
             }
         });
-
-        // setActiveMissionId(null); // Decoupled: handled by onBack or onNextMission
     };
 
     // --- SHOP LOGIC ---
@@ -357,8 +409,19 @@ const App: React.FC = () => {
             setCoins(newCoins);
             setUser(prev => prev ? { ...prev, coins: newCoins, inventory: newInventory } : null);
 
-            // Sync with backend
-            handleUpdateUser({ coins: newCoins, inventory: newInventory });
+            // Sync with backend: the server charges and grants in one transaction, then its totals win
+            localStorage.setItem('user_profile', JSON.stringify({ ...user, coins: newCoins, inventory: newInventory }));
+            apiService.purchaseItem(item.id).then(res => {
+                if (res.success) {
+                    setCoins(res.credits);
+                    setUser(prev => prev ? { ...prev, coins: res.credits, inventory: res.inventory } : null);
+                } else if (res.error) {
+                    // Refused (e.g. credits spent elsewhere): undo the optimistic update
+                    setCoins(coins);
+                    setUser(prev => prev ? { ...prev, coins, inventory: user.inventory } : null);
+                    alert(res.error);
+                }
+            });
 
             return true;
         }
@@ -381,29 +444,12 @@ const App: React.FC = () => {
     useEffect(() => {
         const token = localStorage.getItem('token');
         if (token) {
-            // Validate token or just load stats
-            apiService.getStats().then(res => {
-                if (res.success && res.stats) {
-                    // Mock user object recreation from stats + token info would be key here, but simplified:
-                    const savedUser = JSON.parse(localStorage.getItem('user_profile') || 'null');
-                    if (savedUser) {
-                        loadUserFromBackend({
-                            ...savedUser,
-                            xp: res.stats.xp,
-                            coins: res.stats.credits,
-                            streak: res.stats.streak, // Fixed structure
-                            // Hydrate lists
-                            certificates: res.certificates || [],
-                            vocabularyBank: res.vocabularyBank || []
-                        });
-                    } else {
-                        // Token exists but no profile? Logout security
-                        handleLogout();
-                    }
-                } else {
-                    handleLogout();
-                }
-            }).catch(() => handleLogout()); // If ping fails
+            // One round trip validates the token and hydrates profile, stats and courses;
+            // client-only fields (level, daily challenges) come from the saved profile
+            const savedUser = JSON.parse(localStorage.getItem('user_profile') || 'null');
+            enterApp(savedUser || {}).then(ok => {
+                if (!ok) handleLogout();
+            }).catch(() => handleLogout());
         }
     }, []);
 
@@ -496,6 +542,7 @@ const App: React.FC = () => {
                 return (
                     <GalacticDashboard
                         user={user!}
+                        initialCourses={launchCourses}
                         onSelectCourse={(id) => setActiveCourseId(id)}
                     />
                 );
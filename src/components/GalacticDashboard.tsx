@@ -7,10 +7,11 @@ import { apiService } from '../services/api';
 interface GalacticDashboardProps {
     user: UserProfile;
     onSelectCourse: (courseId: number) => void;
+    initialCourses?: any[] | null; // from /me/bootstrap, so launch needs no separate fetch
 }
 
-const GalacticDashboard: React.FC<GalacticDashboardProps> = ({ user, onSelectCourse }) => {
-    const [courses, setCourses] = useState<any[]>([]);
+const GalacticDashboard: React.FC<GalacticDashboardProps> = ({ user, onSelectCourse, initialCourses }) => {
+    const [courses, setCourses] = useState<any[]>(initialCourses || []);
     const [trackStats, setTrackStats] = useState<any[]>([]);
 
     useEffect(() => {
@@ -20,9 +21,16 @@ const GalacticDashboard: React.FC<GalacticDashboardProps> = ({ user, onSelectCou
                 setCourses(res.courses);
             }
         };
-        fetchCourses();
+        if (!initialCourses) fetchCourses();
+        // Unlocks arrive over the live event stream (App.tsx); only then is the list stale
+        window.addEventListener('mission-unlocked', fetchCourses);
+        return () => window.removeEventListener('mission-unlocked', fetchCourses);
     }, []);
 
+    useEffect(() => {
+        if (initialCourses) setCourses(initialCourses);
+    }, [initialCourses]);
+
     // Time-based Greeting
     const getGreeting = () => {
         const hour = new Date().getHours();
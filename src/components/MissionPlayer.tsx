@@ -35,6 +35,8 @@ const MissionPlayer: React.FC<MissionPlayerProps> = ({ missionId, onComplete, on
     // Interactive State
     const [userInput, setUserInput] = useState('');
     const [feedback, setFeedback] = useState<'neutral' | 'correct' | 'incorrect'>('neutral');
+    // Last answer given per section index; the server grades these on submit
+    const [answers, setAnswers] = useState<Record<string, string>>({});
 
     useEffect(() => {
         // Reset state when missionId changes (for Next Lesson flow)
@@ -46,6 +48,7 @@ const MissionPlayer: React.FC<MissionPlayerProps> = ({ missionId, onComplete, on
         setShowCertificate(false);
         setShowVictory(null);
         setNextMissionId(null);
+        setAnswers({});
         loadMission();
     }, [missionId]);
 
@@ -75,6 +78,7 @@ const MissionPlayer: React.FC<MissionPlayerProps> = ({ missionId, onComplete, on
         if (!payload) return;
         if (hearts !== undefined && hearts <= 0) return; // Prevent action if no hearts
 
+        setAnswers(prev => ({ ...prev, [step]: answer }));
         let isCorrect = false;
 
         if (currentSection.key === 'vocabulary' || currentSection.key === 'listening' || currentSection.key === 'grammar') {
@@ -122,7 +126,8 @@ const MissionPlayer: React.FC<MissionPlayerProps> = ({ missionId, onComplete, on
             // FINISH
             try {
                 if (mission) {
-                    const res = await apiService.submitMission(mission.id, 100); // 100% score for now
+                    // The score only counts for missions without gradable sections
+                    const res = await apiService.submitMission(mission.id, 100, answers);
                     if (res.success) {
                         setXpEarned(res.xp_gained);
                         setCreditsEarned(res.credits_gained || 0);
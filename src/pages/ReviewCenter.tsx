@@ -2,6 +2,7 @@
 import React, { useState, useEffect } from 'react';
 import { WordItem, UserProfile } from '../types';
 import { Brain, Volume2, ArrowRight, CheckCircle, Clock, Dumbbell } from 'lucide-react';
+import { apiService } from '../services/api';
 
 interface ReviewCenterProps {
   user: UserProfile | null;
@@ -64,6 +65,10 @@ const ReviewCenter: React.FC<ReviewCenterProps> = ({ user, onUpdateUser }) => {
     // Update user profile
     const newBank = user.vocabularyBank.map(w => w.id === updatedWord.id ? updatedWord : w);
     onUpdateUser({ vocabularyBank: newBank });
+    // Words stored server-side have numeric ids; local-only ones stay client-side
+    if (/^\d+$/.test(String(updatedWord.id))) {
+      apiService.reviewWord(Number(updatedWord.id), difficulty);
+    }
 
     // Move to next card
     const remaining = dueWords.slice(1);
@@ -15,6 +15,18 @@ const getHeaders = (tokenOverride?: string) => {
     return headers;
 };
 
+// Static catalog (backend_fastapi/static_catalog.py): mission content is served by Apache
+// as immutable files; the API only says which manifest version is current.
+let catalogManifest: Promise<any> | null = null;
+const loadCatalogManifest = () => {
+    if (!catalogManifest) {
+        catalogManifest = fetch(`${API_BASE_URL}/catalog/version`)
+            .then(res => res.ok ? res.json() : null)
+            .then(v => v?.manifest ? fetch(v.manifest).then(r => r.json()).then(m => ({ ...m, base: v.base_url })) : null)
+            .catch(() => null);
+    }
+    return catalogManifest;
+};
 
 export const apiService = {
     // --- AUTH ---
@@ -88,6 +100,14 @@ export const apiService = {
     },
 
     async getMission(missionId: number) {
+        const manifest = await loadCatalogManifest();
+        const path = manifest?.missions?.[missionId];
+        if (path) {
+            try {
+                const res = await fetch(`${manifest.base}/${path}`);
+                if (res.ok) return await res.json();
+            } catch (e) { console.error(e); }
+        }
         try {
             const res = await fetch(`${API_BASE_URL}/missions/${missionId}`, { headers: getHeaders() });
             return await res.json();
@@ -105,6 +125,66 @@ export const apiService = {
         } catch (e) { console.error(e); return { success: false }; }
     },
 
+    // Profile, courses, stats and due reviews in one round trip (app launch)
+    async getBootstrap() {
+        try {
+            const res = await fetch(`${API_BASE_URL}/me/bootstrap`, { headers: getHeaders() });
+            return await res.json();
+        } catch (e) { console.error(e); return { success: false }; }
+    },
+
+    // Only what changed since the last call; the cursor is kept in localStorage.
+    // A "full" response replaces the local copy, otherwise rows are merged by id.
+    async syncChanges() {
+        try {
+            const since = localStorage.getItem('syncCursor');
+            const url = since ? `${API_BASE_URL}/sync?since=${encodeURIComponent(since)}` : `${API_BASE_URL}/sync`;
+            const res = await fetch(url, { headers: getHeaders() });
+            if (res.status === 400) localStorage.removeItem('syncCursor');
+            const data = await res.json();
+            if (data.success && data.cursor) localStorage.setItem('syncCursor', data.cursor);
+            return data;
+        } catch (e) { console.error(e); return { success: false }; }
+    },
+
+    async getLeaderboard(limit = 20) {
+        try {
+            const res = await fetch(`${API_BASE_URL}/leaderboard?limit=${limit}`, { headers: getHeaders() });
+            return await res.json();
+        } catch (e) { console.error(e); return { success: false }; }
+    },
+
+    // Live stats/unlock/certificate deltas (GET /me/events). EventSource cannot send
+    // headers, so the token goes in the query string. Returns null when unavailable.
+    subscribeEvents(onEvent: (type: string, data: any) => void): EventSource | null {
+        const token = localStorage.getItem('token');
+        if (!token || typeof EventSource === 'undefined') return null;
+        const source = new EventSource(`${API_BASE_URL}/me/events?token=${encodeURIComponent(token)}`);
+        ['ready', 'stats', 'mission_unlocked', 'certificate', 'resync'].forEach(type =>
+            source.addEventListener(type, (e: MessageEvent) => onEvent(type, JSON.parse(e.data)))
+        );
+        return source;
+    },
+
+    // --- AI (cached server-side proxy) ---
+    async generateLesson(level: string, topic: string, age?: number) {
+        const res = await fetch(`${API_BASE_URL}/ai/lesson`, {
+            method: 'POST',
+            headers: getHeaders(),
+            body: JSON.stringify({ level, topic, age })
+        });
+        return await res.json();
+    },
+
+    async tutorChat(history: any[], message: string, level: string, attachment?: string) {
+        const res = await fetch(`${API_BASE_URL}/ai/chat`, {
+            method: 'POST',
+            headers: getHeaders(),
+            body: JSON.stringify({ history, message, level, attachment })
+        });
+        return await res.json();
+    },
+
     async getStats() {
         try {
             const res = await fetch(`${API_BASE_URL}/stats`, { headers: getHeaders() });
@@ -112,6 +192,48 @@ export const apiService = {
         } catch (e) { console.error(e); return { success: false }; }
     },
 
+    async importVocabulary(file: File) {
+        try {
+            const headers = getHeaders();
+            delete headers['Content-Type']; // Let the browser set the multipart boundary
+            const form = new FormData();
+            form.append('file', file);
+            const res = await fetch(`${API_BASE_URL}/vocabulary/import`, {
+                method: 'POST',
+                headers,
+                body: form
+            });
+            return await res.json();
+        } catch (e) { console.error(e); return { success: false }; }
+    },
+
+    // Server-side SM-2 update; also re-arms the due-review reminder for this learner
+    async reviewWord(itemId: number, difficulty: 'hard' | 'good' | 'easy') {
+        try {
+            const res = await fetch(`${API_BASE_URL}/vocabulary/${itemId}/review`, {
+                method: 'POST',
+                headers: getHeaders(),
+                body: JSON.stringify({ difficulty })
+            });
+            return await res.json();
+        } catch (e) { console.error(e); return { success: false }; }
+    },
+
+    // --- SHOP ---
+    // The server charges its own price and grants the item atomically; 400 when credits are short
+    async purchaseItem(itemId: string, qty = 1) {
+        try {
+            const res = await fetch(`${API_BASE_URL}/shop/purchase`, {
+                method: 'POST',
+                headers: getHeaders(),
+                body: JSON.stringify({ item_id: itemId, qty })
+            });
+            const data = await res.json();
+            if (!res.ok) return { success: false, error: data.detail || `Error ${res.status}` };
+            return data;
+        } catch (e) { console.error(e); return { success: false }; }
+    },
+
     // --- USER SYNC (Legacy/Profile) ---
     async updateProfile(email: string, updates: any) {
         try {